@@ -1,10 +1,14 @@
 import streamlit as st
-import json
 from datetime import datetime
 import pandas as pd
 
 # Import từ các module khác
 from database_helper import get_all_questions, get_user_submissions, get_submission_statistics
+from grading import check_answer_correctness
+from column_codec import decode_answers, decode_correct, decode_question
+import db_metrics
+from submission_queue import get_submission_queue
+from render_cache import clear_render_cache
 
 def admin_dashboard():
     """Bảng điều khiển quản trị viên"""
@@ -25,7 +29,7 @@ def admin_dashboard():
     col4.metric("Điểm trung bình", f"{stats['avg_score']:.1f}/{stats['total_possible_score']}")
     
     # Các tab chức năng
-    tab1, tab2, tab3 = st.tabs(["Tổng quan hệ thống", "Danh sách học viên", "Xuất dữ liệu"])
+    tab1, tab2, tab3, tab4 = st.tabs(["Tổng quan hệ thống", "Danh sách học viên", "Xuất dữ liệu", "Hiệu năng truy vấn"])
     
     with tab1:
         system_overview()
@@ -35,6 +39,9 @@ def admin_dashboard():
     
     with tab3:
         export_data()
+    
+    with tab4:
+        database_performance()
 
 def system_overview():
     """Hiển thị tổng quan về hệ thống khảo sát"""
@@ -104,6 +111,50 @@ def system_overview():
     # Hiển thị hoạt động gần đây
     st.write("### Hoạt động gần đây")
     st.info("Đây là phần tóm tắt hoạt động gần đây, có thể kết nối với cơ sở dữ liệu để hiển thị dữ liệu thời gian thực.")
+    
+    submission_queue_status()
+    report_cache_controls()
+
+def submission_queue_status():
+    """Hiển thị bài nộp đang chờ ghi và bài ghi lỗi trong hàng đợi, cho phép gửi lại hoặc bỏ"""
+    st.write("### Hàng đợi ghi bài nộp")
+    
+    submission_queue = get_submission_queue()
+    failed = submission_queue.failed_submissions()
+    
+    queue_cols = st.columns(2)
+    queue_cols[0].metric("Bài đang chờ ghi", submission_queue.pending_count())
+    queue_cols[1].metric("Bài ghi lỗi", len(failed))
+    
+    if not failed:
+        return
+    
+    st.error("Một số bài nộp không lưu được vào database. Học viên đã được báo bài chưa lưu.")
+    st.dataframe(pd.DataFrame([
+        {
+            "Mã biên nhận": entry["record"]["receipt_id"],
+            "Email": entry["record"]["user_email"],
+            "Thời gian nộp": entry["record"]["timestamp"],
+            "Lỗi": entry["error"],
+        }
+        for entry in failed
+    ]), hide_index=True, use_container_width=True)
+    
+    col1, col2 = st.columns(2)
+    if col1.button("🔁 Gửi lại tất cả", key="retry_failed_submissions"):
+        count = submission_queue.retry_failed()
+        st.success(f"Đã đưa {count} bài nộp trở lại hàng đợi.")
+    if col2.button("🗑️ Bỏ các bài ghi lỗi", key="discard_failed_submissions"):
+        submission_queue.discard_failed([entry["record"]["receipt_id"] for entry in failed])
+        st.rerun()
+
+def report_cache_controls():
+    """Nút xóa cache báo cáo học viên (ví dụ sau khi cài font tiếng Việt để tạo lại các PDF cũ)"""
+    st.write("### Cache báo cáo")
+    st.caption("Báo cáo chi tiết học viên đã tạo được lưu lại và dùng lại cho các lần tải sau.")
+    if st.button("🧹 Xóa cache báo cáo", key="clear_render_cache"):
+        clear_render_cache()
+        st.success("Đã xóa cache báo cáo, các báo cáo sẽ được tạo lại ở lần tải tiếp theo.")
 
 def students_list():
     """Hiển thị danh sách học viên đã làm bài"""
@@ -181,20 +232,7 @@ def students_list():
                         q_id = str(q["id"])
                         
                         # Đảm bảo định dạng dữ liệu đúng
-                        if isinstance(q["answers"], str):
-                            try:
-                                q["answers"] = json.loads(q["answers"])
-                            except:
-                                q["answers"] = [q["answers"]]
-                        
-                        if isinstance(q["correct"], str):
-                            try:
-                                q["correct"] = json.loads(q["correct"])
-                            except:
-                                try:
-                                    q["correct"] = [int(x.strip()) for x in q["correct"].split(",")]
-                                except:
-                                    q["correct"] = []
+                        decode_question(q)
                         
                         # Lấy câu trả lời của học viên
                         student_answers = s["responses"].get(q_id, [])
@@ -264,24 +302,8 @@ def export_questions():
     data = []
     for q in questions:
         # Đảm bảo định dạng dữ liệu đúng
-        if isinstance(q["answers"], str):
-            try:
-                answers = json.loads(q["answers"])
-            except:
-                answers = [q["answers"]]
-        else:
-            answers = q["answers"]
-        
-        if isinstance(q["correct"], str):
-            try:
-                correct = json.loads(q["correct"])
-            except:
-                try:
-                    correct = [int(x.strip()) for x in q["correct"].split(",")]
-                except:
-                    correct = []
-        else:
-            correct = q["correct"]
+        answers = decode_answers(q["answers"])
+        correct = decode_correct(q["correct"])
         
         # Chuyển đáp án và đáp án đúng thành chuỗi dễ đọc
         answers_str = ", ".join(answers)
@@ -339,30 +361,60 @@ def export_statistics():
     st.info("Tính năng xuất thống kê tổng hợp đang được phát triển.")
     st.info("Trong triển khai thực tế, tính năng này sẽ cho phép xuất báo cáo tổng hợp bao gồm các biểu đồ và phân tích.")
 
-def check_answer_correctness(student_answers, question):
-    """Kiểm tra đáp án có đúng không, hỗ trợ chọn nhiều đáp án."""
-    # Nếu câu trả lời trống, không đúng
-    if not student_answers:
-        return False
-        
-    # Đối với câu hỏi combobox (chỉ chọn một)
-    if question["type"] == "Combobox":
-        # Nếu có một đáp án và đáp án đó ở vị trí nằm trong danh sách đáp án đúng
-        if len(student_answers) == 1:
-            answer_text = student_answers[0]
-            answer_index = question["answers"].index(answer_text) + 1 if answer_text in question["answers"] else -1
-            return answer_index in question["correct"]
-        return False
-    
-    # Đối với câu hỏi checkbox (nhiều lựa chọn)
-    elif question["type"] == "Checkbox":
-        # Tìm index (vị trí) của các đáp án học viên đã chọn
-        selected_indices = []
-        for ans in student_answers:
-            if ans in question["answers"]:
-                selected_indices.append(question["answers"].index(ans) + 1)
-        
-        # So sánh với danh sách đáp án đúng
-        return set(selected_indices) == set(question["correct"])
+def database_performance():
+    """Hiển thị thời gian các lệnh Supabase (phân vị trên các lần gọi gần nhất của tiến trình)"""
+    st.subheader("Hiệu năng truy vấn Supabase")
     
-    return False
\ No newline at end of file
+    if not db_metrics.DB_METRICS_ENABLED:
+        st.info("Đo thời gian truy vấn đang tắt (DB_METRICS_ENABLED=0).")
+        return
+    
+    rows = db_metrics.snapshot()
+    if not rows:
+        st.info("Chưa có lệnh Supabase nào được ghi nhận kể từ khi khởi động.")
+        return
+    
+    def to_table(selected_rows, first_column, first_value):
+        return pd.DataFrame([
+            {
+                first_column: first_value(row),
+                "Số lần gọi": row["count"],
+                "Lỗi": row["errors"],
+                "p50 (ms)": round(row["p50"] * 1000, 1),
+                "p90 (ms)": round(row["p90"] * 1000, 1),
+                "p99 (ms)": round(row["p99"] * 1000, 1),
+                "Tổng thời gian (s)": round(row["latency_sum"], 2),
+                "Số dòng TB": round(row["avg_rows"], 1),
+                "Kích thước TB (KB)": round(row["avg_bytes"] / 1024, 1),
+            }
+            for row in selected_rows
+        ])
+    
+    function_rows = [row for row in rows if row["operation"].startswith(db_metrics.FUNCTION_PREFIX)]
+    request_rows = [row for row in rows if not row["operation"].startswith(db_metrics.FUNCTION_PREFIX)]
+    
+    st.write("#### Theo hàm truy vấn")
+    if function_rows:
+        st.dataframe(
+            to_table(function_rows, "Hàm", lambda row: row["caller"]).drop(columns=["Số dòng TB", "Kích thước TB (KB)"]),
+            hide_index=True, use_container_width=True
+        )
+    
+    st.write("#### Theo lệnh Supabase")
+    if request_rows:
+        st.dataframe(
+            to_table(request_rows, "Lệnh (hàm gọi)", lambda row: f"{row['operation']} ({row['caller']})"),
+            hide_index=True, use_container_width=True
+        )
+    
+    col1, col2 = st.columns(2)
+    col1.download_button(
+        "📥 Tải metrics (Prometheus)",
+        data=db_metrics.prometheus_text(),
+        file_name="supabase_metrics.prom",
+        mime="text/plain",
+        key="download_db_metrics"
+    )
+    if col2.button("🔄 Xóa số liệu đã đo", key="reset_db_metrics"):
+        db_metrics.reset()
+        st.rerun()
@@ -1,8 +1,11 @@
+# Đo thời gian import khi bật STARTUP_PROFILE=1 (phải đứng trước các import khác)
+from startup_profiler import start_profiling, finish_profiling, profile_phase
+start_profiling()
+
 import os
 import streamlit as st
 import json
 from datetime import datetime
-import report
 # Thử tải từ dotenv nếu có
 try:
     from dotenv import load_dotenv
@@ -11,10 +14,8 @@ except ImportError:
     pass  # Nếu không có dotenv, bỏ qua
 
 # Import từ các module khác
-from question_manager import manage_questions
 from surveyhandler import survey_form
-from stats_dashboard import stats_dashboard
-from admin_dashboard import admin_dashboard
+from lazy_loader import lazy_function
 from database_helper import (
     get_supabase_client, 
     check_supabase_config, 
@@ -24,6 +25,14 @@ from database_helper import (
 )
 from PIL import Image, UnidentifiedImageError
 
+# Các trang dành cho admin (pandas, matplotlib, python-docx, fpdf...) chỉ được import khi mở trang
+manage_questions = lazy_function("question_manager", "manage_questions")
+stats_dashboard = lazy_function("stats_dashboard", "stats_dashboard")
+admin_dashboard = lazy_function("admin_dashboard", "admin_dashboard")
+database_performance = lazy_function("admin_dashboard", "database_performance")
+view_statistics = lazy_function("report", "view_statistics")
+clear_downloads = lazy_function("downloads", "clear_downloads")
+
            
 # ------------ Cấu hình logo 2×3 cm ~ 76×113 px ------------
 LOGO_WIDTH, LOGO_HEIGHT = 150, 150
@@ -288,7 +297,7 @@ def main():
             if st.session_state.user_role == "admin":
                 page = st.radio(
                     "Chọn chức năng:",
-                    ["Quản lý câu hỏi", "Báo cáo & thống kê", "Quản trị hệ thống"]
+                    ["Quản lý câu hỏi", "Báo cáo & thống kê", "Quản trị hệ thống", "Hiệu năng truy vấn"]
                 )
                         
             # Menu cho học viên
@@ -300,6 +309,8 @@ def main():
             
             # Nút đăng xuất
             if st.button("Đăng xuất"):
+                # File xuất của phiên chứa dữ liệu người dùng cũ, không để người đăng nhập sau tải được
+                clear_downloads()
                 st.session_state.user_role = None
                 st.session_state.user_info = None
                 st.rerun()
@@ -312,7 +323,9 @@ def main():
             elif page == "Báo cáo & thống kê":
                 stats_dashboard()
             elif page == "Quản trị hệ thống":
-                report.view_statistics()
+                view_statistics()
+            elif page == "Hiệu năng truy vấn":
+                database_performance()
         else:
             if page == "Làm bài khảo sát":
                 survey_form(
@@ -397,4 +410,6 @@ def setup_environment_variables():
         st.info("Sau khi thiết lập biến môi trường bằng một trong các phương pháp trên, hãy khởi động lại ứng dụng.")
 
 if __name__ == "__main__":
-    main()
+    with profile_phase("app.main"):
+        main()
+    finish_profiling()
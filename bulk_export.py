@@ -0,0 +1,127 @@
+import os
+import re
+import zipfile
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+# Số tiến trình tạo báo cáo song song
+BULK_EXPORT_WORKERS = int(os.environ.get("BULK_EXPORT_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+# Số báo cáo tối đa đang được tạo hoặc chờ ghi vào ZIP cùng lúc (giới hạn bộ nhớ)
+BULK_EXPORT_IN_FLIGHT_PER_WORKER = 2
+
+# Câu hỏi và điểm tối đa được gửi một lần cho mỗi tiến trình thay vì gửi kèm từng báo cáo
+_worker_questions = None
+_worker_max_possible = 0
+
+def _init_worker(questions, max_possible):
+    global _worker_questions, _worker_max_possible
+    _worker_questions = questions
+    _worker_max_possible = max_possible
+
+def _render_report(job):
+    """Tạo một báo cáo trong tiến trình con, trả về (tên file trong ZIP, nội dung)"""
+    # Chỉ nạp phần tạo file (report_exports không import streamlit), không nạp giao diện báo cáo
+    # (report.py, matplotlib, database_helper) trong tiến trình con
+    from export_backends import render_student_report
+
+    buffer = render_student_report(
+        job["format"],
+        job["student_name"],
+        job["student_email"],
+        job["student_class"],
+        job["submission"],
+        _worker_questions,
+        _worker_max_possible
+    )
+    return job["filename"], buffer.getvalue()
+
+def _safe_name(value):
+    """Chuẩn hóa chuỗi để dùng làm tên file trong ZIP"""
+    return re.sub(r"[^\w.@-]+", "_", str(value), flags=re.UNICODE).strip("_") or "khong_xac_dinh"
+
+def build_report_jobs(frame, formats, best_only=True):
+    """Tạo danh sách báo cáo cần xuất cho mọi học viên có bài nộp trong ReportFrame
+
+    best_only=True chỉ xuất bài làm điểm cao nhất của mỗi học viên, ngược lại xuất mọi lần làm.
+    """
+    rows_by_email = {}
+    for row, email in enumerate(frame.table["email"].astype(str)):
+        rows_by_email.setdefault(email, []).append(row)
+
+    scores = frame.table["score"].to_numpy()
+    jobs = []
+    for email in sorted(rows_by_email):
+        rows = rows_by_email[email]
+        if best_only:
+            rows = [max(rows, key=lambda row: scores[row])]
+
+        student_name = str(frame.table["full_name"].iat[rows[0]])
+        student_class = str(frame.table["class"].iat[rows[0]])
+        for row in rows:
+            submission = frame.submissions[row]
+            for fmt in formats:
+                jobs.append({
+                    "format": fmt,
+                    "filename": f"{_safe_name(email)}/bao_cao_{_safe_name(student_name)}_{submission.get('id', row)}.{fmt}",
+                    "student_name": student_name,
+                    "student_email": email,
+                    "student_class": student_class,
+                    "submission": submission
+                })
+    return jobs
+
+def _discard(executor, zip_path):
+    executor.shutdown(wait=False, cancel_futures=True)
+    if os.path.exists(zip_path):
+        os.remove(zip_path)
+
+def write_reports_zip(jobs, questions, max_possible, progress_callback=None, workers=BULK_EXPORT_WORKERS):
+    """Tạo song song các báo cáo và ghi lần lượt vào một file ZIP tạm trên đĩa
+
+    Mỗi báo cáo được ghi vào ZIP ngay khi xong nên bộ nhớ chỉ giữ vài báo cáo cùng lúc.
+    Trả về đường dẫn file ZIP. Việc hủy diễn ra khi progress_callback ném ngoại lệ (Streamlit
+    dừng lượt chạy khi người dùng bấm Hủy): các tiến trình con bị hủy và file tạm bị xóa.
+    """
+    fd, zip_path = tempfile.mkstemp(prefix="bao_cao_hoc_vien_", suffix=".zip")
+    os.close(fd)
+
+    completed = 0
+    pending = set()
+    job_iter = iter(jobs)
+    max_in_flight = max(1, workers) * BULK_EXPORT_IN_FLIGHT_PER_WORKER
+    # "spawn": tiến trình con không kế thừa luồng và khóa của server Streamlit như khi fork
+    executor = ProcessPoolExecutor(
+        max_workers=max(1, workers),
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(questions, max_possible)
+    )
+
+    try:
+        with zipfile.ZipFile(zip_path, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+            while True:
+                # Giữ số báo cáo đang tạo trong giới hạn
+                for job in job_iter:
+                    pending.add(executor.submit(_render_report, job))
+                    if len(pending) >= max_in_flight:
+                        break
+
+                if not pending:
+                    break
+
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    filename, content = future.result()
+                    archive.writestr(filename, content)
+                    completed += 1
+
+                if progress_callback:
+                    progress_callback(completed, len(jobs))
+    except BaseException:
+        # Lỗi hoặc Streamlit dừng lượt chạy hiện tại (người dùng bấm nút khác): bỏ file dở dang
+        _discard(executor, zip_path)
+        raise
+
+    executor.shutdown(wait=True)
+    return zip_path
@@ -0,0 +1,87 @@
+import os
+import json
+
+# Ghi answers/correct/responses dạng JSONB gốc (sau khi chạy sql/003_jsonb_columns.sql).
+# Mặc định vẫn ghi JSON string để tương thích với database chưa migrate.
+SUPABASE_JSONB_COLUMNS = os.environ.get("SUPABASE_JSONB_COLUMNS", "").lower() in ("1", "true", "yes")
+
+def _as_list(value):
+    """Giá trị JSON đã giải mã thành list: null là list rỗng, giá trị đơn (số, chuỗi...) là list một phần tử"""
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    return [value]
+
+def _legacy_correct(text):
+    """Chuỗi correct kiểu cũ "1,2" thành list vị trí, chuỗi không hợp lệ thành list rỗng"""
+    try:
+        return [int(x.strip()) for x in text.split(",")]
+    except:
+        return []
+
+def decode_answers(answers):
+    """Chuyển answers (list hoặc JSON string) thành list"""
+    if isinstance(answers, list):
+        return answers
+    if isinstance(answers, str):
+        try:
+            parsed = json.loads(answers)
+        except:
+            return [answers]
+        # Số/true/false là nội dung của một đáp án ("2"), giữ nguyên chuỗi để khớp với câu trả lời
+        if not isinstance(parsed, (list, str)) and parsed is not None:
+            return [answers]
+        answers = parsed
+    return _as_list(answers)
+
+def decode_correct(correct):
+    """Chuyển correct (list, JSON string hoặc chuỗi "1,2" kiểu cũ) thành list"""
+    if isinstance(correct, list):
+        return correct
+    if isinstance(correct, str):
+        try:
+            correct = json.loads(correct)
+        except:
+            return _legacy_correct(correct)
+        # Chuỗi "1,2" được lưu dưới dạng JSON string
+        if isinstance(correct, str):
+            return _legacy_correct(correct)
+    return _as_list(correct)
+
+def decode_responses(responses):
+    """Chuyển responses (dict hoặc JSON string) thành dict, giá trị không phải object thành dict rỗng"""
+    if isinstance(responses, dict):
+        return responses
+    if isinstance(responses, str):
+        try:
+            responses = json.loads(responses)
+        except:
+            return {}
+    return responses if isinstance(responses, dict) else {}
+
+def decode_question(q):
+    """Chuẩn hóa answers và correct của một câu hỏi đọc từ database (sửa trực tiếp)"""
+    q["answers"] = decode_answers(q.get("answers"))
+    q["correct"] = decode_correct(q.get("correct"))
+    return q
+
+def decode_submission(s):
+    """Chuẩn hóa responses của một bài nộp đọc từ database (sửa trực tiếp)"""
+    s["responses"] = decode_responses(s.get("responses"))
+    return s
+
+def encode_json_column(value):
+    """Chuẩn bị giá trị list/dict để ghi vào cột answers/correct/responses"""
+    if SUPABASE_JSONB_COLUMNS or not isinstance(value, (list, dict)):
+        return value
+    return json.dumps(value)
+
+def encode_question(question_data):
+    """Trả về bản sao câu hỏi với answers/correct đã sẵn sàng để ghi"""
+    data_to_save = question_data.copy()
+    if "answers" in data_to_save:
+        data_to_save["answers"] = encode_json_column(data_to_save["answers"])
+    if "correct" in data_to_save:
+        data_to_save["correct"] = encode_json_column(data_to_save["correct"])
+    return data_to_save
@@ -1,11 +1,44 @@
 import os
+import copy
 import json
-import uuid
+import time
+import hashlib
+import threading
 import streamlit as st
-from datetime import datetime
+from datetime import datetime, timedelta
 from supabase import create_client
 import supabase
 
+from grading import check_answer_correctness, compile_questions, grade_responses
+from column_codec import decode_question, decode_submission, encode_json_column, encode_question
+from db_metrics import instrument_client, record_response_size, timed
+from submission_stats import aggregate_submissions, fetch_aggregates, fold_submission, new_aggregates, student_count
+
+# Cấu hình pool kết nối Supabase dùng chung cho toàn bộ tiến trình
+SUPABASE_POOL_SIZE = int(os.environ.get("SUPABASE_POOL_SIZE", "20"))
+SUPABASE_KEEPALIVE_SIZE = int(os.environ.get("SUPABASE_KEEPALIVE_SIZE", "10"))
+SUPABASE_KEEPALIVE_EXPIRY = 30  # giây
+SUPABASE_HEALTH_CHECK_INTERVAL = 60  # giây
+
+# Số bản ghi tối đa mỗi range request khi tải bài nộp hàng loạt
+SUBMISSIONS_PAGE_SIZE = 1000
+
+# Cache ngân hàng câu hỏi: hết hạn theo TTL hoặc khi phiên bản thay đổi
+QUESTIONS_CACHE_TTL = int(os.environ.get("QUESTIONS_CACHE_TTL", "300"))  # giây
+_questions_cache = {}
+_questions_version = 0
+_questions_cache_lock = threading.Lock()
+
+# Kho thống kê bài nộp được cập nhật tăng dần, dùng chung cho toàn bộ tiến trình
+# Mỗi lần đồng bộ đọc lại khoảng này (giây) trước mốc inserted_at để nhận các dòng commit muộn
+STATS_SYNC_OVERLAP_SECONDS = int(os.environ.get("STATS_SYNC_OVERLAP_SECONDS", "300"))
+_stats_store = None
+_stats_store_lock = threading.Lock()
+
+# Registry client theo dấu vân tay của URL/API key
+_client_registry = {}
+_client_registry_lock = threading.Lock()
+
 def check_supabase_config():
     """Kiểm tra cấu hình Supabase"""
     supabase_url = os.environ.get("SUPABASE_URL")
@@ -19,8 +52,73 @@ def check_supabase_config():
     
     return True, "Cấu hình Supabase hợp lệ."
 
+def _credentials_fingerprint(supabase_url, supabase_key):
+    """Tạo dấu vân tay cho bộ thông tin kết nối (không lưu key dạng rõ)"""
+    return hashlib.sha256(f"{supabase_url}|{supabase_key}".encode("utf-8")).hexdigest()
+
+def _configure_connection_pool(client):
+    """Thay HTTP session của PostgREST bằng session có giới hạn pool và keep-alive"""
+    try:
+        import httpx
+    except ImportError:
+        return client
+    
+    postgrest = getattr(client, "postgrest", None)
+    session = getattr(postgrest, "session", None)
+    if session is None:
+        return client
+    
+    try:
+        pooled_session = httpx.Client(
+            base_url=session.base_url,
+            headers=session.headers,
+            timeout=session.timeout,
+            limits=httpx.Limits(
+                max_connections=SUPABASE_POOL_SIZE,
+                max_keepalive_connections=SUPABASE_KEEPALIVE_SIZE,
+                keepalive_expiry=SUPABASE_KEEPALIVE_EXPIRY,
+            ),
+            # Ghi kích thước phản hồi cho số liệu Supabase (db_metrics) mà không mã hóa lại dữ liệu
+            event_hooks={"response": [record_response_size]},
+        )
+        session.close()
+        postgrest.session = pooled_session
+    except Exception as e:
+        # Không cấu hình được pool thì vẫn dùng session mặc định
+        print(f"Không thể cấu hình pool kết nối Supabase: {e}")
+    return client
+
+def _close_client(client):
+    """Đóng các kết nối HTTP của một client cũ"""
+    session = getattr(getattr(client, "postgrest", None), "session", None)
+    try:
+        if session is not None:
+            session.close()
+    except Exception as e:
+        print(f"Lỗi khi đóng kết nối Supabase: {e}")
+
+def _needs_health_check(entry):
+    """Đánh dấu đã đến lượt kiểm tra sức khỏe client (gọi khi đang giữ khóa registry)
+
+    Chỉ một luồng nhận lượt kiểm tra trong mỗi chu kỳ, các luồng khác dùng client ngay.
+    """
+    now = time.monotonic()
+    if now - entry["checked_at"] < SUPABASE_HEALTH_CHECK_INTERVAL:
+        return False
+    entry["checked_at"] = now
+    return True
+
+def _is_client_healthy(entry):
+    """Gửi một truy vấn nhỏ để kiểm tra client, trả về False nếu cần tạo lại"""
+    try:
+        entry["client"].table("questions").select("id").limit(1).execute()
+        return True
+    except Exception as e:
+        print(f"Supabase client không còn hoạt động, sẽ tạo lại: {e}")
+        return False
+
 def get_supabase_client():
-    """Tạo và trả về Supabase client"""
+    """Trả về Supabase client dùng chung cho toàn bộ tiến trình"""
     supabase_url = os.environ.get("SUPABASE_URL")
     supabase_key = os.environ.get("SUPABASE_KEY")
     
@@ -29,13 +127,44 @@ def get_supabase_client():
         st.error("Biến môi trường SUPABASE_URL và SUPABASE_KEY chưa được thiết lập.")
         return None
     
-    try:
-        # Tạo Supabase client
-        supabase = create_client(supabase_url, supabase_key)
-        return supabase
-    except Exception as e:
-        st.error(f"Không thể kết nối đến Supabase: {e}")
-        return None
+    fingerprint = _credentials_fingerprint(supabase_url, supabase_key)
+    
+    with _client_registry_lock:
+        entry = _client_registry.get(fingerprint)
+        check_health = entry is not None and _needs_health_check(entry)
+    
+    # Truy vấn kiểm tra chạy ngoài khóa để không chặn các luồng khác theo độ trễ mạng
+    if check_health and not _is_client_healthy(entry):
+        with _client_registry_lock:
+            if _client_registry.get(fingerprint) is entry:
+                _close_client(entry["client"])
+                del _client_registry[fingerprint]
+        entry = None
+    
+    if entry is not None:
+        return entry["client"]
+    
+    with _client_registry_lock:
+        # Luồng khác có thể đã tạo client trong lúc chờ khóa
+        entry = _client_registry.get(fingerprint)
+        if entry is None:
+            # Thông tin kết nối đã thay đổi hoặc client hỏng: hủy các client cũ
+            for old_entry in _client_registry.values():
+                _close_client(old_entry["client"])
+            _client_registry.clear()
+            
+            try:
+                # Tạo Supabase client với pool kết nối dùng chung
+                client = _configure_connection_pool(create_client(supabase_url, supabase_key))
+            except Exception as e:
+                st.error(f"Không thể kết nối đến Supabase: {e}")
+                return None
+            
+            # Bọc client để đo thời gian, số dòng và kích thước của mọi lệnh table()/rpc()
+            entry = {"client": instrument_client(client), "checked_at": time.monotonic()}
+            _client_registry[fingerprint] = entry
+        
+        return entry["client"]
 
 def test_supabase_connection():
     """Kiểm tra kết nối với Supabase"""
@@ -50,39 +179,53 @@ def test_supabase_connection():
     except Exception as e:
         return False, f"Lỗi khi truy vấn: {str(e)}"
 
-def get_all_questions():
-    """Lấy tất cả câu hỏi từ database"""
+def _fetch_all_questions():
+    """Tải tất cả câu hỏi từ database, trả về None nếu lỗi"""
     try:
         supabase = get_supabase_client()
         if not supabase:
-            return []
+            return None
             
         result = supabase.table("questions").select("*").order("id").execute()
         if result.data:
-            # Đảm bảo dữ liệu được trả về đúng định dạng
+            # Đảm bảo dữ liệu được trả về đúng định dạng (cột JSONB đã là list, không cần giải mã)
             for q in result.data:
-                # Kiểm tra và chuyển đổi dữ liệu answers
-                if isinstance(q["answers"], str):
-                    try:
-                        q["answers"] = json.loads(q["answers"])
-                    except:
-                        q["answers"] = [q["answers"]]
-                
-                # Kiểm tra và chuyển đổi dữ liệu correct
-                if isinstance(q["correct"], str):
-                    try:
-                        q["correct"] = json.loads(q["correct"])
-                    except:
-                        try:
-                            q["correct"] = [int(x.strip()) for x in q["correct"].split(",")]
-                        except:
-                            q["correct"] = []
+                decode_question(q)
             return result.data
         return []
     except Exception as e:
         st.error(f"Lỗi khi lấy danh sách câu hỏi: {e}")
+        return None
+
+def invalidate_questions_cache():
+    """Tăng phiên bản ngân hàng câu hỏi để cache được tải lại ở lần đọc tiếp theo"""
+    global _questions_version
+    with _questions_cache_lock:
+        _questions_version += 1
+
+@timed("get_all_questions")
+def get_all_questions():
+    """Lấy tất cả câu hỏi (có cache theo TTL và phiên bản ngân hàng câu hỏi)"""
+    with _questions_cache_lock:
+        version = _questions_version
+        cached = _questions_cache.get(version)
+        if cached is not None and time.monotonic() - cached["loaded_at"] < QUESTIONS_CACHE_TTL:
+            # Trả về bản sao để nơi gọi có thể sửa mà không ảnh hưởng cache
+            return copy.deepcopy(cached["data"])
+    
+    questions = _fetch_all_questions()
+    if questions is None:
         return []
+    
+    with _questions_cache_lock:
+        # Chỉ lưu khi không có thay đổi nào xảy ra trong lúc tải
+        if version == _questions_version:
+            _questions_cache.clear()
+            _questions_cache[version] = {"data": questions, "loaded_at": time.monotonic()}
+    
+    return copy.deepcopy(questions)
 
+@timed("get_question_by_id")
 def get_question_by_id(question_id):
     """Lấy thông tin câu hỏi theo ID"""
     try:
@@ -92,29 +235,13 @@ def get_question_by_id(question_id):
             
         result = supabase.table("questions").select("*").eq("id", question_id).execute()
         if result.data:
-            q = result.data[0]
-            # Kiểm tra và chuyển đổi dữ liệu answers
-            if isinstance(q["answers"], str):
-                try:
-                    q["answers"] = json.loads(q["answers"])
-                except:
-                    q["answers"] = [q["answers"]]
-            
-            # Kiểm tra và chuyển đổi dữ liệu correct
-            if isinstance(q["correct"], str):
-                try:
-                    q["correct"] = json.loads(q["correct"])
-                except:
-                    try:
-                        q["correct"] = [int(x.strip()) for x in q["correct"].split(",")]
-                    except:
-                        q["correct"] = []
-            return q
+            return decode_question(result.data[0])
         return None
     except Exception as e:
         st.error(f"Lỗi khi lấy câu hỏi: {e}")
         return None
 
+@timed("save_question")
 def save_question(question_data):
     """Lưu câu hỏi mới vào database"""
     try:
@@ -123,24 +250,18 @@ def save_question(question_data):
             st.error("Không thể kết nối đến Supabase.")
             return False
             
-        # Kiểm tra định dạng dữ liệu trước khi lưu
-        data_to_save = question_data.copy()
-        
-        # Chuyển đổi answers thành JSON nếu cần
-        if isinstance(data_to_save["answers"], list):
-            data_to_save["answers"] = json.dumps(data_to_save["answers"])
-        
-        # Chuyển đổi correct thành JSON nếu cần
-        if isinstance(data_to_save["correct"], list):
-            data_to_save["correct"] = json.dumps(data_to_save["correct"])
+        # Chuyển answers/correct sang định dạng cột trước khi lưu
+        data_to_save = encode_question(question_data)
         
         # Thêm vào database
         result = supabase.table("questions").insert(data_to_save).execute()
+        invalidate_questions_cache()
         return True if result.data else False
     except Exception as e:
         st.error(f"Lỗi khi lưu câu hỏi: {e}")
         return False
 
+@timed("update_question")
 def update_question(question_id, updated_data):
     """Cập nhật thông tin câu hỏi theo ID"""
     try:
@@ -149,24 +270,18 @@ def update_question(question_id, updated_data):
             st.error("Không thể kết nối đến Supabase.")
             return False
             
-        # Kiểm tra định dạng dữ liệu trước khi lưu
-        data_to_save = updated_data.copy()
-        
-        # Chuyển đổi answers thành JSON nếu cần
-        if isinstance(data_to_save["answers"], list):
-            data_to_save["answers"] = json.dumps(data_to_save["answers"])
-        
-        # Chuyển đổi correct thành JSON nếu cần
-        if isinstance(data_to_save["correct"], list):
-            data_to_save["correct"] = json.dumps(data_to_save["correct"])
+        # Chuyển answers/correct sang định dạng cột trước khi lưu
+        data_to_save = encode_question(updated_data)
         
         # Cập nhật vào database
         result = supabase.table("questions").update(data_to_save).eq("id", question_id).execute()
+        invalidate_questions_cache()
         return True if result.data else False
     except Exception as e:
         st.error(f"Lỗi khi cập nhật câu hỏi: {e}")
         return False
 
+@timed("delete_question")
 def delete_question(question_id):
     """Xóa câu hỏi theo ID"""
     try:
@@ -176,11 +291,13 @@ def delete_question(question_id):
             return False
             
         result = supabase.table("questions").delete().eq("id", question_id).execute()
+        invalidate_questions_cache()
         return True if result.data else False
     except Exception as e:
         st.error(f"Lỗi khi xóa câu hỏi: {e}")
         return False
 
+@timed("save_submission")
 def save_submission(email, responses):
     """Lưu bài làm của học viên và tính điểm"""
     try:
@@ -195,25 +312,13 @@ def save_submission(email, responses):
         # Tính điểm dựa trên câu trả lời
         score = calculate_score(responses, questions)
         
-        # Tìm id lớn nhất hiện tại
-        try:
-            max_id_result = supabase.table("submissions").select("id").order("id", desc=True).limit(1).execute()
-            if max_id_result.data:
-                new_id = max_id_result.data[0]["id"] + 1
-            else:
-                new_id = 1
-        except Exception as e:
-            st.error(f"Lỗi khi tìm id lớn nhất: {e}")
-            new_id = 1
-        
         # Tạo timestamp đúng định dạng ISO cho PostgreSQL
         current_time = datetime.now().isoformat()
         
-        # Dữ liệu cần lưu
+        # Dữ liệu cần lưu (id do sequence của database cấp, xem sql/001_submissions_id_sequence.sql)
         submission_data = {
-            "id": new_id,
             "user_email": email,
-            "responses": json.dumps(responses),
+            "responses": encode_json_column(responses),
             "score": score,
             "timestamp": current_time  # Sử dụng ISO format thay vì Unix timestamp
         }
@@ -222,6 +327,12 @@ def save_submission(email, responses):
         result = supabase.table("submissions").insert(submission_data).execute()
         
         if result.data:
+            new_id = result.data[0]["id"]
+            submission_data["id"] = new_id
+            
+            # Cập nhật tăng dần các bộ đếm thống kê
+            record_submission_statistics(submission_data, questions)
+            
             # Trả về kết quả bài làm
             return {
                 "id": new_id,
@@ -238,48 +349,10 @@ def save_submission(email, responses):
 
 def calculate_score(responses, questions):
     """Tính điểm dựa trên đáp án và câu trả lời"""
-    total_score = 0
-    
-    for q in questions:
-        q_id = str(q["id"])
-        
-        # Lấy câu trả lời của học viên
-        student_answers = responses.get(q_id, [])
-        
-        # Kiểm tra đáp án
-        if check_answer_correctness(student_answers, q):
-            total_score += q["score"]
-    
+    total_score, _ = grade_responses(responses, compile_questions(questions))
     return total_score
 
-def check_answer_correctness(student_answers, question):
-    """Kiểm tra đáp án có đúng không, hỗ trợ chọn nhiều đáp án."""
-    # Nếu câu trả lời trống, không đúng
-    if not student_answers:
-        return False
-        
-    # Đối với câu hỏi combobox (chỉ chọn một)
-    if question["type"] == "Combobox":
-        # Nếu có một đáp án và đáp án đó ở vị trí nằm trong danh sách đáp án đúng
-        if len(student_answers) == 1:
-            answer_text = student_answers[0]
-            answer_index = question["answers"].index(answer_text) + 1 if answer_text in question["answers"] else -1
-            return answer_index in question["correct"]
-        return False
-    
-    # Đối với câu hỏi checkbox (nhiều lựa chọn)
-    elif question["type"] == "Checkbox":
-        # Tìm index (vị trí) của các đáp án học viên đã chọn
-        selected_indices = []
-        for ans in student_answers:
-            if ans in question["answers"]:
-                selected_indices.append(question["answers"].index(ans) + 1)
-        
-        # So sánh với danh sách đáp án đúng
-        return set(selected_indices) == set(question["correct"])
-    
-    return False
-
+@timed("get_user")
 def get_user(email, password):
     """Kiểm tra đăng nhập và trả về thông tin người dùng"""
     try:
@@ -332,6 +405,7 @@ def get_user(email, password):
         print(f"DEBUG ERROR: {type(e).__name__}: {str(e)}")
         return None
     
+@timed("get_user_submissions")
 def get_user_submissions(email):
     """Lấy tất cả bài làm của một học viên theo email"""
     try:
@@ -347,13 +421,7 @@ def get_user_submissions(email):
             submissions = []
             for s in result.data:
                 # Chuyển đổi responses từ JSON string thành dict
-                if isinstance(s["responses"], str):
-                    try:
-                        s["responses"] = json.loads(s["responses"])
-                    except:
-                        s["responses"] = {}
-                
-                submissions.append(s)
+                submissions.append(decode_submission(s))
             
             return submissions
         
@@ -362,123 +430,267 @@ def get_user_submissions(email):
         st.error(f"Lỗi khi lấy bài làm của học viên: {e}")
         return []
 
+def scan_submissions(supabase, user_emails=None, columns="*", after_id=0, page_size=SUBMISSIONS_PAGE_SIZE):
+    """Duyệt bài nộp theo id tăng dần, mỗi lần chỉ tải một trang (keyset pagination trên id)
+    
+    `columns` phải gồm cột id. Chỉ giữ một trang trong bộ nhớ nên dùng được cho lịch sử bài nộp
+    lớn tùy ý; trang sau luôn bắt đầu từ id cuối của trang trước nên không bị lệch khi có bài mới.
+    Lỗi khi tải một trang được ném ra ngoài để nơi gọi không xử lý nhầm dữ liệu dở dang như đã đủ.
+    """
+    last_id = after_id
+    while True:
+        query = supabase.table("submissions").select(columns).gt("id", last_id)
+        if user_emails is not None:
+            query = query.in_("user_email", list(user_emails))
+        result = query.order("id").limit(page_size).execute()
+        rows = result.data or []
+        
+        for s in rows:
+            yield decode_submission(s) if "responses" in s else s
+        
+        if len(rows) < page_size:
+            return
+        last_id = rows[-1]["id"]
+
+def iter_submissions(user_emails=None, columns="*", after_id=0, page_size=SUBMISSIONS_PAGE_SIZE):
+    """Như scan_submissions nhưng tự lấy client và báo lỗi bằng st.error (dùng trên luồng script)"""
+    try:
+        supabase = get_supabase_client()
+        if not supabase:
+            st.error("Không thể kết nối đến Supabase.")
+            return
+        
+        yield from scan_submissions(supabase, user_emails, columns, after_id, page_size)
+    except Exception as e:
+        st.error(f"Lỗi khi duyệt danh sách bài nộp: {e}")
+
+@timed("get_all_submissions")
+def get_all_submissions(user_emails=None, page=None, page_size=SUBMISSIONS_PAGE_SIZE):
+    """Lấy bài nộp theo id tăng dần, có thể lọc theo danh sách email
+    
+    Nếu truyền `page` (bắt đầu từ 0) thì chỉ lấy đúng trang đó, ngược lại lấy toàn bộ.
+    Nơi chỉ cần duyệt một lượt nên dùng iter_submissions để không giữ toàn bộ trong bộ nhớ.
+    """
+    if page is None:
+        return list(iter_submissions(user_emails=user_emails, page_size=page_size))
+    
+    try:
+        supabase = get_supabase_client()
+        if not supabase:
+            st.error("Không thể kết nối đến Supabase.")
+            return []
+        
+        start = page * page_size
+        query = supabase.table("submissions").select("*")
+        if user_emails is not None:
+            query = query.in_("user_email", list(user_emails))
+        result = query.order("id").range(start, start + page_size - 1).execute()
+        
+        return [decode_submission(s) for s in result.data or []]
+    except Exception as e:
+        st.error(f"Lỗi khi lấy danh sách bài nộp: {e}")
+        return []
+
+def group_submissions_by_email(submissions):
+    """Nhóm bài nộp theo user_email, mỗi nhóm sắp xếp mới nhất trước như get_user_submissions"""
+    submissions_by_email = {}
+    for s in submissions:
+        submissions_by_email.setdefault(s.get("user_email", ""), []).append(s)
+    
+    for email_submissions in submissions_by_email.values():
+        email_submissions.sort(key=lambda s: str(s.get("timestamp") or ""), reverse=True)
+    
+    return submissions_by_email
+
+def _questions_fingerprint(questions):
+    """Dấu vân tay của ngân hàng câu hỏi, thay đổi khi nội dung chấm điểm thay đổi"""
+    payload = json.dumps(
+        [[q.get("id"), q.get("type"), q.get("answers"), q.get("correct"), q.get("score")] for q in questions],
+        ensure_ascii=False,
+        default=str
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def _new_stats_store(questions, fingerprint):
+    """Tạo kho thống kê rỗng cho một phiên bản ngân hàng câu hỏi"""
+    return {
+        "questions_fingerprint": fingerprint,
+        "watermark": None,  # inserted_at lớn nhất đã gộp qua truy vấn đồng bộ
+        "recent_ids": {},  # id -> inserted_at của các bài trong khoảng chồng lấn trước mốc (để loại trùng)
+        "pending_ids": set(),  # id đã gộp trực tiếp khi lưu bài nhưng chưa gặp lại qua đồng bộ
+        "aggregates": new_aggregates(questions),
+    }
+
+def _parse_inserted_at(value):
+    return datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+
+def _fetch_submissions_since(since, page_size=SUBMISSIONS_PAGE_SIZE):
+    """Tải các bài nộp có inserted_at >= since (None: toàn bộ), theo thứ tự ghi
+
+    Báo lỗi ra ngoài thay vì st.error để nơi gọi chuyển sang tổng hợp toàn bộ khi database
+    chưa có cột inserted_at (sql/005_submissions_inserted_at.sql).
+    """
+    supabase = get_supabase_client()
+    if not supabase:
+        raise RuntimeError("Không thể kết nối đến Supabase.")
+    
+    start = 0
+    while True:
+        query = supabase.table("submissions").select("id,user_email,responses,score,timestamp,inserted_at")
+        if since is not None:
+            query = query.gte("inserted_at", since.isoformat())
+        # Dòng commit muộn chỉ có thể chen vào trước vị trí đang đọc (đẩy các dòng sau lùi lại),
+        # nên phân trang theo vị trí không bỏ sót dòng nào; dòng đọc lặp được loại theo id
+        result = query.order("inserted_at").order("id").range(start, start + page_size - 1).execute()
+        rows = result.data or []
+        for s in rows:
+            yield decode_submission(s)
+        if len(rows) < page_size:
+            return
+        start += page_size
+
+def _sync_stats_store(store, compiled_questions, new_submissions):
+    """Gộp các bài nộp đã tải vào kho thống kê (gọi khi đang giữ _stats_store_lock)
+
+    Bỏ qua bài đã gộp (theo id trong khoảng chồng lấn hoặc đã gộp khi lưu bài), dời mốc
+    theo inserted_at lớn nhất và chỉ giữ lại id trong khoảng chồng lấn mới.
+    """
+    for s in new_submissions:
+        inserted_at = _parse_inserted_at(s["inserted_at"])
+        if s["id"] in store["recent_ids"]:
+            continue
+        store["recent_ids"][s["id"]] = inserted_at
+        if s["id"] in store["pending_ids"]:
+            # Đã được cộng dồn ngay khi lưu bài
+            store["pending_ids"].discard(s["id"])
+        else:
+            fold_submission(store["aggregates"], s, compiled_questions)
+        if store["watermark"] is None or inserted_at > store["watermark"]:
+            store["watermark"] = inserted_at
+    
+    if store["watermark"] is not None:
+        window_start = store["watermark"] - timedelta(seconds=STATS_SYNC_OVERLAP_SECONDS)
+        store["recent_ids"] = {i: t for i, t in store["recent_ids"].items() if t >= window_start}
+
+def record_submission_statistics(submission, questions):
+    """Cập nhật tăng dần kho thống kê với một bài nộp vừa lưu"""
+    with _stats_store_lock:
+        store = _stats_store
+        # Kho chưa được tạo hoặc đã lỗi thời sẽ được dựng lại ở lần đọc tiếp theo
+        if store is None or store["questions_fingerprint"] != _questions_fingerprint(questions):
+            return
+        if submission["id"] in store["recent_ids"] or submission["id"] in store["pending_ids"]:
+            return
+        
+        fold_submission(store["aggregates"], submission, compile_questions(questions))
+        store["pending_ids"].add(submission["id"])
+
+def reset_submission_statistics():
+    """Xóa kho thống kê để dựng lại ở lần đọc tiếp theo (ví dụ sau khi chấm lại điểm)"""
+    global _stats_store
+    with _stats_store_lock:
+        _stats_store = None
+
+def _statistics_from_aggregates(aggregates, questions, total_possible_score):
+    """Chuyển bộ tổng hợp (từ RPC hoặc kho thống kê) thành kết quả thống kê cho dashboard"""
+    total_submissions = aggregates["total_submissions"]
+    
+    if total_submissions == 0:
+        return {
+            "total_submissions": 0,
+            "student_count": 0,
+            "avg_score": 0,
+            "avg_percentage": 0,
+            "total_possible_score": total_possible_score,
+            "question_stats": {},
+            "daily_counts": {},
+            "score_distribution": {}
+        }
+    
+    # Tính điểm trung bình
+    avg_score = aggregates["score_sum"] / total_submissions
+    avg_percentage = (avg_score / total_possible_score * 100) if total_possible_score > 0 else 0
+    
+    # Tỷ lệ đúng sai cho từng câu hỏi từ các bộ đếm đã tính sẵn
+    question_stats = {}
+    for q in questions:
+        q_id = str(q["id"])
+        counters = aggregates["questions"][q_id]
+        total_answers = counters["present"]
+        correct_count = counters["correct"]
+        
+        question_stats[q_id] = {
+            "question": q["question"],
+            "total_answers": total_answers,
+            "correct_count": correct_count,
+            "correct_percentage": (correct_count / total_answers * 100) if total_answers > 0 else 0
+        }
+    
+    # Kết quả thống kê
+    return {
+        "total_submissions": total_submissions,
+        "student_count": student_count(aggregates),
+        "avg_score": avg_score,
+        "avg_percentage": avg_percentage,
+        "total_possible_score": total_possible_score,
+        "question_stats": question_stats,
+        "daily_counts": dict(aggregates["daily_counts"]),
+        "score_distribution": dict(aggregates["score_distribution"])
+    }
+
+@timed("get_submission_statistics")
 def get_submission_statistics():
-    """Lấy thống kê về các bài nộp"""
+    """Lấy thống kê về các bài nộp, ưu tiên tổng hợp phía Postgres qua RPC"""
+    global _stats_store
     try:
         supabase = get_supabase_client()
         if not supabase:
             st.error("Không thể kết nối đến Supabase.")
             return None
-            
-        # Lấy tất cả bài nộp
-        submissions_result = supabase.table("submissions").select("*").execute()
-        submissions = submissions_result.data if submissions_result.data else []
         
         # Lấy danh sách câu hỏi
         questions = get_all_questions()
-        
-        # Tính số lượng bài nộp
-        total_submissions = len(submissions)
-        
-        if total_submissions == 0:
-            return {
-                "total_submissions": 0,
-                "student_count": 0,
-                "avg_score": 0,
-                "avg_percentage": 0,
-                "total_possible_score": sum(q["score"] for q in questions),
-                "question_stats": {},
-                "daily_counts": {}
-            }
-        
-        # Tính điểm trung bình
         total_possible_score = sum(q["score"] for q in questions)
-        avg_score = sum(s["score"] for s in submissions) / total_submissions if total_submissions > 0 else 0
-        avg_percentage = (avg_score / total_possible_score * 100) if total_possible_score > 0 else 0
-        
-        # Tính số lượng học viên đã nộp bài
-        # Sửa từ "email" thành "user_email"
-        unique_students = set(s["user_email"] for s in submissions)
-        student_count = len(unique_students)
-        
-        # Tính tỷ lệ đúng sai cho từng câu hỏi
-        question_stats = {}
-        for q in questions:
-            q_id = str(q["id"])
-            correct_count = 0
-            total_answers = 0
-            
-            for s in submissions:
-                # Chuyển đổi responses từ JSON string thành dict nếu cần
-                if isinstance(s["responses"], str):
-                    try:
-                        responses = json.loads(s["responses"])
-                    except:
-                        responses = {}
-                else:
-                    responses = s["responses"]
-                
-                if q_id in responses:
-                    total_answers += 1
-                    student_answers = responses[q_id]
-                    if check_answer_correctness(student_answers, q):
-                        correct_count += 1
-            
-            correct_percentage = (correct_count / total_answers * 100) if total_answers > 0 else 0
-            
-            question_stats[q_id] = {
-                "question": q["question"],
-                "total_answers": total_answers,
-                "correct_count": correct_count,
-                "correct_percentage": correct_percentage
-            }
         
-        # Thống kê theo thời gian
-        # Chuyển đổi timestamp sang datetime cho dễ đọc
-        for s in submissions:
-            # Nếu timestamp đã ở dạng datetime (từ PostgreSQL)
-            if isinstance(s["timestamp"], (str, datetime)):
-                if isinstance(s["timestamp"], str):
-                    try:
-                        s["datetime"] = datetime.fromisoformat(s["timestamp"].replace("Z", "+00:00"))
-                    except:
-                        s["datetime"] = datetime.now()  # Giá trị mặc định nếu không thể parse
-                else:
-                    s["datetime"] = s["timestamp"]
-            else:
-                # Nếu vẫn còn lưu dạng Unix timestamp (dữ liệu cũ)
-                try:
-                    s["datetime"] = datetime.fromtimestamp(s["timestamp"])
-                except:
-                    s["datetime"] = datetime.now()
-        
-        # Nhóm theo ngày
-        submissions_by_date = {}
-        for s in submissions:
-            date_str = s["datetime"].strftime("%Y-%m-%d")
-            if date_str not in submissions_by_date:
-                submissions_by_date[date_str] = []
-            submissions_by_date[date_str].append(s)
-        
-        # Tính số lượng bài nộp theo ngày
-        daily_counts = {date: len(subs) for date, subs in submissions_by_date.items()}
-        
-        # Kết quả thống kê
-        stats = {
-            "total_submissions": total_submissions,
-            "student_count": student_count,
-            "avg_score": avg_score,
-            "avg_percentage": avg_percentage,
-            "total_possible_score": total_possible_score,
-            "question_stats": question_stats,
-            "daily_counts": daily_counts
-        }
-        
-        return stats
+        # Database đã có hàm submission_statistics: chỉ nhận về vài KB kết quả tổng hợp
+        aggregates = fetch_aggregates(supabase, questions)
+        if aggregates is not None:
+            return _statistics_from_aggregates(aggregates, questions, total_possible_score)
+        
+        fingerprint = _questions_fingerprint(questions)
+        compiled_questions = compile_questions(questions)
+        with _stats_store_lock:
+            # Dựng lại kho khi đáp án/điểm thay đổi, ngược lại chỉ đồng bộ phần mới
+            if _stats_store is None or _stats_store["questions_fingerprint"] != fingerprint:
+                _stats_store = _new_stats_store(questions, fingerprint)
+            store = _stats_store
+            watermark = store["watermark"]
+        
+        # Tải dữ liệu ngoài khóa để lượt lưu bài (record_submission_statistics) không phải chờ mạng
+        since = None if watermark is None else watermark - timedelta(seconds=STATS_SYNC_OVERLAP_SECONDS)
+        try:
+            new_submissions = list(_fetch_submissions_since(since))
+        except Exception as e:
+            # Database chưa có cột inserted_at: tổng hợp lại toàn bộ, không dùng kho
+            print(f"Không thể đồng bộ tăng dần kho thống kê, tổng hợp toàn bộ: {e}")
+            aggregates = aggregate_submissions(scan_submissions(supabase, columns="id,user_email,responses,score,timestamp"), questions)
+            return _statistics_from_aggregates(aggregates, questions, total_possible_score)
+        
+        with _stats_store_lock:
+            if _stats_store is store:
+                _sync_stats_store(store, compiled_questions, new_submissions)
+                return _statistics_from_aggregates(store["aggregates"], questions, total_possible_score)
+        
+        # Kho bị dựng lại trong lúc tải (chấm lại điểm...): lần đọc sau sẽ đồng bộ kho mới
+        if since is not None:
+            new_submissions = _fetch_submissions_since(None)
+        aggregates = aggregate_submissions(new_submissions, questions)
+        return _statistics_from_aggregates(aggregates, questions, total_possible_score)
     except Exception as e:
         st.error(f"Lỗi khi lấy thống kê bài nộp: {e}")
         return None
-    
+
+@timed("get_all_users")
 def get_all_users(role=None):
     """Lấy danh sách tất cả người dùng, có thể lọc theo vai trò"""
     try:
@@ -508,6 +720,7 @@ def get_all_users(role=None):
         st.error(f"Lỗi khi lấy danh sách người dùng: {e}")
         return []
 
+@timed("register_user")
 def register_user(email, password, full_name, class_name, role="student"):
     """Đăng ký người dùng mới"""
     try:
@@ -548,6 +761,7 @@ def register_user(email, password, full_name, class_name, role="student"):
         st.error(f"Lỗi đăng ký người dùng: {e}")
         return False, f"Lỗi: {str(e)}"
 
+@timed("update_password")
 def update_password(email, old_password, new_password):
     """Cập nhật mật khẩu người dùng"""
     try:
@@ -574,6 +788,7 @@ def update_password(email, old_password, new_password):
         st.error(f"Lỗi cập nhật mật khẩu: {e}")
         return False, f"Lỗi: {str(e)}"
 
+@timed("update_user_profile")
 def update_user_profile(email, full_name=None, class_name=None):
     """Cập nhật thông tin cá nhân của người dùng"""
     try:
@@ -606,6 +821,7 @@ def update_user_profile(email, full_name=None, class_name=None):
         st.error(f"Lỗi cập nhật thông tin: {e}")
         return False, f"Lỗi: {str(e)}"
 
+@timed("check_email_exists")
 def check_email_exists(email):
     """Kiểm tra xem email đã tồn tại trong hệ thống hay chưa"""
     try:
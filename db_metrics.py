@@ -0,0 +1,289 @@
+import os
+import json
+import math
+import time
+import tempfile
+import threading
+import functools
+from collections import deque
+
+# Đo thời gian các lệnh Supabase (mặc định bật; DB_METRICS_ENABLED=0 để tắt)
+DB_METRICS_ENABLED = os.environ.get("DB_METRICS_ENABLED", "1").lower() not in ("0", "false", "no")
+# Số lần gọi gần nhất giữ lại cho mỗi thao tác để tính phân vị
+DB_METRICS_WINDOW = int(os.environ.get("DB_METRICS_WINDOW", "500"))
+# File metrics dạng Prometheus (vd. cho textfile collector của node_exporter), để trống nếu không ghi
+DB_METRICS_PROM_PATH = os.environ.get("DB_METRICS_PROM_PATH", "")
+DB_METRICS_EXPORT_INTERVAL = float(os.environ.get("DB_METRICS_EXPORT_INTERVAL", "15"))  # giây
+# Khi không đọc được kích thước từ HTTP: ước lượng theo JSON cho 1 trong N lần gọi, các lần khác nhân số dòng
+DB_METRICS_SIZE_SAMPLE_EVERY = int(os.environ.get("DB_METRICS_SIZE_SAMPLE_EVERY", "20"))
+
+PERCENTILES = (0.5, 0.9, 0.99)
+# Tiền tố tên thao tác cho số liệu đo theo cả hàm (decorator timed)
+FUNCTION_PREFIX = "function."
+
+# Các phương thức PostgREST xác định loại thao tác trên bảng
+_QUERY_VERBS = ("select", "insert", "update", "upsert", "delete")
+
+_metrics = {}  # (thao tác, hàm gọi) -> số liệu
+_metrics_lock = threading.Lock()
+_last_export = 0.0
+_local = threading.local()
+_size_samples = {}  # thao tác -> {"calls", "bytes_per_row"} cho ước lượng kích thước
+
+def _new_metric():
+    return {
+        "latencies": deque(maxlen=DB_METRICS_WINDOW),
+        "rows": deque(maxlen=DB_METRICS_WINDOW),
+        "bytes": deque(maxlen=DB_METRICS_WINDOW),
+        "count": 0,
+        "errors": 0,
+        "latency_sum": 0.0,
+        "rows_sum": 0,
+        "bytes_sum": 0,
+    }
+
+def record(operation, seconds, rows=0, payload_bytes=0, error=False, caller=None):
+    """Ghi một lần gọi: thời gian (giây), số dòng và kích thước dữ liệu trả về"""
+    key = (operation, caller or current_caller())
+    with _metrics_lock:
+        metric = _metrics.get(key)
+        if metric is None:
+            metric = _metrics[key] = _new_metric()
+        metric["latencies"].append(seconds)
+        metric["rows"].append(rows)
+        metric["bytes"].append(payload_bytes)
+        metric["count"] += 1
+        metric["errors"] += 1 if error else 0
+        metric["latency_sum"] += seconds
+        metric["rows_sum"] += rows
+        metric["bytes_sum"] += payload_bytes
+    _maybe_export()
+
+def percentile(values, q):
+    """Phân vị theo thứ hạng gần nhất của một dãy giá trị (0 nếu rỗng)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))
+    return ordered[index]
+
+def snapshot():
+    """Số liệu hiện tại của mọi thao tác, sắp theo tổng thời gian giảm dần"""
+    with _metrics_lock:
+        items = [(key, list(m["latencies"]), list(m["rows"]), list(m["bytes"]), dict(m)) for key, m in _metrics.items()]
+
+    rows = []
+    for (operation, caller), latencies, row_counts, sizes, metric in items:
+        row = {
+            "operation": operation,
+            "caller": caller,
+            "count": metric["count"],
+            "errors": metric["errors"],
+            "latency_sum": metric["latency_sum"],
+            "avg_rows": sum(row_counts) / len(row_counts) if row_counts else 0,
+            "avg_bytes": sum(sizes) / len(sizes) if sizes else 0,
+            "rows_sum": metric["rows_sum"],
+            "bytes_sum": metric["bytes_sum"],
+        }
+        for q in PERCENTILES:
+            row[f"p{int(q * 100)}"] = percentile(latencies, q)
+        rows.append(row)
+    rows.sort(key=lambda row: row["latency_sum"], reverse=True)
+    return rows
+
+def reset():
+    """Xóa toàn bộ số liệu đã ghi"""
+    with _metrics_lock:
+        _metrics.clear()
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def _summary_lines(name, help_text, rows, label_names):
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} summary"]
+    for row in rows:
+        labels = ",".join(f'{label}="{_label(value)}"' for label, value in zip(label_names, row["labels"]))
+        for q in PERCENTILES:
+            lines.append(f'{name}{{{labels},quantile="{q}"}} {row[f"p{int(q * 100)}"]:.6f}')
+        lines.append(f"{name}_sum{{{labels}}} {row['latency_sum']:.6f}")
+        lines.append(f"{name}_count{{{labels}}} {row['count']}")
+    return lines
+
+def prometheus_text():
+    """Số liệu dạng text exposition của Prometheus"""
+    requests = []
+    functions = []
+    for row in snapshot():
+        if row["operation"].startswith(FUNCTION_PREFIX):
+            functions.append(dict(row, labels=(row["caller"],)))
+        else:
+            requests.append(dict(row, labels=(row["operation"], row["caller"])))
+
+    lines = _summary_lines(
+        "supabase_request_duration_seconds", "Thời gian mỗi lệnh Supabase (phân vị trên cửa sổ trượt)",
+        requests, ("operation", "caller")
+    )
+    for name, field, help_text in (
+        ("supabase_request_errors_total", "errors", "Số lệnh Supabase bị lỗi"),
+        ("supabase_response_rows_total", "rows_sum", "Tổng số dòng Supabase trả về"),
+        ("supabase_response_bytes_total", "bytes_sum", "Tổng kích thước dữ liệu Supabase trả về (byte theo HTTP, hoặc ước lượng)"),
+    ):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} counter")
+        for row in requests:
+            lines.append(f'{name}{{operation="{_label(row["operation"])}",caller="{_label(row["caller"])}"}} {row[field]}')
+
+    lines += _summary_lines(
+        "db_helper_duration_seconds", "Thời gian của cả hàm truy vấn trong database_helper",
+        functions, ("function",)
+    )
+    return "\n".join(lines) + "\n"
+
+def write_prometheus_file(path=None):
+    """Ghi metrics ra file (ghi file tạm rồi đổi tên để collector không đọc file dở)"""
+    path = path or DB_METRICS_PROM_PATH
+    if not path:
+        return
+    try:
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(prometheus_text())
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Không thể ghi file metrics: {e}")
+
+def _maybe_export():
+    global _last_export
+    if not DB_METRICS_PROM_PATH:
+        return
+    now = time.monotonic()
+    with _metrics_lock:
+        if now - _last_export < DB_METRICS_EXPORT_INTERVAL:
+            return
+        _last_export = now
+    write_prometheus_file()
+
+def current_caller():
+    """Tên hàm database_helper đang chạy trên luồng hiện tại ("-" nếu gọi trực tiếp)"""
+    stack = getattr(_local, "callers", None)
+    return stack[-1] if stack else "-"
+
+def timed(name):
+    """Decorator ghi thời gian của cả một hàm truy vấn và gắn tên hàm cho các lệnh Supabase bên trong"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not DB_METRICS_ENABLED:
+                return func(*args, **kwargs)
+            stack = getattr(_local, "callers", None)
+            if stack is None:
+                stack = _local.callers = []
+            stack.append(name)
+            start = time.perf_counter()
+            error = False
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                error = True
+                raise
+            finally:
+                stack.pop()
+                record(f"{FUNCTION_PREFIX}{name}", time.perf_counter() - start, error=error, caller=name)
+        return wrapper
+    return decorator
+
+def record_response_size(response):
+    """Event hook "response" của httpx: ghi kích thước body của phản hồi cho luồng hiện tại
+
+    Dùng Content-Length nếu có, ngược lại đọc body (httpx vẫn đọc body ngay sau hook)
+    và lấy độ dài, không mã hóa lại dữ liệu.
+    """
+    content_length = response.headers.get("content-length")
+    if content_length is not None and content_length.isdigit():
+        _local.response_bytes = int(content_length)
+    else:
+        response.read()
+        _local.response_bytes = len(response.content)
+
+def _estimated_size(operation, data, rows):
+    """Kích thước ước lượng khi không có số liệu HTTP: đo theo JSON định kỳ, còn lại nhân số dòng"""
+    with _metrics_lock:
+        sample = _size_samples.setdefault(operation, {"calls": 0, "bytes_per_row": None})
+        measure = sample["bytes_per_row"] is None or sample["calls"] % max(1, DB_METRICS_SIZE_SAMPLE_EVERY) == 0
+        sample["calls"] += 1
+        bytes_per_row = sample["bytes_per_row"]
+    if not measure:
+        return int(rows * bytes_per_row)
+    try:
+        payload_bytes = len(json.dumps(data, ensure_ascii=False, default=str).encode("utf-8"))
+    except (TypeError, ValueError):
+        return 0
+    with _metrics_lock:
+        sample["bytes_per_row"] = payload_bytes / max(1, rows)
+    return payload_bytes
+
+def _result_size(operation, data, response_bytes=None):
+    """Số dòng và kích thước (byte) của dữ liệu trả về"""
+    if data is None:
+        return 0, response_bytes or 0
+    rows = len(data) if isinstance(data, list) else 1
+    if response_bytes is None:
+        response_bytes = _estimated_size(operation, data, rows)
+    return rows, response_bytes
+
+class _InstrumentedQuery:
+    """Bọc query builder của PostgREST: ghi thời gian, số dòng và kích thước khi execute()"""
+    def __init__(self, builder, target, verb=None):
+        self._builder = builder
+        self._target = target
+        self._verb = verb
+
+    def __getattr__(self, name):
+        attr = getattr(self._builder, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            if hasattr(result, "execute"):
+                return _InstrumentedQuery(result, self._target, name if name in _QUERY_VERBS else self._verb)
+            return result
+        return call
+
+    def execute(self):
+        operation = f"{self._target}.{self._verb}" if self._verb else self._target
+        _local.response_bytes = None
+        start = time.perf_counter()
+        try:
+            result = self._builder.execute()
+        except Exception:
+            record(operation, time.perf_counter() - start, error=True)
+            raise
+        elapsed = time.perf_counter() - start
+        rows, payload_bytes = _result_size(operation, getattr(result, "data", None), _local.response_bytes)
+        record(operation, elapsed, rows, payload_bytes)
+        return result
+
+class InstrumentedClient:
+    """Bọc Supabase client: mọi lệnh table()/rpc() được đo, các thuộc tính khác giữ nguyên"""
+    def __init__(self, client):
+        self._client = client
+
+    def table(self, table_name):
+        return _InstrumentedQuery(self._client.table(table_name), table_name)
+
+    def from_(self, table_name):
+        return self.table(table_name)
+
+    def rpc(self, fn, *args, **kwargs):
+        return _InstrumentedQuery(self._client.rpc(fn, *args, **kwargs), f"rpc.{fn}")
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+def instrument_client(client):
+    """Trả về client đã được bọc đo thời gian (hoặc client gốc khi tắt DB_METRICS_ENABLED)"""
+    if not DB_METRICS_ENABLED or client is None:
+        return client
+    return InstrumentedClient(client)
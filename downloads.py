@@ -0,0 +1,226 @@
+import os
+import weakref
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+import streamlit as st
+
+DOCX_MIME = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+PDF_MIME = "application/pdf"
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+ZIP_MIME = "application/zip"
+
+# Thư mục chứa file xuất đã tạo (nút tải xuống đọc thẳng từ file, không giữ nội dung trong bộ nhớ)
+EXPORT_DIR = os.environ.get("EXPORT_DIR", os.path.join(tempfile.gettempdir(), "report_exports"))
+# Số luồng tạo file xuất chạy nền (ngoài luồng chạy script của Streamlit)
+EXPORT_WORKERS = int(os.environ.get("EXPORT_WORKERS", "2"))
+# Tổng dung lượng (byte) file đã tạo giữ lại dùng chung giữa các phiên (theo khóa và phiên bản dữ liệu)
+EXPORT_CACHE_MAX_BYTES = int(os.environ.get("EXPORT_CACHE_MAX_BYTES", str(200 * 1024 * 1024)))
+# Thời gian (giây) chờ file nhỏ tạo xong ngay trong lượt chạy trước khi báo "đang tạo"
+EXPORT_WAIT_SECONDS = float(os.environ.get("EXPORT_WAIT_SECONDS", "2"))
+
+# Khóa trong session_state chứa các tác vụ xuất của phiên: khóa tải xuống -> {"version", "job"}
+_REGISTRY_KEY = "_download_registry"
+
+_export_executor = None
+_export_jobs = OrderedDict()  # (khóa, phiên bản dữ liệu) -> Future của đường dẫn file, dùng chung giữa các phiên
+_export_sizes = {}  # (khóa, phiên bản dữ liệu) -> dung lượng file của tác vụ đã xong
+_export_lock = threading.Lock()
+
+class _SessionExports(dict):
+    """Các tác vụ xuất của một phiên; file chỉ thuộc phiên (không có phiên bản) bị xóa khi phiên kết thúc"""
+    def __init__(self):
+        super().__init__()
+        self.private_jobs = set()
+        weakref.finalize(self, _remove_job_files, self.private_jobs)
+
+def _registry():
+    if _REGISTRY_KEY not in st.session_state:
+        st.session_state[_REGISTRY_KEY] = _SessionExports()
+    return st.session_state[_REGISTRY_KEY]
+
+def _get_executor():
+    global _export_executor
+    with _export_lock:
+        if _export_executor is None:
+            _export_executor = ThreadPoolExecutor(max_workers=max(1, EXPORT_WORKERS), thread_name_prefix="export")
+        return _export_executor
+
+def artifact_path(artifact, file_name):
+    """Đưa kết quả tạo file (bytes, BytesIO hoặc đường dẫn file tạm) về một file trong EXPORT_DIR"""
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    if isinstance(artifact, str) and os.path.isfile(artifact):
+        # File tạm (vd. Excel ghi theo luồng) được chuyển sang, không đọc vào bộ nhớ
+        fd, path = tempfile.mkstemp(dir=EXPORT_DIR, suffix=os.path.splitext(file_name)[1])
+        os.close(fd)
+        os.replace(artifact, path)
+        return path
+    if hasattr(artifact, "getvalue"):
+        artifact = artifact.getvalue()
+    if isinstance(artifact, (bytes, bytearray)):
+        fd, path = tempfile.mkstemp(dir=EXPORT_DIR, suffix=os.path.splitext(file_name)[1])
+        with os.fdopen(fd, "wb") as f:
+            f.write(artifact)
+        return path
+    raise ValueError("Không đọc được nội dung file đã tạo")
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+def _remove_job_files(jobs):
+    """Xóa file của các tác vụ đã xong (tác vụ lỗi không có file)"""
+    for job in list(jobs):
+        if job.done() and job.exception() is None:
+            _remove_file(job.result())
+    jobs.clear()
+
+def _run_export(build, file_name):
+    path = artifact_path(build(), file_name)
+    if os.path.getsize(path) == 0:
+        _remove_file(path)
+        raise ValueError(f"Không thể tạo {file_name}.")
+    return path
+
+def _shared_job(key, version):
+    """Tác vụ xuất dùng chung cho khóa và phiên bản dữ liệu, None nếu chưa có"""
+    if version is None:
+        return None
+    with _export_lock:
+        job = _export_jobs.get((key, version))
+        if job is not None:
+            _export_jobs.move_to_end((key, version))
+        return job
+
+def _remember_job(key, version, job):
+    """Lưu tác vụ để các phiên khác dùng lại"""
+    if version is None:
+        return
+    with _export_lock:
+        _export_jobs[(key, version)] = job
+    job.add_done_callback(lambda done, job_key=(key, version): _account_job(job_key, done))
+
+def _account_job(job_key, job):
+    """Ghi dung lượng file vừa tạo, xóa file ít dùng nhất khi tổng vượt EXPORT_CACHE_MAX_BYTES"""
+    if job.exception() is not None:
+        return
+    with _export_lock:
+        if _export_jobs.get(job_key) is not job:
+            return
+        try:
+            _export_sizes[job_key] = os.path.getsize(job.result())
+        except OSError:
+            return
+        total_size = sum(_export_sizes.values())
+        for old_key in list(_export_jobs):
+            if total_size <= EXPORT_CACHE_MAX_BYTES:
+                break
+            # Giữ file vừa tạo; tác vụ đang chạy chưa có file
+            if old_key == job_key or old_key not in _export_sizes:
+                continue
+            total_size -= _export_sizes.pop(old_key)
+            _remove_job_files([_export_jobs.pop(old_key)])
+
+def _forget_job(key, version, job):
+    with _export_lock:
+        if _export_jobs.get((key, version)) is job:
+            del _export_jobs[(key, version)]
+            _export_sizes.pop((key, version), None)
+    entry = _registry().get(key)
+    if entry is not None and entry["job"] is job:
+        del _registry()[key]
+    if job in _registry().private_jobs:
+        _registry().private_jobs.discard(job)
+        _remove_job_files([job])
+
+def _drop_private_job(key):
+    """Xóa file của tác vụ chỉ thuộc phiên khi khóa được gán tác vụ khác"""
+    entry = _registry().get(key)
+    if entry is not None and entry["job"] in _registry().private_jobs:
+        _registry().private_jobs.discard(entry["job"])
+        _remove_job_files([entry["job"]])
+
+def get_export(key, version=None):
+    """Tác vụ xuất của khóa cho phiên bản dữ liệu hiện tại, None nếu chưa được yêu cầu"""
+    entry = _registry().get(key)
+    if entry is not None and entry["version"] == version:
+        return entry["job"]
+
+    job = _shared_job(key, version)
+    if job is not None:
+        _drop_private_job(key)
+        _registry()[key] = {"version": version, "job": job}
+    return job
+
+def submit_export(key, build, file_name, version=None):
+    """Đưa việc tạo file vào hàng đợi chạy nền, trả về Future của đường dẫn file đã tạo
+
+    Với `version` khác None, kết quả được dùng lại cho mọi phiên có cùng khóa và phiên bản
+    dữ liệu; không có phiên bản thì chỉ dùng trong phiên hiện tại.
+    """
+    job = get_export(key, version)
+    if job is None:
+        job = _get_executor().submit(_run_export, build, file_name)
+        _remember_job(key, version, job)
+        _drop_private_job(key)
+        if version is None:
+            _registry().private_jobs.add(job)
+        _registry()[key] = {"version": version, "job": job}
+    return job
+
+def clear_downloads():
+    """Bỏ các tác vụ xuất của phiên làm việc và xóa file chỉ thuộc phiên"""
+    _remove_job_files(_registry().private_jobs)
+    _registry().clear()
+
+def download_button(key, label, file_name, mime, build, version=None):
+    """Nút tải xuống với file được tạo trễ, chạy nền và dùng lại theo phiên bản dữ liệu
+
+    Lần đầu hiển thị nút "Tạo"; khi bấm, build() được đưa vào luồng nền. Các lượt chạy lại
+    của trang chỉ kiểm tra trạng thái tác vụ và hiển thị st.download_button khi đã có nội dung,
+    không tạo lại file. build() chạy ngoài luồng script nên không gọi st.*: lỗi được ném ra
+    và hiển thị tại đây.
+    """
+    job = get_export(key, version)
+
+    if job is None:
+        if not st.button(f"⚙️ Tạo {label}", key=f"prepare_{key}"):
+            return False
+        job = submit_export(key, build, file_name, version)
+
+    if not job.done():
+        try:
+            with st.spinner(f"Đang tạo {file_name}..."):
+                job.result(timeout=EXPORT_WAIT_SECONDS)
+        except FutureTimeoutError:
+            st.info(f"⏳ Đang tạo {file_name} ở chế độ nền...")
+            st.button("🔄 Kiểm tra lại", key=f"refresh_{key}")
+            return False
+        except Exception:
+            pass  # Lỗi được xử lý bên dưới
+
+    error = job.exception()
+    if error is not None:
+        # Bỏ tác vụ lỗi để lần bấm sau tạo lại
+        _forget_job(key, version, job)
+        st.error(f"Lỗi khi tạo {file_name}: {str(error)}")
+        return False
+
+    try:
+        # Truyền file đang mở để Streamlit đọc thẳng từ đĩa
+        with open(job.result(), "rb") as f:
+            st.download_button(
+                f"📥 {label}",
+                data=f,
+                file_name=file_name,
+                mime=mime,
+                key=f"download_{key}"
+            )
+    except FileNotFoundError:
+        # File đã bị xóa khỏi cache dùng chung: tạo lại ở lượt chạy sau
+        _forget_job(key, version, job)
+        st.rerun()
+    return True
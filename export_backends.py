@@ -0,0 +1,73 @@
+import importlib
+import importlib.util
+import threading
+from importlib import metadata
+
+from render_cache import cached_render, report_cache_key
+
+# Module chứa các hàm tạo file (python-docx, fpdf, openpyxl), chỉ import khi cần xuất file lần đầu
+EXPORTS_MODULE = "report_exports"
+
+_capabilities = {}
+_capabilities_lock = threading.Lock()
+_exports = None
+
+def _cached_capability(key, detect):
+    with _capabilities_lock:
+        if key not in _capabilities:
+            _capabilities[key] = detect()
+        return _capabilities[key]
+
+def module_available(module_name):
+    """Module có cài đặt không (chỉ tìm, không import), kết quả lưu lại cho cả tiến trình"""
+    def detect():
+        try:
+            return importlib.util.find_spec(module_name) is not None
+        except (ImportError, ValueError):
+            return False
+    return _cached_capability(("module", module_name), detect)
+
+def package_version(distribution_name):
+    """Phiên bản gói đã cài đặt (đọc metadata, không import), None nếu chưa cài"""
+    def detect():
+        try:
+            return metadata.version(distribution_name)
+        except metadata.PackageNotFoundError:
+            return None
+    return _cached_capability(("version", distribution_name), detect)
+
+def fpdf_version():
+    """Phiên bản fpdf đang cài (gói fpdf2 hoặc fpdf), None nếu chưa cài"""
+    return package_version("fpdf2") or package_version("fpdf")
+
+def load_exports():
+    """Import module tạo file ở lần xuất đầu tiên và dùng lại cho các lần sau"""
+    global _exports
+    if _exports is None:
+        _exports = importlib.import_module(EXPORTS_MODULE)
+    return _exports
+
+def dataframe_to_docx(df, title, filename):
+    """Tạo file DOCX từ DataFrame"""
+    return load_exports().dataframe_to_docx(df, title, filename)
+
+def dataframe_to_pdf_fpdf(df, title, filename):
+    """Tạo file PDF từ DataFrame"""
+    return load_exports().dataframe_to_pdf_fpdf(df, title, filename)
+
+def export_to_excel(dataframes, sheet_names):
+    """Xuất nhiều DataFrame vào một file Excel, trả về đường dẫn file tạm"""
+    return load_exports().export_to_excel(dataframes, sheet_names)
+
+def render_student_report(fmt, student_name, student_email, student_class, submission, questions, max_possible):
+    """Tạo báo cáo chi tiết học viên ("docx" hoặc "pdf"), dùng lại bản đã tạo trong cache nếu có"""
+    exports = load_exports()
+    builder = exports.create_student_report_docx if fmt == "docx" else exports.create_student_report_pdf_fpdf
+    key = report_cache_key(
+        fmt, exports.REPORT_TEMPLATE_VERSION, submission, questions,
+        student_name, student_email, student_class, max_possible
+    )
+    return cached_render(
+        key,
+        lambda: builder(student_name, student_email, student_class, submission, questions, max_possible)
+    )
@@ -0,0 +1,80 @@
+from collections import namedtuple
+from functools import lru_cache
+from types import MappingProxyType
+
+from column_codec import decode_answers, decode_correct, decode_responses
+
+# Dạng đã biên dịch của một câu hỏi: bảng tra cứu đáp án -> vị trí (bắt đầu từ 1) và tập đáp án đúng
+CompiledQuestion = namedtuple(
+    "CompiledQuestion",
+    ["id", "type", "score", "answers", "answer_index", "correct"]
+)
+
+@lru_cache(maxsize=4096)
+def _compile(question_id, question_type, answers, correct, score):
+    answer_index = {}
+    for position, answer in enumerate(answers, start=1):
+        # Giữ vị trí xuất hiện đầu tiên giống list.index()
+        answer_index.setdefault(answer, position)
+
+    return CompiledQuestion(
+        id=question_id,
+        type=question_type,
+        score=score,
+        answers=answers,
+        answer_index=MappingProxyType(answer_index),
+        correct=frozenset(correct)
+    )
+
+def compile_question(question):
+    """Biên dịch một câu hỏi thành CompiledQuestion (có cache theo nội dung câu hỏi)"""
+    if isinstance(question, CompiledQuestion):
+        return question
+
+    return _compile(
+        str(question.get("id", "")),
+        question.get("type"),
+        tuple(decode_answers(question.get("answers", []))),
+        tuple(decode_correct(question.get("correct", []))),
+        question.get("score", 0) or 0
+    )
+
+def compile_questions(questions):
+    """Biên dịch danh sách câu hỏi, giữ nguyên thứ tự"""
+    return [compile_question(q) for q in questions]
+
+def is_answer_correct(student_answers, compiled):
+    """Kiểm tra câu trả lời với câu hỏi đã biên dịch"""
+    # Nếu câu trả lời trống, không đúng
+    if not student_answers:
+        return False
+
+    # Đối với câu hỏi combobox (chỉ chọn một)
+    if compiled.type == "Combobox":
+        if len(student_answers) == 1:
+            return compiled.answer_index.get(student_answers[0], -1) in compiled.correct
+        return False
+
+    # Đối với câu hỏi checkbox (nhiều lựa chọn): tập vị trí đã chọn phải trùng tập đáp án đúng
+    elif compiled.type == "Checkbox":
+        answer_index = compiled.answer_index
+        selected_indices = {answer_index[ans] for ans in student_answers if ans in answer_index}
+        return selected_indices == compiled.correct
+
+    return False
+
+def check_answer_correctness(student_answers, question):
+    """Kiểm tra đáp án có đúng không, hỗ trợ chọn nhiều đáp án."""
+    return is_answer_correct(student_answers, compile_question(question))
+
+def grade_responses(responses, compiled_questions):
+    """Chấm một bài làm, trả về (điểm, danh sách đúng/sai theo thứ tự câu hỏi)"""
+    responses = decode_responses(responses)
+    results = [is_answer_correct(responses.get(cq.id, []), cq) for cq in compiled_questions]
+    score = sum(cq.score for cq, is_correct in zip(compiled_questions, results) if is_correct)
+    return score, results
+
+def grade_submissions(submissions, questions):
+    """Chấm hàng loạt bài nộp, câu hỏi chỉ được biên dịch một lần cho cả lô"""
+    compiled_questions = compile_questions(questions)
+    return [grade_responses(s.get("responses", {}), compiled_questions) for s in submissions]
@@ -0,0 +1,24 @@
+import importlib
+import threading
+
+_import_lock = threading.Lock()
+
+def lazy_function(module_name, function_name):
+    """Hàm thay thế import module_name.function_name: module chỉ được import ở lần gọi đầu tiên
+
+    Dùng cho các trang quản trị/báo cáo (kéo theo pandas, matplotlib, python-docx, fpdf...) để
+    học viên chỉ làm bài khảo sát không phải tải các thư viện này.
+    """
+    loaded = []
+
+    def call(*args, **kwargs):
+        if not loaded:
+            with _import_lock:
+                if not loaded:
+                    loaded.append(getattr(importlib.import_module(module_name), function_name))
+        return loaded[0](*args, **kwargs)
+
+    call.__name__ = function_name
+    call.__qualname__ = function_name
+    call.__doc__ = f"Gọi {module_name}.{function_name} (import khi gọi lần đầu)"
+    return call
@@ -0,0 +1,125 @@
+import os
+import tempfile
+import threading
+
+_current_dir = os.path.dirname(os.path.abspath(__file__))
+
+# Các đường dẫn có thể chứa font
+FONT_DIRS = [
+    os.path.join(_current_dir, 'assets', 'fonts'),
+    os.path.join(_current_dir, 'fonts'),
+    os.path.join(_current_dir, 'assets'),
+    _current_dir,
+    os.getcwd(),
+    '/usr/share/fonts/truetype',
+    '/usr/share/fonts/truetype/dejavu',
+    '/usr/share/fonts/TTF',
+    'C:\\Windows\\Fonts',
+]
+
+# Các font tiếng Việt cần tìm theo thứ tự ưu tiên
+VIETNAMESE_FONT_FILES = [
+    ('DejaVuSans', 'DejaVuSans.ttf'),
+    ('DejaVuSans-Bold', 'DejaVuSans-Bold.ttf'),
+    ('DejaVuSans-Oblique', 'DejaVuSans-Oblique.ttf'),
+    ('Arial', 'arial.ttf'),
+    ('Arial-Bold', 'arialbd.ttf'),
+    ('Arial-Italic', 'ariali.ttf'),
+    ('TimesNewRoman', 'times.ttf'),
+    ('TimesNewRoman-Bold', 'timesbd.ttf'),
+]
+
+# Thư mục lưu metrics font đã parse (FPDF1 dùng lại giữa các lần tạo PDF và giữa các tiến trình)
+FONT_CACHE_DIR = os.environ.get("FONT_CACHE_DIR", os.path.join(tempfile.gettempdir(), "pdf_font_cache"))
+
+_font_lock = threading.Lock()
+_resolved_fonts = {}  # tuple danh sách font cần tìm -> [(tên font, đường dẫn)]
+_fpdf2 = None
+_reportlab_registered = set()
+
+def is_fpdf2():
+    """Thư viện fpdf đang dùng có phải FPDF2 không (kiểm tra một lần mỗi tiến trình)"""
+    global _fpdf2
+    if _fpdf2 is None:
+        try:
+            import fpdf
+            _fpdf2 = str(getattr(fpdf, "FPDF_VERSION", "")).startswith("2.")
+            if not _fpdf2:
+                _enable_fpdf1_font_cache()
+        except ImportError:
+            _fpdf2 = False
+    return _fpdf2
+
+def _enable_fpdf1_font_cache():
+    """Bật cache metrics font của FPDF1 (file .pkl) trong thư mục riêng có quyền ghi"""
+    try:
+        from fpdf.fpdf import set_global
+        os.makedirs(FONT_CACHE_DIR, exist_ok=True)
+        set_global("FPDF_CACHE_MODE", 2)
+        set_global("FPDF_CACHE_DIR", FONT_CACHE_DIR)
+    except Exception as e:
+        print(f"Không thể bật cache font cho FPDF: {str(e)}")
+
+def resolve_fonts(font_files=None):
+    """Danh sách (tên font, đường dẫn) tìm được trên máy, chỉ quét thư mục một lần mỗi tiến trình"""
+    key = tuple(font_files or VIETNAMESE_FONT_FILES)
+    with _font_lock:
+        if key not in _resolved_fonts:
+            found = []
+            for font_name, font_file in key:
+                for font_dir in FONT_DIRS:
+                    font_path = os.path.join(font_dir, font_file)
+                    if os.path.isfile(font_path):
+                        found.append((font_name, font_path))
+                        break
+            _resolved_fonts[key] = found
+        return list(_resolved_fonts[key])
+
+def font_family_and_style(font_name):
+    """Tách tên font thành họ font và kiểu FPDF ("DejaVuSans-Bold" -> ("DejaVuSans", "B"))"""
+    family, _, variant = font_name.partition('-')
+    if variant == 'Bold':
+        return family, 'B'
+    if variant in ('Oblique', 'Italic'):
+        return family, 'I'
+    return font_name, ''
+
+def register_fonts(pdf, font_files=None):
+    """Đăng ký các font tìm được cho một đối tượng FPDF, trả về danh sách (tên font, đường dẫn)
+
+    Mỗi file font chỉ được thêm một lần cho mỗi tài liệu (add_font của fpdf2 phân tích lại file TTF
+    mỗi lần gọi): biến thể được thêm dưới họ font với kiểu tương ứng (vd. "DejaVuSans-Bold" thành
+    "DejaVuSans", "B"), font thường dưới tên của nó. Đường dẫn và phiên bản fpdf được tra cứu
+    từ registry, không quét lại.
+    """
+    fonts = resolve_fonts(font_files)
+    fpdf2 = is_fpdf2()
+    added_paths = set()
+    for font_name, font_path in fonts:
+        if font_path in added_paths:
+            continue
+        added_paths.add(font_path)
+        family, style = font_family_and_style(font_name)
+        try:
+            if fpdf2:
+                pdf.add_font(family, style, font_path)
+            else:
+                pdf.add_font(family, style, font_path, uni=True)
+        except Exception as e:
+            print(f"Lỗi khi thêm font {family} {style}: {str(e)}")
+    return fonts
+
+def register_reportlab_fonts(pdfmetrics, TTFont, font_files=None):
+    """Đăng ký font với reportlab (bảng font toàn cục) một lần mỗi tiến trình"""
+    fonts = resolve_fonts(font_files)
+    with _font_lock:
+        for font_name, font_path in fonts:
+            if font_name in _reportlab_registered:
+                continue
+            try:
+                pdfmetrics.registerFont(TTFont(font_name, font_path))
+                _reportlab_registered.add(font_name)
+                print(f"Đã đăng ký font {font_name} từ {font_path}")
+            except Exception as e:
+                print(f"Không thể đăng ký font {font_name} cho reportlab: {str(e)}")
+    return fonts
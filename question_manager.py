@@ -1,10 +1,18 @@
 import streamlit as st
-from database_helper import save_question, get_all_questions, get_question_by_id, update_question, delete_question
-import json
+from database_helper import save_question, get_all_questions, get_question_by_id, update_question, delete_question, invalidate_questions_cache
+from regrade import regrade_status, start_background_regrade
+from column_codec import decode_answers, decode_correct
 
 def manage_questions():
     st.title("Quản lý câu hỏi")
     
+    # Trạng thái chấm lại điểm chạy nền sau khi sửa câu hỏi
+    regrade = regrade_status()
+    if regrade["running"]:
+        st.info("⏳ Điểm của các bài nộp đang được chấm lại ở chế độ nền.")
+    elif regrade["last_error"]:
+        st.warning(f"Lỗi khi chấm lại bài nộp: {regrade['last_error']}")
+    
     # Khi bấm Tab này, tải câu hỏi từ database
     if "db_questions" not in st.session_state:
         st.session_state.db_questions = get_all_questions()
@@ -128,23 +136,10 @@ def list_questions():
                 
                 st.write("**Các đáp án:**")
                 # Đảm bảo answers là list
-                answers = q["answers"]
-                if isinstance(answers, str):
-                    try:
-                        answers = json.loads(answers)
-                    except:
-                        answers = [answers]
+                answers = decode_answers(q["answers"])
                 
                 # Đảm bảo correct là list
-                correct = q["correct"]
-                if isinstance(correct, str):
-                    try:
-                        correct = json.loads(correct)
-                    except:
-                        try:
-                            correct = [int(x.strip()) for x in correct.split(",")]
-                        except:
-                            correct = []
+                correct = decode_correct(q["correct"])
                 
                 for j, ans in enumerate(answers):
                     is_correct = (j + 1) in correct
@@ -165,6 +160,7 @@ def list_questions():
                     st.rerun()
                     
         if st.button("🔄 Làm mới danh sách", key="refresh_question_list"):
+            invalidate_questions_cache()
             st.session_state.db_questions = get_all_questions()
             st.rerun()
 
@@ -184,36 +180,13 @@ def edit_question():
     
     # Sao chép danh sách đáp án để có thể chỉnh sửa
     if "edited_answers" not in st.session_state:
-        # Đảm bảo q["answers"] là danh sách
-        if isinstance(q["answers"], str):
-            try:
-                # Nếu là JSON string, thử chuyển đổi thành list
-                answers_list = json.loads(q["answers"])
-                st.session_state.edited_answers = answers_list
-            except:
-                # Nếu không thể parse JSON, tạo list từ string
-                st.session_state.edited_answers = [q["answers"]]
-        else:
-            # Nếu đã là list, sao chép nó
-            st.session_state.edited_answers = list(q["answers"])
+        # Đảm bảo q["answers"] là danh sách (sao chép để không sửa câu hỏi gốc)
+        st.session_state.edited_answers = list(decode_answers(q["answers"]))
     
     # Sao chép đáp án đúng
     if "edited_correct" not in st.session_state:
-        # Đảm bảo q["correct"] là danh sách
-        if isinstance(q["correct"], str):
-            try:
-                # Nếu là JSON string, thử chuyển đổi thành list
-                correct_list = json.loads(q["correct"])
-                st.session_state.edited_correct = correct_list
-            except:
-                # Nếu không thể parse JSON, thử chuyển đổi từ dạng "1,2,3" thành [1,2,3]
-                try:
-                    st.session_state.edited_correct = [int(x.strip()) for x in q["correct"].split(",")]
-                except:
-                    st.session_state.edited_correct = []
-        else:
-            # Nếu đã là list, sao chép nó
-            st.session_state.edited_correct = list(q["correct"])
+        # Đảm bảo q["correct"] là danh sách (sao chép để không sửa câu hỏi gốc)
+        st.session_state.edited_correct = list(decode_correct(q["correct"]))
     
     # Quản lý danh sách đáp án
     st.subheader("Danh sách đáp án")
@@ -335,23 +308,10 @@ def list_questions():
                 
                 st.write("**Các đáp án:**")
                 # Đảm bảo answers là list
-                answers = q["answers"]
-                if isinstance(answers, str):
-                    try:
-                        answers = json.loads(answers)
-                    except:
-                        answers = [answers]
+                answers = decode_answers(q["answers"])
                 
                 # Đảm bảo correct là list
-                correct = q["correct"]
-                if isinstance(correct, str):
-                    try:
-                        correct = json.loads(correct)
-                    except:
-                        try:
-                            correct = [int(x.strip()) for x in correct.split(",")]
-                        except:
-                            correct = []
+                correct = decode_correct(q["correct"])
                 
                 for j, ans in enumerate(answers):
                     is_correct = (j + 1) in correct
@@ -372,6 +332,7 @@ def list_questions():
                     st.rerun()
                     
         if st.button("🔄 Làm mới danh sách", key="refresh_question_list"):
+            invalidate_questions_cache()
             st.session_state.db_questions = get_all_questions()
             st.rerun()
 
@@ -391,36 +352,13 @@ def edit_question():
     
     # Sao chép danh sách đáp án để có thể chỉnh sửa
     if "edited_answers" not in st.session_state:
-        # Đảm bảo q["answers"] là danh sách
-        if isinstance(q["answers"], str):
-            try:
-                # Nếu là JSON string, thử chuyển đổi thành list
-                answers_list = json.loads(q["answers"])
-                st.session_state.edited_answers = answers_list
-            except:
-                # Nếu không thể parse JSON, tạo list từ string
-                st.session_state.edited_answers = [q["answers"]]
-        else:
-            # Nếu đã là list, sao chép nó
-            st.session_state.edited_answers = list(q["answers"])
+        # Đảm bảo q["answers"] là danh sách (sao chép để không sửa câu hỏi gốc)
+        st.session_state.edited_answers = list(decode_answers(q["answers"]))
     
     # Sao chép đáp án đúng
     if "edited_correct" not in st.session_state:
-        # Đảm bảo q["correct"] là danh sách
-        if isinstance(q["correct"], str):
-            try:
-                # Nếu là JSON string, thử chuyển đổi thành list
-                correct_list = json.loads(q["correct"])
-                st.session_state.edited_correct = correct_list
-            except:
-                # Nếu không thể parse JSON, thử chuyển đổi từ dạng "1,2,3" thành [1,2,3]
-                try:
-                    st.session_state.edited_correct = [int(x.strip()) for x in q["correct"].split(",")]
-                except:
-                    st.session_state.edited_correct = []
-        else:
-            # Nếu đã là list, sao chép nó
-            st.session_state.edited_correct = list(q["correct"])
+        # Đảm bảo q["correct"] là danh sách (sao chép để không sửa câu hỏi gốc)
+        st.session_state.edited_correct = list(decode_correct(q["correct"]))
     
     # Quản lý danh sách đáp án
     st.subheader("Danh sách đáp án")
@@ -503,6 +441,9 @@ def save_edited_question(q_id, edited_question, edited_type, edited_score):
     
     # Lưu thay đổi vào database
     if update_question(q_id, updated_data):
+        # Chấm lại toàn bộ bài nộp ở luồng nền để điểm đã lưu không bị lỗi thời
+        start_background_regrade(get_all_questions())
+        
         # Xóa dữ liệu chỉnh sửa
         st.session_state.editing_question = None
         if "edited_answers" in st.session_state:
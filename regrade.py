@@ -0,0 +1,184 @@
+import os
+import threading
+import numpy as np
+import streamlit as st
+from itertools import islice
+
+from grading import compile_questions
+from column_codec import decode_responses
+from database_helper import get_supabase_client, scan_submissions, reset_submission_statistics
+
+# Số id tối đa trong một lệnh update khi ghi lại điểm (giới hạn độ dài URL của bộ lọc in)
+REGRADE_UPDATE_BATCH_SIZE = 200
+# Số bài nộp được chấm lại cùng lúc (giới hạn kích thước ma trận lựa chọn)
+REGRADE_CHUNK_SIZE = 5000
+
+_regrade_lock = threading.Lock()
+_regrade_state = {"running": False, "pending": None, "last_result": None, "last_error": None}
+
+def build_selection_matrix(all_responses, compiled):
+    """Tạo ma trận bool (số bài nộp × số đáp án) đánh dấu đáp án đã chọn của một câu hỏi
+
+    Trả về (ma trận lựa chọn, số đáp án thô mỗi bài nộp đã chọn).
+    """
+    selected = np.zeros((len(all_responses), len(compiled.answers)), dtype=bool)
+    answer_counts = np.zeros(len(all_responses), dtype=np.int64)
+    rows = []
+    cols = []
+
+    for row, responses in enumerate(all_responses):
+        answers = responses.get(compiled.id) or []
+        answer_counts[row] = len(answers)
+        for ans in answers:
+            position = compiled.answer_index.get(ans)
+            if position is not None:
+                rows.append(row)
+                cols.append(position - 1)
+
+    selected[np.asarray(rows, dtype=np.intp), np.asarray(cols, dtype=np.intp)] = True
+    return selected, answer_counts
+
+def build_correct_mask(compiled):
+    """Tạo mặt nạ đáp án đúng, kèm cờ cho biết có vị trí đáp án đúng không hợp lệ"""
+    mask = np.zeros(len(compiled.answers), dtype=bool)
+    has_invalid = False
+    for position in compiled.correct:
+        if isinstance(position, int) and 1 <= position <= len(compiled.answers):
+            mask[position - 1] = True
+        else:
+            has_invalid = True
+    return mask, has_invalid
+
+def grade_question_vectorized(all_responses, compiled):
+    """Chấm một câu hỏi cho toàn bộ bài nộp bằng phép so sánh vector"""
+    selected, answer_counts = build_selection_matrix(all_responses, compiled)
+    mask, has_invalid = build_correct_mask(compiled)
+    answered = answer_counts > 0
+
+    if compiled.type == "Combobox":
+        # Đúng khi chọn đúng một đáp án và đáp án đó nằm trong tập đáp án đúng
+        return (answer_counts == 1) & (selected & mask).any(axis=1)
+
+    if compiled.type == "Checkbox":
+        # Vị trí đáp án đúng không tồn tại thì không bài nào có thể khớp
+        if has_invalid:
+            return np.zeros(len(all_responses), dtype=bool)
+        return answered & (selected == mask).all(axis=1)
+
+    return np.zeros(len(all_responses), dtype=bool)
+
+def regrade_scores(submissions, questions):
+    """Tính lại điểm cho danh sách bài nộp, trả về mảng điểm theo thứ tự bài nộp"""
+    all_responses = [decode_responses(s.get("responses", {})) for s in submissions]
+    scores = np.zeros(len(submissions))
+
+    for compiled in compile_questions(questions):
+        scores += grade_question_vectorized(all_responses, compiled) * compiled.score
+
+    return scores
+
+def _score_value(score):
+    return int(score) if float(score).is_integer() else float(score)
+
+def _write_scores(supabase, submissions, new_scores, changed_rows):
+    """Ghi điểm mới: mỗi nhóm bài cùng điểm là một lệnh update ... where id in (...), chỉ gửi cột score"""
+    ids_by_score = {}
+    for row in changed_rows:
+        ids_by_score.setdefault(_score_value(new_scores[row]), []).append(submissions[row]["id"])
+
+    for score, ids in ids_by_score.items():
+        for start in range(0, len(ids), REGRADE_UPDATE_BATCH_SIZE):
+            supabase.table("submissions").update({"score": score}).in_("id", ids[start:start + REGRADE_UPDATE_BATCH_SIZE]).execute()
+
+def _regrade(supabase, questions):
+    """Chấm lại toàn bộ bài nộp, trả về (số bài đã chấm, số bài thay đổi điểm)
+
+    Lỗi khi tải hoặc ghi một phần được ném ra (kèm số bài đã xử lý) để lượt chấm lại bị đánh
+    dấu thất bại thay vì báo thành công với dữ liệu dở dang.
+    """
+    checked = 0
+    changed = 0
+    # Chỉ tải các cột cần để chấm lại
+    all_submissions = scan_submissions(supabase, columns="id,responses,score")
+
+    try:
+        # Chấm lại theo từng phần để bộ nhớ không tăng theo số bài nộp
+        while True:
+            submissions = list(islice(all_submissions, REGRADE_CHUNK_SIZE))
+            if not submissions:
+                break
+
+            new_scores = regrade_scores(submissions, questions)
+            old_scores = np.array([s.get("score", 0) or 0 for s in submissions], dtype=float)
+            changed_rows = np.flatnonzero(new_scores != old_scores)
+            _write_scores(supabase, submissions, new_scores, changed_rows)
+
+            checked += len(submissions)
+            changed += len(changed_rows)
+    except Exception as e:
+        raise RuntimeError(f"Chấm lại dừng sau {checked} bài nộp ({changed} bài đã ghi điểm mới): {e}") from e
+    finally:
+        # Các điểm đã ghi (kể cả khi dừng giữa chừng) làm điểm trung bình trong kho thống kê cũ đi
+        if changed:
+            reset_submission_statistics()
+
+    return checked, changed
+
+def regrade_all_submissions(questions):
+    """Chấm lại toàn bộ bài nộp và ghi các điểm thay đổi về database
+
+    Trả về (số bài đã chấm, số bài thay đổi điểm) hoặc None nếu lỗi.
+    """
+    try:
+        supabase = get_supabase_client()
+        if not supabase:
+            st.error("Không thể kết nối đến Supabase.")
+            return None
+        return _regrade(supabase, questions)
+    except Exception as e:
+        st.error(f"Lỗi khi chấm lại bài nộp: {e}")
+        return None
+
+def start_background_regrade(questions):
+    """Chấm lại toàn bộ bài nộp ở luồng nền
+
+    Nếu đang có lượt chấm lại, lượt đó sẽ chấm thêm một lần với ngân hàng câu hỏi mới nhất
+    khi xong. Trả về False khi chỉ xếp lịch cho lượt đang chạy.
+    """
+    with _regrade_lock:
+        _regrade_state["pending"] = questions
+        if _regrade_state["running"]:
+            return False
+        _regrade_state["running"] = True
+    threading.Thread(target=_regrade_worker, name="regrade", daemon=True).start()
+    return True
+
+def regrade_status():
+    """Trạng thái chấm lại nền: {"running", "last_result", "last_error"}"""
+    with _regrade_lock:
+        return {key: _regrade_state[key] for key in ("running", "last_result", "last_error")}
+
+def _regrade_worker():
+    while True:
+        with _regrade_lock:
+            questions = _regrade_state["pending"]
+            _regrade_state["pending"] = None
+            if questions is None:
+                _regrade_state["running"] = False
+                return
+        try:
+            # Không gọi get_supabase_client khi thiếu cấu hình để tránh st.error từ luồng nền
+            if not os.environ.get("SUPABASE_URL") or not os.environ.get("SUPABASE_KEY"):
+                raise RuntimeError("Biến môi trường SUPABASE_URL và SUPABASE_KEY chưa được thiết lập.")
+            supabase = get_supabase_client()
+            if not supabase:
+                raise RuntimeError("Không thể kết nối đến Supabase.")
+            checked_count, changed_count = _regrade(supabase, questions)
+            print(f"Đã chấm lại {checked_count} bài nộp, {changed_count} bài thay đổi điểm")
+            with _regrade_lock:
+                _regrade_state["last_result"] = (checked_count, changed_count)
+                _regrade_state["last_error"] = None
+        except Exception as e:
+            print(f"Lỗi khi chấm lại bài nộp: {e}")
+            with _regrade_lock:
+                _regrade_state["last_error"] = str(e)
@@ -0,0 +1,132 @@
+import io
+import os
+import json
+import hashlib
+import tempfile
+import threading
+
+# Thư mục lưu báo cáo đã tạo và dung lượng tối đa (byte) trước khi xóa bớt file ít dùng nhất
+RENDER_CACHE_DIR = os.environ.get("RENDER_CACHE_DIR", os.path.join(tempfile.gettempdir(), "report_render_cache"))
+RENDER_CACHE_MAX_BYTES = int(os.environ.get("RENDER_CACHE_MAX_BYTES", str(200 * 1024 * 1024)))
+
+_render_cache_lock = threading.Lock()
+# Tổng dung lượng cache (byte) theo dõi trong bộ nhớ, quét thư mục một lần ở lần ghi đầu tiên
+_cache_size = None
+
+def _content_hash(value):
+    payload = json.dumps(value, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def report_cache_key(fmt, template_version, submission, questions, student_name, student_email, student_class, max_possible):
+    """Khóa cache của một báo cáo học viên
+
+    Gồm id và nội dung bài nộp, nội dung ngân hàng câu hỏi, định dạng, phiên bản mẫu báo cáo,
+    điểm tối đa và thông tin học viên in trên báo cáo: thay đổi bất kỳ phần nào đều tạo khóa mới.
+    """
+    return _content_hash({
+        "format": fmt,
+        "template_version": template_version,
+        "submission_id": submission.get("id"),
+        "submission": _content_hash([submission.get("responses"), submission.get("score"), submission.get("timestamp")]),
+        "questions": _content_hash(questions),
+        "student": [student_name, student_email, student_class],
+        "max_possible": max_possible,
+    })
+
+def _cache_path(key):
+    return os.path.join(RENDER_CACHE_DIR, key)
+
+def get_cached_report(key):
+    """Đọc báo cáo đã tạo từ cache, trả về bytes hoặc None"""
+    path = _cache_path(key)
+    try:
+        with open(path, "rb") as f:
+            content = f.read()
+        # Cập nhật thời điểm truy cập để xóa theo thứ tự ít dùng nhất
+        os.utime(path, None)
+        return content
+    except OSError:
+        return None
+
+def put_cached_report(key, content):
+    """Lưu báo cáo vào cache (ghi file tạm rồi đổi tên để tiến trình khác không đọc file dở)"""
+    global _cache_size
+    try:
+        os.makedirs(RENDER_CACHE_DIR, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=RENDER_CACHE_DIR, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+        path = _cache_path(key)
+        with _render_cache_lock:
+            _seed_cache_size()
+            try:
+                replaced_size = os.path.getsize(path)
+            except OSError:
+                replaced_size = 0
+            os.replace(tmp_path, path)
+            _cache_size += len(content) - replaced_size
+            if _cache_size > RENDER_CACHE_MAX_BYTES:
+                _evict()
+    except OSError as e:
+        print(f"Không thể lưu báo cáo vào cache: {e}")
+
+def _scan_cache():
+    """Danh sách (thời điểm truy cập, dung lượng, đường dẫn) các báo cáo trong cache"""
+    entries = []
+    with os.scandir(RENDER_CACHE_DIR) as it:
+        for entry in it:
+            if not entry.is_file() or entry.name.endswith(".tmp"):
+                continue
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+    return entries
+
+def _seed_cache_size():
+    """Tính tổng dung lượng cache một lần mỗi tiến trình (gọi khi đang giữ _render_cache_lock)"""
+    global _cache_size
+    if _cache_size is None:
+        _cache_size = sum(size for _, size, _ in _scan_cache())
+
+def _evict():
+    """Xóa các báo cáo ít được dùng nhất cho đến khi tổng dung lượng nằm trong giới hạn
+
+    Chỉ chạy khi tổng theo dõi trong bộ nhớ vượt giới hạn (gọi khi đang giữ _render_cache_lock).
+    Thư mục được quét lại để tính đúng cả các file do tiến trình khác (xuất hàng loạt) ghi vào.
+    """
+    global _cache_size
+    entries = _scan_cache()
+    total_size = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total_size <= RENDER_CACHE_MAX_BYTES:
+            break
+        try:
+            os.remove(path)
+            total_size -= size
+        except OSError:
+            pass
+    _cache_size = total_size
+
+def cached_render(key, render):
+    """Trả về BytesIO của báo cáo từ cache, chỉ gọi render() khi chưa có
+
+    render() ném lỗi khi tạo báo cáo thất bại: lỗi được chuyển tiếp cho nơi gọi và không có gì
+    được lưu, nên lần tải sau sẽ tạo lại báo cáo.
+    """
+    content = get_cached_report(key)
+    if content is None:
+        content = render().getvalue()
+        put_cached_report(key, content)
+    return io.BytesIO(content)
+
+def clear_render_cache():
+    """Xóa toàn bộ báo cáo trong cache"""
+    global _cache_size
+    with _render_cache_lock:
+        _cache_size = None
+        if not os.path.isdir(RENDER_CACHE_DIR):
+            return
+        for name in os.listdir(RENDER_CACHE_DIR):
+            try:
+                os.remove(os.path.join(RENDER_CACHE_DIR, name))
+            except OSError:
+                pass
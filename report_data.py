@@ -0,0 +1,157 @@
+import json
+import hashlib
+import numpy as np
+import pandas as pd
+from collections import namedtuple
+from datetime import datetime
+
+from grading import compile_questions, is_answer_correct
+from column_codec import decode_responses
+
+UNKNOWN = "Không xác định"
+
+# Dữ liệu dạng cột cho trang báo cáo, dựng một lần mỗi lần tải và dùng chung cho mọi tab:
+# - table: mỗi dòng một bài nộp (email/lớp dạng categorical, điểm dạng số, thời gian dạng datetime)
+# - correct/answered: ma trận bool (số bài nộp × số câu hỏi)
+# - position_by_id: id bài nộp (chuỗi) -> vị trí dòng trong table và các ma trận
+# - version: mã băm nội dung bài nộp và câu hỏi, đổi khi dữ liệu báo cáo thay đổi
+ReportFrame = namedtuple(
+    "ReportFrame",
+    ["submissions", "questions", "users", "table", "correct", "answered", "position_by_id", "max_possible", "version"]
+)
+
+# Chỉ mục học viên dựng một lần mỗi lần tải: tra cứu theo email và theo lớp thay cho quét danh sách
+UserIndex = namedtuple("UserIndex", ["by_email", "by_class", "emails"])
+
+def build_user_index(students):
+    """Dựng UserIndex từ danh sách học viên (bỏ qua học viên không có email)"""
+    by_email = {}
+    by_class = {}
+    for student in students:
+        email = student.get("email", "")
+        if not email:
+            continue
+        by_email[email] = student
+        by_class.setdefault(student.get("class") or UNKNOWN, []).append(student)
+    return UserIndex(by_email=by_email, by_class=by_class, emails=sorted(by_email))
+
+def student_name_and_class(users, email):
+    """Họ tên và lớp của học viên theo email, "Không xác định" nếu không có trong chỉ mục"""
+    student_info = users.by_email.get(email)
+    if not student_info:
+        return UNKNOWN, UNKNOWN
+    return student_info.get("full_name", UNKNOWN), student_info.get("class", UNKNOWN)
+
+def parse_timestamp(value):
+    """Chuyển timestamp ISO hoặc Unix timestamp (dữ liệu cũ) thành datetime, None nếu không hợp lệ"""
+    try:
+        if isinstance(value, (int, float)):
+            return datetime.fromtimestamp(value)
+        dt = datetime.fromisoformat((value or "").replace("Z", "+00:00"))
+        # Giữ giờ như khi hiển thị để các cột datetime không bị lẫn có/không có múi giờ
+        return dt.replace(tzinfo=None)
+    except:
+        return None
+
+def format_timestamps(timestamps, fmt):
+    """Định dạng cột datetime thành chuỗi, giá trị không hợp lệ hiển thị "Không xác định" """
+    return timestamps.dt.strftime(fmt).fillna(UNKNOWN)
+
+def data_version(submissions, questions):
+    """Mã băm phiên bản dữ liệu báo cáo (id, điểm, thời gian, câu trả lời của bài nộp và câu hỏi)"""
+    payload = json.dumps(
+        [
+            [[s.get("id"), s.get("score"), s.get("timestamp"), s.get("responses")] for s in submissions],
+            questions
+        ],
+        ensure_ascii=False, sort_keys=True, default=str
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def build_report_frame(submissions, users, questions):
+    """Dựng ReportFrame từ danh sách bài nộp, chỉ mục học viên và câu hỏi"""
+    compiled_questions = compile_questions(questions)
+
+    correct = np.zeros((len(submissions), len(compiled_questions)), dtype=bool)
+    answered = np.zeros((len(submissions), len(compiled_questions)), dtype=bool)
+    columns = {"id": [], "email": [], "full_name": [], "class": [], "timestamp": [], "score": []}
+
+    for row, s in enumerate(submissions):
+        responses = decode_responses(s.get("responses", {}))
+        s["responses"] = responses
+
+        for col, cq in enumerate(compiled_questions):
+            user_ans = responses.get(cq.id, [])
+            if user_ans:
+                answered[row, col] = True
+                correct[row, col] = is_answer_correct(user_ans, cq)
+
+        full_name, class_name = student_name_and_class(users, s.get("user_email"))
+        columns["id"].append(s.get("id", ""))
+        columns["email"].append(s.get("user_email", ""))
+        columns["full_name"].append(full_name)
+        columns["class"].append(class_name)
+        columns["timestamp"].append(parse_timestamp(s.get("timestamp")))
+        columns["score"].append(s.get("score", 0) or 0)
+
+    table = pd.DataFrame({
+        "id": columns["id"],
+        "email": pd.Categorical(columns["email"]),
+        "full_name": pd.Categorical(columns["full_name"]),
+        "class": pd.Categorical(columns["class"]),
+        "timestamp": pd.to_datetime(pd.Series(columns["timestamp"], dtype=object)),
+        "score": pd.to_numeric(pd.Series(columns["score"], dtype=object))
+    })
+
+    return ReportFrame(
+        submissions=submissions,
+        questions=questions,
+        users=users,
+        table=table,
+        correct=correct,
+        answered=answered,
+        position_by_id={str(submission_id): row for row, submission_id in enumerate(columns["id"])},
+        max_possible=sum(q.get("score", 0) for q in questions),
+        version=data_version(submissions, questions)
+    )
+
+def percent_column(scores, max_possible):
+    """Cột tỷ lệ điểm dạng chuỗi "xx.x%" (hoặc "N/A" khi điểm tối đa bằng 0)"""
+    if max_possible <= 0:
+        return pd.Series("N/A", index=scores.index)
+    return (scores / max_possible * 100).map(lambda value: f"{value:.1f}%")
+
+def question_counts(frame):
+    """Số bài đúng, sai, bỏ qua của từng câu hỏi (mảng theo thứ tự câu hỏi)"""
+    correct_counts = frame.correct.sum(axis=0)
+    answered_counts = frame.answered.sum(axis=0)
+    return correct_counts, answered_counts - correct_counts, len(frame.table) - answered_counts
+
+def student_summary(frame):
+    """Số lần làm bài và điểm cao nhất theo email"""
+    return frame.table.groupby("email", observed=True)["score"].agg(["count", "max"])
+
+def submissions_wide_table(frame):
+    """Bảng tất cả bài nộp cho xuất báo cáo: thông tin chung và câu trả lời, đúng/sai từng câu"""
+    table = frame.table
+    data = {
+        "ID": table["id"],
+        "Email": table["email"].astype(str),
+        "Họ và tên": table["full_name"].astype(str),
+        "Lớp": table["class"].astype(str),
+        "Thời gian nộp": format_timestamps(table["timestamp"], "%d/%m/%Y %H:%M:%S"),
+        "Điểm số": table["score"],
+        "Điểm tối đa": frame.max_possible,
+        "Tỷ lệ đúng": percent_column(table["score"], frame.max_possible)
+    }
+
+    all_responses = [s.get("responses", {}) for s in frame.submissions]
+    for col, q in enumerate(frame.questions):
+        q_id = str(q.get("id", ""))
+        data[f"Câu {q_id}: {q.get('question', '')}"] = [
+            ", ".join([str(a) for a in responses.get(q_id, [])]) if responses.get(q_id) else "Không trả lời"
+            for responses in all_responses
+        ]
+        data[f"Câu {q_id} - Đúng/Sai"] = np.where(frame.correct[:, col], "Đúng", "Sai")
+
+    return pd.DataFrame(data)
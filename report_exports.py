@@ -0,0 +1,862 @@
+import pandas as pd
+import io
+from datetime import datetime
+import numpy as np
+import traceback
+import os
+import tempfile
+
+from docx.shared import Inches
+from docx.oxml.ns import nsdecls
+from docx.oxml import parse_xml
+
+# Dùng fpdf2 (hỗ trợ Unicode); fpdf1 vẫn chạy được nhưng không hiển thị đúng tiếng Việt có dấu
+from fpdf import FPDF
+
+from grading import check_answer_correctness
+from column_codec import decode_answers, decode_correct, decode_responses
+from pdf_fonts import is_fpdf2, register_fonts, register_reportlab_fonts, resolve_fonts
+from export_backends import module_available
+
+# Nhập các thư viện cho xuất file
+try:
+    from docx import Document
+    from docx.shared import Pt, RGBColor
+except ImportError:
+    # Module này chạy cả ở luồng nền và tiến trình con nên không gọi st.*; giao diện tự cảnh báo (report.py)
+    print("Module python-docx không được cài đặt. Tính năng xuất DOCX sẽ không hoạt động.")
+
+# Sử dụng WD_ALIGN_PARAGRAPH nếu có thể, nếu không tạo class thay thế
+try:
+    from docx.enum.text import WD_ALIGN_PARAGRAPH
+except ImportError:
+    class WD_ALIGN_PARAGRAPH:
+        CENTER = 1
+        RIGHT = 2
+        LEFT = 0
+
+# Chuẩn bị font tiếng Việt
+def setup_vietnamese_fonts():
+    """Tìm font tiếng Việt (một lần mỗi tiến trình) và đăng ký với reportlab nếu có"""
+    # reportlab là tùy chọn: chỉ import khi đã cài và thực sự cần đăng ký font
+    if module_available("reportlab"):
+        from reportlab.pdfbase import pdfmetrics
+        from reportlab.pdfbase.ttfonts import TTFont
+        registered_fonts = register_reportlab_fonts(pdfmetrics, TTFont)
+    else:
+        registered_fonts = resolve_fonts()
+    
+    # Thêm các font mặc định vào cuối danh sách nếu chưa có font nào được đăng ký
+    if not registered_fonts:
+        registered_fonts.append(('Helvetica', ''))
+        registered_fonts.append(('Courier', ''))
+    
+    return registered_fonts
+
+def _excel_cell_value(value):
+    """Chuyển giá trị pandas/NumPy sang kiểu openpyxl ghi được (NaN/NaT thành ô trống)"""
+    if value is None:
+        return None
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    if isinstance(value, pd.Timestamp):
+        return None if pd.isna(value) else value.to_pydatetime()
+    if value is pd.NaT:
+        return None
+    return value
+
+def export_to_excel(dataframes, sheet_names):
+    """Ghi nhiều DataFrame thành file Excel tạm trên đĩa, trả về đường dẫn file
+
+    Dùng workbook write-only của openpyxl: từng dòng được ghi thẳng ra file nên bộ nhớ
+    không tăng theo số dòng/cột như khi dựng toàn bộ workbook qua pd.ExcelWriter.
+    """
+    from openpyxl import Workbook
+    
+    workbook = Workbook(write_only=True)
+    for df, sheet_name in zip(dataframes, sheet_names):
+        # Tên sheet trong Excel tối đa 31 ký tự
+        worksheet = workbook.create_sheet(title=sheet_name[:31])
+        worksheet.append([str(column) for column in df.columns])
+        for row in df.itertuples(index=False, name=None):
+            worksheet.append([_excel_cell_value(value) for value in row])
+    
+    fd, path = tempfile.mkstemp(prefix="bao_cao_", suffix=".xlsx")
+    os.close(fd)
+    workbook.save(path)
+    return path
+
+# Ký tự điều khiển không hợp lệ trong XML (python-docx sẽ báo lỗi khi gán vào ô)
+_XML_INVALID_CHARS = r"[\x00-\x08\x0b\x0c\x0e-\x1f]"
+
+def _docx_column_cells_xml(series, width_twips):
+    """XML <w:tc> của cả một cột: thuộc tính ô/đoạn tạo một lần, nội dung escape theo cột"""
+    tc_pr = f'<w:tcPr><w:tcW w:w="{width_twips}" w:type="dxa"/></w:tcPr>' if width_twips else ''
+    prefix = f'<w:tc>{tc_pr}<w:p><w:pPr><w:jc w:val="center"/></w:pPr><w:r><w:t xml:space="preserve">'
+    suffix = '</w:t></w:r></w:p></w:tc>'
+
+    text = series.astype(str).str.replace(_XML_INVALID_CHARS, '', regex=True)
+    text = (
+        text.str.replace('&', '&amp;', regex=False)
+        .str.replace('<', '&lt;', regex=False)
+        .str.replace('>', '&gt;', regex=False)
+        .str.replace('\n', '</w:t><w:br/><w:t xml:space="preserve">', regex=False)
+    )
+    return prefix + text + suffix
+
+def _append_docx_table_rows(table, df):
+    """Thêm toàn bộ dòng của DataFrame vào bảng DOCX bằng một lần dựng và parse XML
+
+    Thay cho table.add_row() từng dòng (chậm dần theo kích thước bảng).
+    """
+    if df.empty:
+        return
+
+    grid_cols = table._tbl.tblGrid.gridCol_lst
+    rows_xml = pd.Series('<w:tr>', index=df.index)
+    for i in range(len(df.columns)):
+        width = grid_cols[i].w if i < len(grid_cols) else None
+        # Độ rộng cột lưu theo EMU, tcW dùng twip (1 twip = 635 EMU)
+        width_twips = int(width / 635) if width else None
+        rows_xml = rows_xml + _docx_column_cells_xml(df.iloc[:, i], width_twips)
+    rows_xml = rows_xml + '</w:tr>'
+
+    rows = parse_xml(f'<w:tbl {nsdecls("w")}>{"".join(rows_xml)}</w:tbl>')
+    for tr in list(rows):
+        table._tbl.append(tr)
+
+def dataframe_to_docx(df, title, filename):
+    """Tạo file DOCX từ DataFrame"""
+    try:
+        doc = Document()
+        
+        # Thiết lập font chữ mặc định
+        style = doc.styles['Normal']
+        font = style.font
+        font.name = 'Times New Roman'
+        font.size = Pt(12)
+        
+        # Thêm tiêu đề
+        heading = doc.add_heading(title, level=1)
+        heading.alignment = WD_ALIGN_PARAGRAPH.CENTER
+        
+        # Thêm thời gian xuất báo cáo
+        time_paragraph = doc.add_paragraph(f"Thời gian xuất báo cáo: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}")
+        time_paragraph.alignment = WD_ALIGN_PARAGRAPH.RIGHT
+        
+        # Tạo bảng
+        # Thêm một hàng cho tiêu đề cột
+        table = doc.add_table(rows=1, cols=len(df.columns), style='Table Grid')
+        
+        # Thêm tiêu đề cột
+        header_cells = table.rows[0].cells
+        for i, col_name in enumerate(df.columns):
+            header_cells[i].text = str(col_name)
+            # Đặt kiểu cho tiêu đề
+            for paragraph in header_cells[i].paragraphs:
+                paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
+                run = paragraph.runs[0] if paragraph.runs else paragraph.add_run(str(col_name))
+                run.bold = True
+        
+        # Thêm dữ liệu (các ô căn giữa)
+        _append_docx_table_rows(table, df)
+        
+        # Thêm chân trang
+        doc.add_paragraph()
+        footer = doc.add_paragraph("Hệ thống Khảo sát & Đánh giá")
+        footer.alignment = WD_ALIGN_PARAGRAPH.CENTER
+        
+        # Lưu tệp
+        buffer = io.BytesIO()
+        doc.save(buffer)
+        buffer.seek(0)
+        
+        return buffer
+    except Exception as e:
+        print(f"Lỗi khi tạo DOCX: {str(e)}")
+        # Hàm chạy ở luồng nền (downloads.py): ném lỗi để hiển thị trên luồng script
+        raise ValueError(f"Không thể tạo file DOCX: {str(e)}") from e
+
+class UNIOCDF_FPDF(FPDF):
+    """Lớp PDF tùy chỉnh hỗ trợ Unicode đầy đủ"""
+    def __init__(self, orientation='P', unit='mm', format='A4', title='Báo cáo'):
+        super().__init__(orientation=orientation, unit=unit, format=format)
+        self.title = title
+        
+        # Kiểm tra phiên bản FPDF
+        self.is_fpdf2 = is_fpdf2()
+            
+        # Khắc phục lỗi tiếng Việt bằng cách thiết lập encode utf8 (chỉ cho FPDF2)
+        if self.is_fpdf2:
+            try:
+                self.set_doc_option('core_fonts_encoding', 'utf-8')
+            except:
+                pass
+        
+        # Đăng ký các font có sẵn (đường dẫn font được tìm một lần mỗi tiến trình)
+        register_fonts(self, [
+            ('Arial', 'arial.ttf'),
+            ('Arial-Bold', 'arialbd.ttf'),
+            ('Arial-Italic', 'ariali.ttf'),
+        ])
+        
+    def header(self):
+        # Font và tiêu đề
+        try:
+            self.set_font('Arial', 'B', 15)
+        except:
+            self.set_font('Helvetica', 'B', 15)
+            
+        # Tiêu đề ở giữa
+        self.cell(0, 10, self.title, 0, 1, 'C')
+        
+        # Thời gian
+        try:
+            self.set_font('Arial', 'I', 8)
+        except:
+            self.set_font('Helvetica', 'I', 8)
+            
+        timestamp = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
+        self.cell(0, 5, f'Thoi gian xuat bao cao: {timestamp}', 0, 1, 'R')
+        
+        # Line break
+        self.ln(5)
+    
+    def footer(self):
+        # Vị trí cách đáy 15 mm
+        self.set_y(-15)
+        
+        # Font
+        try:
+            self.set_font('Arial', 'I', 8)
+        except:
+            self.set_font('Helvetica', 'I', 8)
+            
+        # Số trang
+        self.cell(0, 10, f'Trang {self.page_no()}/{self.alias_nb_pages()}', 0, 0, 'C')
+        
+        # Thêm chân trang hệ thống
+        self.cell(0, 10, 'He thong kiểm tra Đánh giá viên nội bộ ISO 50001:2018 TUV', 0, 0, 'R')
+
+# Tạo một instance FPDF có khả năng xử lý Unicode
+def create_unicode_pdf(orientation='P', format='A4', title='Báo cáo'):
+    """Tạo FPDF với hỗ trợ Unicode tốt hơn"""
+    try:
+        # Tạo PDF mới
+        pdf = FPDF(orientation=orientation, unit='mm', format=format)
+        
+        # Thiết lập mã hóa UTF-8 cho FPDF2
+        if is_fpdf2():
+            try:
+                pdf.set_doc_option('core_fonts_encoding', 'utf-8')
+            except:
+                pass
+        
+        # Thêm các font Unicode theo thứ tự ưu tiên (lấy từ registry, không quét lại thư mục)
+        if not register_fonts(pdf):
+            # Nếu không tìm thấy font Unicode, sử dụng font mặc định
+            print("Không tìm thấy font Unicode, sử dụng font mặc định")
+        
+        # Thiết lập các tùy chọn khác
+        pdf.set_auto_page_break(auto=True, margin=15)
+        pdf.alias_nb_pages()
+        
+        # Thiết lập tựa đề
+        pdf.set_title(title)
+        
+        return pdf
+    except Exception as e:
+        print(f"Lỗi tạo PDF: {str(e)}")
+        traceback.print_exc()
+        
+        # Phương án dự phòng - sử dụng FPDF cơ bản
+        try:
+            pdf = FPDF(orientation=orientation, format=format)
+            pdf.set_auto_page_break(auto=True, margin=15)
+            pdf.alias_nb_pages()
+            return pdf
+        except Exception as e2:
+            print(f"Lỗi khi tạo PDF dự phòng: {str(e2)}")
+            return None
+
+# Số dòng tối đa của bảng trong PDF xuất từ DataFrame
+PDF_TABLE_MAX_ROWS = int(os.environ.get("PDF_TABLE_MAX_ROWS", "5000"))
+PDF_CELL_MAX_CHARS = 30
+PDF_ROW_HEIGHT = 7
+PDF_HEADER_HEIGHT = 10
+
+# Bảng độ rộng ký tự ASCII theo (font, kiểu, cỡ chữ), tính một lần mỗi tiến trình
+_glyph_width_tables = {}
+
+def _glyph_widths(pdf):
+    """Độ rộng (mm) của 128 ký tự ASCII với font hiện tại của pdf"""
+    font_key = (pdf.font_family, pdf.font_style, pdf.font_size_pt)
+    widths = _glyph_width_tables.get(font_key)
+    if widths is None:
+        widths = np.array([pdf.get_string_width(chr(code)) if code >= 32 else 0.0 for code in range(128)])
+        _glyph_width_tables[font_key] = widths
+    return widths
+
+def _text_widths(values, glyph_widths):
+    """Độ rộng (mm) của từng chuỗi ASCII: tính trên các giá trị khác nhau rồi ánh xạ lại"""
+    uniques, inverse = np.unique(np.asarray(values, dtype=object).astype(str), return_inverse=True)
+    unique_widths = np.array([
+        glyph_widths[np.frombuffer(value.encode('ascii'), dtype=np.uint8)].sum() for value in uniques
+    ])
+    return unique_widths[inverse]
+
+def _ascii_column(series):
+    """Cột DataFrame thành chuỗi ASCII (bỏ dấu tiếng Việt), ô trống thành "" và cắt bớt chuỗi dài"""
+    text = series.astype(object).where(series.notna(), "").astype(str)
+    text = text.str.encode('ascii', 'ignore').str.decode('ascii')
+    too_long = text.str.len() > PDF_CELL_MAX_CHARS
+    return text.where(~too_long, text.str.slice(0, PDF_CELL_MAX_CHARS - 3) + "...")
+
+def _pdf_table_layout(df, pdf, usable_width):
+    """Chuẩn bị bảng cho PDF: tiêu đề, nội dung từng cột, căn lề và độ rộng cột
+
+    Toàn bộ được tính theo cột (không duyệt từng dòng) để bảng lớn vẫn nhanh.
+    """
+    headers = [str(col).encode('ascii', 'ignore').decode('ascii') for col in df.columns]
+    columns = [_ascii_column(df.iloc[:, i]) for i in range(len(df.columns))]
+
+    # Số (vd. "5", "7.5") căn giữa, văn bản căn trái
+    aligns = [np.where(col.str.fullmatch(r"\d+\.?\d*|\.\d+"), 'C', 'L') for col in columns]
+
+    pdf.set_font('Arial', 'B', 9)
+    header_widths = _text_widths(headers, _glyph_widths(pdf)) + 6
+    pdf.set_font('Arial', '', 8)
+    body_glyphs = _glyph_widths(pdf)
+
+    col_widths = []
+    for header_width, col in zip(header_widths, columns):
+        content_width = _text_widths(col.to_numpy(), body_glyphs).max(initial=0) + 6
+        # Giới hạn độ rộng cột
+        col_widths.append(min(40, max(15, header_width, content_width)))
+
+    # Điều chỉnh độ rộng cột để vừa với trang
+    total_width = sum(col_widths)
+    if total_width > usable_width:
+        scale_factor = usable_width / total_width
+        col_widths = [width * scale_factor for width in col_widths]
+
+    return headers, [col.tolist() for col in columns], [a.tolist() for a in aligns], col_widths
+
+def dataframe_to_pdf_fpdf(df, title, filename):
+    """Tạo file PDF từ DataFrame sử dụng FPDF với xử lý lỗi Unicode"""
+    buffer = io.BytesIO()
+    try:
+        # Xác định hướng trang dựa vào số lượng cột
+        orientation = 'L' if len(df.columns) > 5 else 'P'
+        
+        # Khởi tạo đối tượng PDF
+        pdf = FPDF(orientation=orientation, unit='mm', format='A4')
+        pdf.set_auto_page_break(auto=True, margin=15)
+        pdf.add_page()
+        
+        # Thêm tiêu đề - luôn dùng font mặc định
+        pdf.set_font('Arial', 'B', 16)
+        
+        # Loại bỏ dấu tiếng Việt từ tiêu đề
+        title_ascii = title.encode('ascii', 'ignore').decode('ascii')
+        pdf.cell(0, 10, title_ascii, 0, 1, 'C')
+        
+        # Thêm thời gian báo cáo
+        pdf.set_font('Arial', 'I', 10)
+        timestamp = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
+        pdf.cell(0, 5, f'Thoi gian xuat bao cao: {timestamp}', 0, 1, 'R')
+        pdf.ln(5)
+        
+        # Xác định kích thước trang và số cột
+        page_width = 297 if orientation == 'L' else 210
+        margin = 10
+        usable_width = page_width - 2*margin
+        
+        # Giới hạn số lượng hàng
+        headers, columns, aligns, col_widths = _pdf_table_layout(df.head(PDF_TABLE_MAX_ROWS), pdf, usable_width)
+        
+        def draw_header():
+            pdf.set_font('Arial', 'B', 9)
+            pdf.set_fill_color(240, 240, 240)
+            for width, header in zip(col_widths, headers):
+                pdf.cell(width, PDF_HEADER_HEIGHT, header, 1, 0, 'C', 1)
+            pdf.ln(PDF_HEADER_HEIGHT)
+            pdf.set_font('Arial', '', 8)
+        
+        # Vẽ tiêu đề cột
+        draw_header()
+        
+        # Vẽ dữ liệu: số dòng mỗi trang tính trước, không kiểm tra vị trí từng dòng
+        rows_left_on_page = int((pdf.page_break_trigger - pdf.get_y()) // PDF_ROW_HEIGHT)
+        for row_cells, row_aligns in zip(zip(*columns), zip(*aligns)):
+            if rows_left_on_page <= 0:
+                pdf.add_page()
+                # Vẽ lại header sau khi chuyển trang
+                draw_header()
+                rows_left_on_page = int((pdf.page_break_trigger - pdf.get_y()) // PDF_ROW_HEIGHT)
+            
+            for width, cell_text, align in zip(col_widths, row_cells, row_aligns):
+                pdf.cell(width, PDF_ROW_HEIGHT, cell_text, 1, 0, align)
+            pdf.ln(PDF_ROW_HEIGHT)
+            rows_left_on_page -= 1
+        
+        # Thêm chân trang
+        pdf.set_y(-20)
+        pdf.set_font('Arial', 'I', 8)
+        pdf.cell(0, 10, f'Trang {pdf.page_no()}/{"{nb}"}', 0, 0, 'C')
+        pdf.cell(0, 10, 'He thong Khao sat & Danh gia', 0, 0, 'R')
+        
+        # Lưu PDF
+        pdf.output(name=buffer, dest='S')
+        buffer.seek(0)
+        return buffer
+    except Exception as e:
+        print(f"Lỗi khi tạo PDF: {str(e)}")
+        traceback.print_exc()
+        # Ném lỗi thay vì trả về PDF báo lỗi để không bị lưu như file hợp lệ
+        raise ValueError(f"Không thể tạo file PDF: {str(e)}") from e
+
+# Tăng khi thay đổi nội dung/bố cục báo cáo học viên để bỏ qua các bản đã lưu trong cache
+REPORT_TEMPLATE_VERSION = 1
+
+def create_student_report_docx(student_name, student_email, student_class, submission, questions, max_possible):
+    """Tạo báo cáo chi tiết bài làm của học viên dạng DOCX"""
+    try:
+        doc = Document()
+        
+        # Thiết lập font chữ mặc định là Times New Roman
+        style = doc.styles['Normal']
+        font = style.font
+        font.name = 'Times New Roman'
+        font.size = Pt(12)
+        
+        # Thêm tiêu đề - font chữ hỗ trợ Unicode
+        heading = doc.add_heading(f"Báo cáo chi tiết - {student_name}", level=1)
+        heading.alignment = WD_ALIGN_PARAGRAPH.CENTER
+        
+        # Thêm thời gian xuất báo cáo
+        time_paragraph = doc.add_paragraph(f"Thời gian xuất báo cáo: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}")
+        time_paragraph.alignment = WD_ALIGN_PARAGRAPH.RIGHT
+        
+        # Thêm thông tin học viên
+        doc.add_heading("Thông tin học viên", level=2)
+        info_table = doc.add_table(rows=4, cols=2, style='Table Grid')
+        
+        # Đặt độ rộng cột
+        for cell in info_table.columns[0].cells:
+            cell.width = Inches(1.5)
+        for cell in info_table.columns[1].cells:
+            cell.width = Inches(4.5)
+        
+        # Thiết lập màu nền cho hàng tiêu đề
+        for i in range(4):
+            # Sửa lỗi: Đảm bảo có runs trước khi truy cập
+            cell = info_table.rows[i].cells[0]
+            cell_paragraph = cell.paragraphs[0]
+            if not cell_paragraph.runs:
+                cell_paragraph.add_run(cell.text if cell.text else '')
+            cell_paragraph.runs[0].font.bold = True
+            
+            # Thêm màu nền
+            shading_elm = parse_xml(r'<w:shd {} w:fill="E9E9E9"/>'.format(nsdecls('w')))
+            info_table.rows[i].cells[0]._tc.get_or_add_tcPr().append(shading_elm)
+        
+        # Thêm dữ liệu vào bảng thông tin
+        cells = info_table.rows[0].cells
+        cells[0].text = "Họ và tên"
+        cells[1].text = student_name
+        
+        cells = info_table.rows[1].cells
+        cells[0].text = "Email"
+        cells[1].text = student_email
+        
+        cells = info_table.rows[2].cells
+        cells[0].text = "Lớp"
+        cells[1].text = student_class
+        
+        # Xử lý timestamp tương thích với cả hai kiểu dữ liệu (số và chuỗi ISO)
+        submission_time = "Không xác định"
+        if isinstance(submission.get("timestamp"), (int, float)):
+            try:
+                submission_time = datetime.fromtimestamp(submission.get("timestamp")).strftime("%H:%M:%S %d/%m/%Y")
+            except:
+                pass
+        else:
+            try:
+                dt = datetime.fromisoformat(submission.get("timestamp", "").replace("Z", "+00:00"))
+                submission_time = dt.strftime("%H:%M:%S %d/%m/%Y")
+            except:
+                pass
+        
+        cells = info_table.rows[3].cells
+        cells[0].text = "Thời gian nộp"
+        cells[1].text = submission_time
+        
+        # Tính toán thông tin về bài làm
+        total_correct = 0
+        total_questions = len(questions)
+        
+        doc.add_heading("Chi tiết câu trả lời", level=2)
+        
+        # Tạo bảng chi tiết câu trả lời - cải thiện layout với cột rộng hợp lý
+        answers_table = doc.add_table(rows=1, cols=5, style='Table Grid')
+        
+        # Thiết lập độ rộng tương đối cho các cột
+        col_widths = [2.5, 2, 2, 1, 0.8]  # Tỷ lệ tương đối
+        for i, width in enumerate(col_widths):
+            for cell in answers_table.columns[i].cells:
+                cell.width = Inches(width)
+        
+        # Thêm tiêu đề cho bảng với định dạng rõ ràng
+        header_cells = answers_table.rows[0].cells
+        headers = ["Câu hỏi", "Đáp án của học viên", "Đáp án đúng", "Kết quả", "Điểm"]
+        
+        # Tạo nền xám cho hàng tiêu đề
+        for i, cell in enumerate(header_cells):
+            cell.text = headers[i]
+            for paragraph in cell.paragraphs:
+                paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
+                # Đảm bảo có runs trước khi truy cập
+                if not paragraph.runs:
+                    paragraph.add_run(headers[i])
+                for run in paragraph.runs:
+                    run.bold = True
+            # Thêm màu nền
+            shading_elm = parse_xml(r'<w:shd {} w:fill="E9E9E9"/>'.format(nsdecls('w')))
+            cell._tc.get_or_add_tcPr().append(shading_elm)
+        
+        # Đảm bảo responses đúng định dạng
+        responses = decode_responses(submission.get("responses", {}))
+        
+        # Thêm dữ liệu câu trả lời với định dạng cải thiện
+        for q in questions:
+            q_id = str(q.get("id", ""))
+            
+            # Đáp án người dùng
+            user_ans = responses.get(q_id, [])
+            
+            # Chuẩn bị đáp án đúng
+            q_correct = q.get("correct", [])
+            q_answers = q.get("answers", [])
+            
+            q_correct = decode_correct(q_correct)
+            q_answers = decode_answers(q_answers)
+            
+            try:
+                expected = [q_answers[i - 1] for i in q_correct]
+            except (IndexError, TypeError):
+                expected = ["Lỗi đáp án"]
+            
+            # Kiểm tra đúng/sai
+            is_correct = check_answer_correctness(user_ans, q)
+            if is_correct:
+                total_correct += 1
+                result = "Đúng"
+                points = q.get("score", 0)
+            else:
+                result = "Sai"
+                points = 0
+            
+            # Thêm hàng mới vào bảng
+            row_cells = answers_table.add_row().cells
+            
+            # Thêm thông tin câu hỏi
+            row_cells[0].text = f"Câu {q.get('id', '')}: {q.get('question', '')}"
+            row_cells[1].text = ", ".join([str(a) for a in user_ans]) if user_ans else "Không trả lời"
+            row_cells[2].text = ", ".join([str(a) for a in expected])
+            row_cells[3].text = result
+            
+            # Đặt màu cho kết quả
+            for paragraph in row_cells[3].paragraphs:
+                paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
+                if not paragraph.runs:
+                    paragraph.add_run(result)
+                run = paragraph.runs[0]
+                if is_correct:
+                    run.font.color.rgb = RGBColor(0, 128, 0)  # Màu xanh lá cho đúng
+                    run.bold = True
+                else:
+                    run.font.color.rgb = RGBColor(255, 0, 0)  # Màu đỏ cho sai
+                    run.bold = True
+            
+            row_cells[4].text = str(points)
+            row_cells[4].paragraphs[0].alignment = WD_ALIGN_PARAGRAPH.CENTER
+        
+        # Thêm tổng kết với định dạng rõ ràng
+        doc.add_heading("Tổng kết", level=2)
+        summary_table = doc.add_table(rows=3, cols=2, style='Table Grid')
+        
+        # Thiết lập độ rộng cho bảng tổng kết
+        for cell in summary_table.columns[0].cells:
+            cell.width = Inches(1.5)
+        for cell in summary_table.columns[1].cells:
+            cell.width = Inches(3.0)
+        
+        # Thêm màu nền cho cột tiêu đề
+        for i in range(3):
+            cell = summary_table.rows[i].cells[0]
+            paragraph = cell.paragraphs[0]
+            if not paragraph.runs:
+                paragraph.add_run(cell.text if cell.text else '')
+            paragraph.runs[0].font.bold = True
+            shading_elm = parse_xml(r'<w:shd {} w:fill="E9E9E9"/>'.format(nsdecls('w')))
+            cell._tc.get_or_add_tcPr().append(shading_elm)
+        
+        cells = summary_table.rows[0].cells
+        cells[0].text = "Số câu đúng"
+        cells[1].text = f"{total_correct}/{total_questions}"
+        
+        cells = summary_table.rows[1].cells
+        cells[0].text = "Điểm số"
+        cells[1].text = f"{submission.get('score', 0)}/{max_possible}"
+        
+        cells = summary_table.rows[2].cells
+        cells[0].text = "Tỷ lệ đúng"
+        cells[1].text = f"{(total_correct/total_questions*100):.1f}%" if total_questions > 0 else "0%"
+        
+        # Thêm chân trang
+        doc.add_paragraph()
+        footer = doc.add_paragraph("Xuất báo cáo từ Hệ thống Khảo sát & Đánh giá")
+        footer.alignment = WD_ALIGN_PARAGRAPH.CENTER
+        time_footer = doc.add_paragraph(f"Ngày xuất: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}")
+        time_footer.alignment = WD_ALIGN_PARAGRAPH.CENTER
+        
+        # Lưu tệp
+        buffer = io.BytesIO()
+        doc.save(buffer)
+        buffer.seek(0)
+        
+        return buffer
+    except Exception as e:
+        print(f"Lỗi khi tạo báo cáo DOCX: {str(e)}")
+        traceback.print_exc()
+        # Ném lỗi để render_cache không lưu kết quả lỗi và nơi gọi hiển thị được lỗi
+        raise ValueError(f"Không thể tạo báo cáo DOCX: {str(e)}") from e
+
+def create_student_report_pdf_fpdf(student_name, student_email, student_class, submission, questions, max_possible):
+    """Tạo báo cáo chi tiết bài làm của học viên dạng PDF sử dụng FPDF với xử lý lỗi tiếng Việt"""
+    buffer = io.BytesIO()
+    
+    try:
+        # Loại bỏ dấu tiếng Việt từ tên
+        student_name_ascii = student_name.encode('ascii', 'ignore').decode('ascii')
+        student_class_ascii = student_class.encode('ascii', 'ignore').decode('ascii')
+        
+        # Tạo tiêu đề không dấu
+        title = f"Bao cao chi tiet - {student_name_ascii}"
+        
+        # Tạo PDF mới 
+        orientation = 'L' if len(questions) > 10 else 'P'
+        pdf = FPDF(orientation=orientation, format='A4')
+        pdf.set_auto_page_break(auto=True, margin=15)
+        pdf.add_page()
+        
+        # Thêm tiêu đề
+        pdf.set_font('Arial', 'B', 16)
+        pdf.cell(0, 10, title, 0, 1, 'C')
+        
+        # Thêm thời gian báo cáo
+        pdf.set_font('Arial', 'I', 10)
+        timestamp = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
+        pdf.cell(0, 5, f'Thoi gian xuat bao cao: {timestamp}', 0, 1, 'R')
+        pdf.ln(5)
+        
+        # Tính toán thông tin về bài làm
+        total_correct = 0
+        total_questions = len(questions)
+        
+        # Đảm bảo responses đúng định dạng
+        responses = decode_responses(submission.get("responses", {}))
+        
+        # Xử lý timestamp
+        submission_time = "Không xác định"
+        if isinstance(submission.get("timestamp"), (int, float)):
+            try:
+                submission_time = datetime.fromtimestamp(submission.get("timestamp")).strftime("%H:%M:%S %d/%m/%Y")
+            except:
+                pass
+        else:
+            try:
+                dt = datetime.fromisoformat(submission.get("timestamp", "").replace("Z", "+00:00"))
+                submission_time = dt.strftime("%H:%M:%S %d/%m/%Y")
+            except:
+                pass
+        
+        # Thông tin học viên - Tiêu đề
+        pdf.set_font('Arial', 'B', 12)
+        pdf.cell(0, 10, 'Thong tin hoc vien', 0, 1, 'L')
+        
+        # Bảng thông tin học viên
+        pdf.set_font('Arial', '', 10)
+        info_width = 190 if orientation == 'P' else 277
+        col1_width = 50
+        col2_width = info_width - col1_width
+        
+        # Tạo khung thông tin học viên
+        pdf.set_fill_color(240, 240, 240)
+        
+        # Thông tin học viên - loại bỏ dấu tiếng Việt
+        info_data = [
+            ['Ho va ten', student_name_ascii],
+            ['Email', student_email],
+            ['Lop', student_class_ascii],
+            ['Thoi gian nop', submission_time]
+        ]
+        
+        for label, value in info_data:
+            pdf.cell(col1_width, 10, label, 1, 0, 'L', 1)
+            pdf.cell(col2_width, 10, value, 1, 1, 'L')
+        
+        pdf.ln(5)
+        
+        # Chi tiết câu trả lời - Tiêu đề
+        pdf.set_font('Arial', 'B', 12)
+        pdf.cell(0, 10, 'Chi tiet cau tra loi', 0, 1, 'L')
+        
+        # Tiêu đề bảng chi tiết
+        pdf.set_font('Arial', 'B', 9)
+        pdf.set_fill_color(240, 240, 240)
+        
+        # Xác định độ rộng cột - điều chỉnh phù hợp với nội dung và orientation
+        if orientation == 'P':
+            q_width = 70
+            user_width = 35
+            correct_width = 35
+            result_width = 25
+            points_width = 25
+        else:
+            q_width = 120
+            user_width = 50
+            correct_width = 50
+            result_width = 30
+            points_width = 27
+        
+        # Vẽ header bảng
+        headers = ['Cau hoi', 'Dap an hoc vien', 'Dap an dung', 'Ket qua', 'Diem']
+        widths = [q_width, user_width, correct_width, result_width, points_width]
+        
+        for i, header in enumerate(headers):
+            pdf.cell(widths[i], 10, header, 1, 0, 'C', 1)
+        pdf.ln(10)
+        
+        # Vẽ dữ liệu câu trả lời
+        pdf.set_font('Arial', '', 9)
+        
+        for q in questions:
+            q_id = str(q.get("id", ""))
+            
+            # Đáp án người dùng
+            user_ans = responses.get(q_id, [])
+            
+            # Chuẩn bị đáp án đúng
+            q_correct = q.get("correct", [])
+            q_answers = q.get("answers", [])
+            
+            q_correct = decode_correct(q_correct)
+            q_answers = decode_answers(q_answers)
+            
+            try:
+                expected = [q_answers[i - 1] for i in q_correct]
+            except (IndexError, TypeError):
+                expected = ["Loi dap an"]
+            
+            # Kiểm tra đúng/sai
+            is_correct = check_answer_correctness(user_ans, q)
+            if is_correct:
+                total_correct += 1
+                result = "Dung"
+                points = q.get("score", 0)
+            else:
+                result = "Sai"
+                points = 0
+            
+            # Chuẩn bị nội dung (loại bỏ dấu tiếng Việt)
+            question_text = f"Cau {q.get('id', '')}: {q.get('question', '')}"
+            question_text_ascii = question_text.encode('ascii', 'ignore').decode('ascii')
+            
+            # Giới hạn độ dài của các chuỗi
+            if len(question_text_ascii) > (45 if orientation == 'P' else 80):
+                question_text_ascii = question_text_ascii[:(42 if orientation == 'P' else 77)] + "..."
+                
+            user_answer_text = ", ".join([str(a) for a in user_ans]) if user_ans else "Khong tra loi"
+            user_answer_text_ascii = user_answer_text.encode('ascii', 'ignore').decode('ascii')
+            if len(user_answer_text_ascii) > (25 if orientation == 'P' else 40):
+                user_answer_text_ascii = user_answer_text_ascii[:(22 if orientation == 'P' else 37)] + "..."
+                
+            correct_answer_text = ", ".join([str(a) for a in expected])
+            correct_answer_text_ascii = correct_answer_text.encode('ascii', 'ignore').decode('ascii')
+            if len(correct_answer_text_ascii) > (25 if orientation == 'P' else 40):
+                correct_answer_text_ascii = correct_answer_text_ascii[:(22 if orientation == 'P' else 37)] + "..."
+            
+            # Kiểm tra phần còn lại của trang
+            if pdf.get_y() + 10 > pdf.page_break_trigger:
+                pdf.add_page()
+                # Vẽ lại header sau khi chuyển trang
+                pdf.set_font('Arial', 'B', 9)
+                pdf.set_fill_color(240, 240, 240)
+                for i, header in enumerate(headers):
+                    pdf.cell(widths[i], 10, header, 1, 0, 'C', 1)
+                pdf.ln(10)
+                pdf.set_font('Arial', '', 9)
+            
+            # Vẽ dữ liệu
+            pdf.cell(q_width, 10, question_text_ascii, 1, 0, 'L')
+            pdf.cell(user_width, 10, user_answer_text_ascii, 1, 0, 'L')
+            pdf.cell(correct_width, 10, correct_answer_text_ascii, 1, 0, 'L')
+            
+            # Đặt màu cho kết quả Đúng/Sai
+            if is_correct:
+                pdf.set_text_color(0, 128, 0)  # Màu xanh lá
+            else:
+                pdf.set_text_color(255, 0, 0)  # Màu đỏ
+                
+            pdf.cell(result_width, 10, result, 1, 0, 'C')
+            
+            # Đặt lại màu chữ cho điểm
+            pdf.set_text_color(0, 0, 0)  # Màu đen
+            pdf.cell(points_width, 10, str(points), 1, 1, 'C')
+        
+        pdf.ln(5)
+        
+        # Tổng kết
+        pdf.set_font('Arial', 'B', 12)
+        pdf.cell(0, 10, 'Tong ket', 0, 1, 'L')
+        
+        # Bảng tổng kết
+        pdf.set_font('Arial', '', 10)
+        pdf.set_fill_color(240, 240, 240)
+        
+        summary_col1 = 50
+        summary_col2 = (190 if orientation == 'P' else 277) - summary_col1
+        
+        percent_correct = (total_correct/total_questions*100) if total_questions > 0 else 0
+        summary_data = [
+            ['So cau dung', f"{total_correct}/{total_questions}"],
+            ['Diem so', f"{submission.get('score', 0)}/{max_possible}"],
+            ['Ty le dung', f"{percent_correct:.1f}% {'(Dat)' if percent_correct >= 50 else '(Chua dat)'}"]
+        ]
+        
+        for label, value in summary_data:
+            pdf.cell(summary_col1, 10, label, 1, 0, 'L', 1)
+            pdf.cell(summary_col2, 10, value, 1, 1, 'L')
+        
+        # Thêm chân trang
+        pdf.set_y(-20)
+        pdf.set_font('Arial', 'I', 8)
+        pdf.cell(0, 10, f'Trang {pdf.page_no()}/{"{nb}"}', 0, 0, 'C')
+        pdf.cell(0, 10, 'He thong Khao sat & Danh gia', 0, 0, 'R')
+        
+        # Lưu PDF vào buffer
+        pdf.output(name=buffer, dest='S')
+        
+    except Exception as e:
+        print(f"Lỗi khi tạo báo cáo PDF: {str(e)}")
+        traceback.print_exc()
+        # Ném lỗi để render_cache không lưu kết quả lỗi và nơi gọi hiển thị được lỗi
+        raise ValueError(f"Không thể tạo báo cáo PDF: {str(e)}") from e
+    
+    buffer.seek(0)
+    return buffer
+
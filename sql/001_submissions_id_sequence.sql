@@ -0,0 +1,16 @@
+-- Cấp id bài nộp bằng sequence của database thay cho cách đọc max(id) + 1 ở phía client.
+-- Chạy một lần trong SQL Editor của Supabase trước khi triển khai phiên bản mới.
+
+-- Tạo sequence (bỏ qua nếu cột id đã là serial) và đồng bộ với id lớn nhất hiện có
+CREATE SEQUENCE IF NOT EXISTS public.submissions_id_seq OWNED BY public.submissions.id;
+
+SELECT setval(
+    'public.submissions_id_seq',
+    COALESCE((SELECT MAX(id) FROM public.submissions), 0) + 1,
+    false
+);
+
+ALTER TABLE public.submissions
+    ALTER COLUMN id SET DEFAULT nextval('public.submissions_id_seq');
+
+GRANT USAGE, SELECT ON SEQUENCE public.submissions_id_seq TO anon, authenticated;
@@ -0,0 +1,7 @@
+-- Mã biên nhận cho bài nộp được ghi qua hàng đợi (submission_queue.py).
+-- Ràng buộc duy nhất giúp việc gửi lại một lô bài nộp sau lỗi không tạo bản ghi trùng.
+
+ALTER TABLE public.submissions ADD COLUMN IF NOT EXISTS receipt_id text;
+
+CREATE UNIQUE INDEX IF NOT EXISTS submissions_receipt_id_key
+    ON public.submissions (receipt_id);
@@ -0,0 +1,75 @@
+-- Chuyển answers, correct (questions) và responses (submissions) từ JSON string sang JSONB.
+-- Sau khi chạy, đặt SUPABASE_JSONB_COLUMNS=1 để ứng dụng ghi list/dict trực tiếp (xem column_codec.py).
+-- Ứng dụng đọc được cả hai định dạng nên có thể chạy migration trước hoặc sau khi triển khai.
+
+-- Chuyển một giá trị cũ sang JSONB, kể cả dữ liệu không phải JSON hợp lệ (ví dụ correct = '1,2').
+-- Cùng quy tắc với decode_answers/decode_correct/decode_responses trong column_codec.py:
+-- answers/correct luôn là mảng (giá trị đơn được bọc thành mảng một phần tử, null là mảng rỗng),
+-- responses luôn là object.
+CREATE OR REPLACE FUNCTION public._legacy_text_to_jsonb(value text, kind text)
+RETURNS jsonb
+LANGUAGE plpgsql
+IMMUTABLE
+AS $$
+DECLARE
+    parsed jsonb;
+BEGIN
+    IF value IS NULL THEN
+        RETURN NULL;
+    END IF;
+
+    BEGIN
+        parsed := value::jsonb;
+    EXCEPTION WHEN others THEN
+        parsed := NULL;
+    END;
+
+    IF kind = 'responses' THEN
+        IF parsed IS NOT NULL AND jsonb_typeof(parsed) = 'object' THEN
+            RETURN parsed;
+        END IF;
+        RETURN '{}'::jsonb;
+    END IF;
+
+    IF parsed IS NOT NULL THEN
+        IF jsonb_typeof(parsed) = 'array' THEN
+            RETURN parsed;
+        ELSIF jsonb_typeof(parsed) = 'null' THEN
+            RETURN '[]'::jsonb;
+        ELSIF kind = 'answers' THEN
+            -- '"abc"' là đáp án abc, số/true/false giữ nguyên dạng chuỗi ('2' là đáp án "2")
+            IF jsonb_typeof(parsed) = 'string' THEN
+                RETURN jsonb_build_array(parsed);
+            END IF;
+            RETURN jsonb_build_array(value);
+        ELSIF jsonb_typeof(parsed) = 'string' THEN
+            -- correct = '"1,2"': xử lý như chuỗi kiểu cũ bên dưới
+            value := parsed #>> '{}';
+        ELSE
+            RETURN jsonb_build_array(parsed);
+        END IF;
+    ELSIF kind = 'answers' THEN
+        RETURN jsonb_build_array(value);
+    END IF;
+
+    -- correct kiểu cũ '1,2'
+    BEGIN
+        RETURN to_jsonb(string_to_array(regexp_replace(value, '\s', '', 'g'), ',')::integer[]);
+    EXCEPTION WHEN others THEN
+        RETURN '[]'::jsonb;
+    END;
+END;
+$$;
+
+BEGIN;
+
+ALTER TABLE public.questions
+    ALTER COLUMN answers TYPE jsonb USING public._legacy_text_to_jsonb(answers::text, 'answers'),
+    ALTER COLUMN correct TYPE jsonb USING public._legacy_text_to_jsonb(correct::text, 'correct');
+
+ALTER TABLE public.submissions
+    ALTER COLUMN responses TYPE jsonb USING public._legacy_text_to_jsonb(responses::text, 'responses');
+
+COMMIT;
+
+DROP FUNCTION public._legacy_text_to_jsonb(text, text);
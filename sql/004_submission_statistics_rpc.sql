@@ -0,0 +1,118 @@
+-- Tổng hợp thống kê bài nộp ngay trong Postgres, gọi qua supabase.rpc("submission_statistics").
+-- Trả về một object JSON nhỏ thay vì toàn bộ bảng submissions; logic chấm giống grading.py.
+-- Ứng dụng tự chuyển sang tổng hợp bằng Python (submission_stats.py) khi chưa có hàm này.
+
+CREATE OR REPLACE FUNCTION public.submission_statistics(p_user_emails text[] DEFAULT NULL)
+RETURNS jsonb
+LANGUAGE sql
+STABLE
+AS $$
+WITH subs AS (
+    SELECT
+        s.user_email,
+        coalesce(s.score, 0)::numeric AS score,
+        s."timestamp"::text AS ts,
+        coalesce(s.responses::jsonb, '{}'::jsonb) AS responses
+    FROM public.submissions s
+    WHERE p_user_emails IS NULL OR s.user_email = ANY (p_user_emails)
+),
+qs AS (
+    SELECT
+        q.id::text AS q_id,
+        q.type,
+        CASE WHEN jsonb_typeof(q.answers::jsonb) = 'array' THEN q.answers::jsonb ELSE '[]'::jsonb END AS answers,
+        CASE WHEN jsonb_typeof(q.correct::jsonb) = 'array' THEN q.correct::jsonb ELSE '[]'::jsonb END AS correct
+    FROM public.questions q
+),
+-- Vị trí (bắt đầu từ 1) xuất hiện đầu tiên của mỗi đáp án, giống answer_index trong grading.py
+answer_positions AS (
+    SELECT qs.q_id, a.value AS answer, min(a.ordinality)::integer AS position
+    FROM qs, jsonb_array_elements(qs.answers) WITH ORDINALITY AS a(value, ordinality)
+    GROUP BY qs.q_id, a.value
+),
+responses AS (
+    SELECT
+        qs.q_id,
+        qs.type,
+        qs.correct,
+        CASE
+            WHEN jsonb_typeof(subs.responses -> qs.q_id) = 'array' THEN subs.responses -> qs.q_id
+            ELSE '[]'::jsonb
+        END AS answers
+    FROM subs
+    JOIN qs ON subs.responses ? qs.q_id
+),
+graded AS (
+    SELECT
+        r.q_id,
+        jsonb_array_length(r.answers) > 0 AS answered,
+        CASE
+            -- Combobox: chọn đúng một đáp án và vị trí của nó nằm trong tập đáp án đúng
+            WHEN r.type = 'Combobox' THEN
+                jsonb_array_length(r.answers) = 1 AND EXISTS (
+                    SELECT 1 FROM answer_positions ap
+                    WHERE ap.q_id = r.q_id
+                      AND ap.answer = r.answers -> 0
+                      AND r.correct @> jsonb_build_array(ap.position)
+                )
+            -- Checkbox: tập vị trí đã chọn trùng khớp tập đáp án đúng
+            WHEN r.type = 'Checkbox' THEN
+                jsonb_array_length(r.answers) > 0
+                AND NOT EXISTS (
+                    SELECT to_jsonb(ap.position)
+                    FROM jsonb_array_elements(r.answers) AS e(value)
+                    JOIN answer_positions ap ON ap.q_id = r.q_id AND ap.answer = e.value
+                    EXCEPT
+                    SELECT c.value FROM jsonb_array_elements(r.correct) AS c(value)
+                )
+                AND NOT EXISTS (
+                    SELECT c.value FROM jsonb_array_elements(r.correct) AS c(value)
+                    EXCEPT
+                    SELECT to_jsonb(ap.position)
+                    FROM jsonb_array_elements(r.answers) AS e(value)
+                    JOIN answer_positions ap ON ap.q_id = r.q_id AND ap.answer = e.value
+                )
+            ELSE false
+        END AS is_correct
+    FROM responses r
+),
+daily AS (
+    SELECT
+        CASE
+            -- Dữ liệu cũ lưu Unix timestamp
+            WHEN ts ~ '^[0-9]+(\.[0-9]+)?$' THEN to_char(to_timestamp(ts::double precision), 'YYYY-MM-DD')
+            ELSE left(ts, 10)
+        END AS day,
+        count(*) AS n
+    FROM subs
+    GROUP BY 1
+)
+SELECT jsonb_build_object(
+    'total_submissions', (SELECT count(*) FROM subs),
+    'score_sum', (SELECT coalesce(sum(score), 0) FROM subs),
+    'student_count', (SELECT count(DISTINCT user_email) FROM subs),
+    'questions', coalesce((
+        SELECT jsonb_object_agg(q_id, jsonb_build_object(
+            'present', present,
+            'answered', answered,
+            'correct', correct
+        ))
+        FROM (
+            SELECT
+                q_id,
+                count(*) AS present,
+                count(*) FILTER (WHERE answered) AS answered,
+                count(*) FILTER (WHERE is_correct) AS correct
+            FROM graded
+            GROUP BY q_id
+        ) per_question
+    ), '{}'::jsonb),
+    'daily_counts', coalesce((SELECT jsonb_object_agg(day, n) FROM daily WHERE day IS NOT NULL), '{}'::jsonb),
+    'score_distribution', coalesce((
+        SELECT jsonb_object_agg(score::text, n)
+        FROM (SELECT score, count(*) AS n FROM subs GROUP BY score) per_score
+    ), '{}'::jsonb)
+);
+$$;
+
+GRANT EXECUTE ON FUNCTION public.submission_statistics(text[]) TO anon, authenticated;
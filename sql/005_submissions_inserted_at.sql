@@ -0,0 +1,10 @@
+-- Mốc thời gian ghi bài nộp, dùng cho đồng bộ tăng dần kho thống kê (database_helper._sync_stats_store).
+-- id do sequence cấp có thể được commit không theo thứ tự (nhiều lượt lưu đồng thời, hàng đợi ghi theo lô)
+-- nên không dùng id làm mốc đồng bộ. clock_timestamp() lấy thời điểm ghi từng dòng; phía ứng dụng
+-- đọc lại một khoảng chồng lấn phía trước mốc và loại trùng theo id để không bỏ sót dòng commit muộn.
+
+ALTER TABLE public.submissions
+    ADD COLUMN IF NOT EXISTS inserted_at timestamptz NOT NULL DEFAULT clock_timestamp();
+
+CREATE INDEX IF NOT EXISTS submissions_inserted_at_idx
+    ON public.submissions (inserted_at, id);
@@ -0,0 +1,208 @@
+import os
+import sys
+import json
+import time
+import builtins
+import threading
+from contextlib import contextmanager
+
+# Bật chế độ đo thời gian khởi động khi chạy app: STARTUP_PROFILE=1 streamlit run app.py
+STARTUP_PROFILE = os.environ.get("STARTUP_PROFILE", "").lower() in ("1", "true", "yes")
+STARTUP_PROFILE_PATH = os.environ.get("STARTUP_PROFILE_PATH", "startup_profile.json")
+
+# Các module được đo khi chạy trực tiếp: python startup_profiler.py
+DEFAULT_MODULES = [
+    "database_helper",
+    "surveyhandler",
+    "question_manager",
+    "stats_dashboard",
+    "admin_dashboard",
+    "report",
+    "export_backends",
+    "report_exports",
+    "app",
+]
+
+class StartupProfiler:
+    """Ghi thời gian import (lần đầu) của từng module và thời gian các bước khởi tạo
+
+    Với mỗi module: cumulative = tổng thời gian import kể cả các module con được import lần đầu
+    bên trong, self = cumulative trừ thời gian của các module con đó. Import trên mọi luồng đều
+    được đo (Streamlit chạy app.py ở luồng ScriptRunner, không phải luồng chính); mỗi luồng có
+    ngăn xếp riêng để thời gian của luồng này không bị trừ vào module của luồng khác.
+    """
+    def __init__(self):
+        self.entries = {}  # tên -> {"kind", "cumulative", "self", "count"}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._original_import = None
+
+    def install(self):
+        if self._original_import is None:
+            self._original_import = builtins.__import__
+            builtins.__import__ = self._timed_import
+
+    def uninstall(self):
+        if self._original_import is not None:
+            builtins.__import__ = self._original_import
+            self._original_import = None
+
+    def _timed_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        # Chỉ đo import tuyệt đối lần đầu, các import khác đi thẳng
+        if level != 0 or name in sys.modules:
+            return self._original_import(name, globals, locals, fromlist, level)
+        with self._measure(name, "import"):
+            return self._original_import(name, globals, locals, fromlist, level)
+
+    @contextmanager
+    def _measure(self, name, kind):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            children = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            with self._lock:
+                entry = self.entries.setdefault(name, {"kind": kind, "cumulative": 0.0, "self": 0.0, "count": 0})
+                entry["cumulative"] += elapsed
+                entry["self"] += elapsed - children
+                entry["count"] += 1
+
+    @contextmanager
+    def phase(self, name):
+        """Đo một bước khởi tạo (kết nối database, tìm font...)"""
+        with self._measure(name, "init"):
+            yield
+
+    def ranked(self, limit=None):
+        """Danh sách mục đo xếp theo thời gian tự thân giảm dần"""
+        rows = [dict(name=name, **entry) for name, entry in self.entries.items()]
+        rows.sort(key=lambda row: row["self"], reverse=True)
+        return rows[:limit] if limit else rows
+
+    def text_report(self, limit=30):
+        """Bảng xếp hạng dạng văn bản (thời gian tính bằng ms)"""
+        rows = self.ranked(limit)
+        width = max([len(row["name"]) for row in rows] + [len("Module/bước")])
+        lines = [
+            f"{'Module/bước':<{width}}  {'Loại':<6}  {'Tự thân (ms)':>12}  {'Tổng (ms)':>10}",
+            "-" * (width + 36),
+        ]
+        for row in rows:
+            lines.append(
+                f"{row['name']:<{width}}  {row['kind']:<6}  {row['self'] * 1000:>12.1f}  {row['cumulative'] * 1000:>10.1f}"
+            )
+        total = sum(entry["self"] for entry in self.entries.values())
+        lines.append("-" * (width + 36))
+        lines.append(f"Tổng thời gian đo được: {total * 1000:.1f} ms ({len(self.entries)} mục)")
+        return "\n".join(lines)
+
+    def json_report(self):
+        """Báo cáo dạng dict (ghi ra JSON để so sánh giữa các lần triển khai)"""
+        return {
+            "generated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": sys.version.split()[0],
+            "total_ms": round(sum(entry["self"] for entry in self.entries.values()) * 1000, 3),
+            "entries": [
+                {
+                    "name": row["name"],
+                    "kind": row["kind"],
+                    "self_ms": round(row["self"] * 1000, 3),
+                    "cumulative_ms": round(row["cumulative"] * 1000, 3),
+                    "count": row["count"],
+                }
+                for row in self.ranked()
+            ],
+        }
+
+    def write_json(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.json_report(), f, ensure_ascii=False, indent=2)
+
+_profiler = None
+_reported = False
+
+def start_profiling(force=False):
+    """Bật đo import khi STARTUP_PROFILE=1 (hoặc force=True), gọi ở dòng đầu của app.py"""
+    global _profiler
+    if _profiler is None and (force or STARTUP_PROFILE):
+        _profiler = StartupProfiler()
+        _profiler.install()
+    return _profiler
+
+@contextmanager
+def profile_phase(name):
+    """Đo một bước khởi tạo nếu đang bật chế độ đo, ngược lại không làm gì"""
+    if _profiler is None:
+        yield
+    else:
+        with _profiler.phase(name):
+            yield
+
+def finish_profiling(json_path=STARTUP_PROFILE_PATH):
+    """In bảng xếp hạng và ghi JSON một lần mỗi tiến trình (sau lượt chạy đầu tiên của app)"""
+    global _reported
+    if _profiler is None or _reported:
+        return
+    _reported = True
+    _profiler.uninstall()
+    print(_profiler.text_report())
+    try:
+        _profiler.write_json(json_path)
+        print(f"Đã ghi báo cáo khởi động: {json_path}")
+    except OSError as e:
+        print(f"Không thể ghi báo cáo khởi động: {e}")
+
+def _init_phases():
+    """Các bước khởi tạo tốn thời gian ngoài import (không kết nối mạng)"""
+    from pdf_fonts import resolve_fonts
+    from export_backends import fpdf_version, load_exports
+    return [
+        ("pdf_fonts.resolve_fonts", resolve_fonts),
+        ("export_backends.fpdf_version", fpdf_version),
+        ("export_backends.load_exports", load_exports),
+    ]
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Đo thời gian import/khởi tạo của các module trong ứng dụng")
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES, help="Module cần đo (mặc định: các module chính)")
+    parser.add_argument("--json", dest="json_path", default=STARTUP_PROFILE_PATH, help="Đường dẫn file JSON kết quả")
+    parser.add_argument("--top", type=int, default=30, help="Số dòng hiển thị trong bảng")
+    parser.add_argument("--skip-init", action="store_true", help="Không đo các bước khởi tạo (font, phiên bản fpdf...)")
+    args = parser.parse_args(argv)
+
+    profiler = start_profiling(force=True)
+    for module_name in args.modules:
+        try:
+            __import__(module_name)
+        except Exception as e:
+            print(f"Không thể import {module_name}: {e}")
+
+    if not args.skip_init:
+        try:
+            phases = _init_phases()
+        except Exception as e:
+            print(f"Không thể chuẩn bị các bước khởi tạo: {e}")
+            phases = []
+        for name, step in phases:
+            try:
+                with profiler.phase(name):
+                    step()
+            except Exception as e:
+                print(f"Lỗi ở bước {name}: {e}")
+
+    profiler.uninstall()
+    print(profiler.text_report(args.top))
+    profiler.write_json(args.json_path)
+    print(f"Đã ghi báo cáo khởi động: {args.json_path}")
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,11 @@
 import streamlit as st
 import pandas as pd
 import matplotlib.pyplot as plt
-import json
 from datetime import datetime
 
 # Import từ các module khác
 from database_helper import get_all_questions, get_user_submissions, get_submission_statistics, check_answer_correctness
+from column_codec import decode_question, decode_responses
 
 def stats_dashboard():
     """Hiển thị trang thống kê và báo cáo"""
@@ -263,12 +263,7 @@ def student_data_analysis():
                 
                 with st.expander(f"Lần {idx + 1}: {submission_time} - Điểm: {s.get('score', 0)}/{max_score} ({score_percent:.1f}%)"):
                     # Đảm bảo responses đúng định dạng
-                    responses = s.get("responses", {})
-                    if isinstance(responses, str):
-                        try:
-                            responses = json.loads(responses)
-                        except:
-                            responses = {}
+                    responses = decode_responses(s.get("responses", {}))
                     
                     # Phân tích câu trả lời
                     correct_count = 0
@@ -277,20 +272,7 @@ def student_data_analysis():
                         student_answers = responses.get(q_id, [])
                         
                         # Đảm bảo câu hỏi có định dạng đúng
-                        if isinstance(q.get("answers"), str):
-                            try:
-                                q["answers"] = json.loads(q.get("answers"))
-                            except:
-                                q["answers"] = [q.get("answers")]
-                        
-                        if isinstance(q.get("correct"), str):
-                            try:
-                                q["correct"] = json.loads(q.get("correct"))
-                            except:
-                                try:
-                                    q["correct"] = [int(x.strip()) for x in q.get("correct", "").split(",")]
-                                except:
-                                    q["correct"] = []
+                        decode_question(q)
                         
                         # Kiểm tra tính đúng đắn
                         is_correct = check_answer_correctness(student_answers, q)
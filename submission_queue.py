@@ -0,0 +1,319 @@
+import os
+import json
+import time
+import uuid
+import queue
+import threading
+import streamlit as st
+from datetime import datetime
+
+from database_helper import get_supabase_client, get_all_questions, calculate_score, record_submission_statistics
+from column_codec import decode_submission, encode_json_column
+
+# Thư mục dữ liệu của ứng dụng (không dùng thư mục tạm vì file ghi trước phải còn sau khi khởi động lại máy)
+APP_DATA_DIR = os.environ.get("APP_DATA_DIR", os.path.join(os.path.expanduser("~"), ".survey_app"))
+# File ghi trước (write-ahead) giữ các bài nộp chưa lưu xong, để khôi phục sau khi khởi động lại
+SUBMISSION_WAL_PATH = os.environ.get("SUBMISSION_WAL_PATH", os.path.join(APP_DATA_DIR, "submission_queue.wal.jsonl"))
+# Số luồng ghi bài nộp chạy nền
+SUBMISSION_QUEUE_WORKERS = int(os.environ.get("SUBMISSION_QUEUE_WORKERS", "2"))
+# Số bài nộp tối đa đang chờ trong hàng đợi (vượt quá thì báo hệ thống bận)
+SUBMISSION_QUEUE_MAX_SIZE = int(os.environ.get("SUBMISSION_QUEUE_MAX_SIZE", "1000"))
+# Thời gian chờ tối đa (giây) để có chỗ trống trong hàng đợi
+SUBMISSION_QUEUE_PUT_TIMEOUT = 5
+# Số bài nộp tối đa trong một lần ghi
+SUBMISSION_BATCH_SIZE = 50
+# Thời gian chờ tối đa (giây) giữa các lần thử lại
+SUBMISSION_RETRY_MAX_DELAY = 60
+# Số lần thử ghi cả lô trước khi chia đôi lô để tìm bài lỗi
+SUBMISSION_MAX_ATTEMPTS = int(os.environ.get("SUBMISSION_MAX_ATTEMPTS", "5"))
+# Số lần thử ghi mỗi phần khi đã chia lô; bài lẻ vẫn lỗi được chuyển vào danh sách lỗi
+SUBMISSION_SPLIT_ATTEMPTS = 2
+
+class SubmissionQueue:
+    """Hàng đợi bài nộp: nhận ngay, ghi vào database theo lô ở luồng nền và thử lại khi lỗi"""
+
+    def __init__(self, wal_path=SUBMISSION_WAL_PATH, workers=SUBMISSION_QUEUE_WORKERS,
+                 max_size=SUBMISSION_QUEUE_MAX_SIZE, batch_size=SUBMISSION_BATCH_SIZE):
+        self.wal_path = wal_path
+        self.batch_size = batch_size
+        self._queue = queue.Queue(maxsize=max_size)
+        self._wal_lock = threading.Lock()
+        # receipt_id -> bài nộp chưa được xác nhận đã lưu
+        self._pending = {}
+        # receipt_id -> {"record", "error"}: bài ghi lỗi nhiều lần, chờ quản trị viên gửi lại hoặc bỏ
+        self._failed = {}
+        self._workers = [
+            threading.Thread(target=self._worker, name=f"submission-writer-{i}", daemon=True)
+            for i in range(max(1, workers))
+        ]
+
+    def start(self):
+        """Khôi phục các bài nộp còn trong file ghi trước rồi khởi động các luồng ghi"""
+        wal_dir = os.path.dirname(os.path.abspath(self.wal_path))
+        os.makedirs(wal_dir, exist_ok=True)
+        recovered, failed = self._replay_wal()
+        with self._wal_lock:
+            for record in recovered:
+                self._pending[record["receipt_id"]] = record
+            self._failed.update(failed)
+        if failed:
+            print(f"Có {len(failed)} bài nộp ghi lỗi đang chờ xử lý trong {self.wal_path}")
+        for worker in self._workers:
+            worker.start()
+        if recovered:
+            print(f"Khôi phục {len(recovered)} bài nộp chưa lưu từ {self.wal_path}")
+            # Đưa lại vào hàng đợi ở luồng riêng để không chặn lượt chạy hiện tại khi hàng đợi đầy
+            threading.Thread(
+                target=self._requeue,
+                args=(recovered,),
+                name="submission-replay",
+                daemon=True
+            ).start()
+        return self
+
+    def submit(self, record):
+        """Ghi bài nộp vào file ghi trước rồi đưa vào hàng đợi, trả về False nếu hàng đợi đầy"""
+        with self._wal_lock:
+            self._append_wal({"op": "enqueue", "record": record})
+            self._pending[record["receipt_id"]] = record
+
+        try:
+            self._queue.put(record, timeout=SUBMISSION_QUEUE_PUT_TIMEOUT)
+            return True
+        except queue.Full:
+            # Bài nộp bị từ chối không được gửi lại khi khởi động
+            self._mark_finished([record["receipt_id"]], op="drop")
+            return False
+
+    def pending_receipts(self, email):
+        """Danh sách mã biên nhận của học viên còn đang chờ ghi"""
+        with self._wal_lock:
+            return [r["receipt_id"] for r in self._pending.values() if r["user_email"] == email]
+
+    def receipt_status(self, receipt_id):
+        """Trạng thái của một mã biên nhận: "pending", "failed" hoặc "saved" (không còn trong hàng đợi)"""
+        with self._wal_lock:
+            if receipt_id in self._pending:
+                return "pending"
+            if receipt_id in self._failed:
+                return "failed"
+            return "saved"
+
+    def pending_count(self):
+        with self._wal_lock:
+            return len(self._pending)
+
+    def failed_submissions(self):
+        """Các bài ghi lỗi: danh sách {"record", "error"} theo thứ tự nộp"""
+        with self._wal_lock:
+            return [dict(entry) for entry in self._failed.values()]
+
+    def retry_failed(self, receipt_ids=None):
+        """Đưa các bài ghi lỗi (mặc định: tất cả) trở lại hàng đợi, trả về số bài được gửi lại"""
+        with self._wal_lock:
+            receipt_ids = list(self._failed) if receipt_ids is None else [i for i in receipt_ids if i in self._failed]
+            records = [self._failed.pop(receipt_id)["record"] for receipt_id in receipt_ids]
+            for record in records:
+                self._append_wal({"op": "enqueue", "record": record})
+                self._pending[record["receipt_id"]] = record
+        threading.Thread(target=self._requeue, args=(records,), name="submission-retry", daemon=True).start()
+        return len(records)
+
+    def discard_failed(self, receipt_ids):
+        """Bỏ hẳn các bài ghi lỗi (quản trị viên đã xử lý thủ công)"""
+        with self._wal_lock:
+            receipt_ids = [i for i in receipt_ids if self._failed.pop(i, None) is not None]
+        if receipt_ids:
+            self._mark_finished(receipt_ids, op="drop")
+
+    def _requeue(self, records):
+        for record in records:
+            self._queue.put(record)
+
+    def _worker(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            self._write_with_retry(batch)
+            for _ in batch:
+                self._queue.task_done()
+
+    def _write_with_retry(self, batch):
+        """Ghi một lô; lỗi lặp lại thì chia đôi lô để các bài hợp lệ vẫn được lưu
+
+        Bài lẻ vẫn lỗi sau các lần thử được chuyển vào danh sách lỗi (ghi trong file ghi trước)
+        thay vì thử lại mãi và chặn luồng ghi.
+        """
+        error = self._try_write(batch, SUBMISSION_MAX_ATTEMPTS)
+        if error is not None:
+            self._write_split(batch, error)
+
+    def _write_split(self, batch, error):
+        if len(batch) == 1:
+            self._dead_letter(batch[0], error)
+            return
+        middle = len(batch) // 2
+        for part in (batch[:middle], batch[middle:]):
+            part_error = self._try_write(part, SUBMISSION_SPLIT_ATTEMPTS)
+            if part_error is not None:
+                self._write_split(part, part_error)
+
+    def _try_write(self, batch, attempts):
+        """Thử ghi lô tối đa `attempts` lần (chờ lâu dần giữa các lần), trả về lỗi cuối hoặc None"""
+        error = None
+        for attempt in range(1, attempts + 1):
+            try:
+                self._write_batch(batch)
+                self._mark_finished([r["receipt_id"] for r in batch])
+                return None
+            except Exception as e:
+                error = e
+                if attempt < attempts:
+                    delay = min(2 ** attempt, SUBMISSION_RETRY_MAX_DELAY)
+                    print(f"Lỗi khi ghi {len(batch)} bài nộp (lần {attempt}), thử lại sau {delay}s: {e}")
+                    time.sleep(delay)
+        print(f"Không thể ghi {len(batch)} bài nộp sau {attempts} lần: {error}")
+        return error
+
+    def _dead_letter(self, record, error):
+        """Chuyển bài nộp vào danh sách lỗi; bài vẫn được giữ trong file ghi trước để gửi lại"""
+        with self._wal_lock:
+            self._pending.pop(record["receipt_id"], None)
+            self._failed[record["receipt_id"]] = {"record": record, "error": str(error)}
+            self._append_wal({"op": "dead", "receipt_ids": [record["receipt_id"]], "error": str(error)})
+
+    def _write_batch(self, batch):
+        # Không gọi get_supabase_client khi thiếu cấu hình để tránh st.error từ luồng nền
+        if not os.environ.get("SUPABASE_URL") or not os.environ.get("SUPABASE_KEY"):
+            raise RuntimeError("Biến môi trường SUPABASE_URL và SUPABASE_KEY chưa được thiết lập.")
+        supabase = get_supabase_client()
+        if not supabase:
+            raise RuntimeError("Không thể kết nối đến Supabase.")
+
+        rows = [{
+            "receipt_id": r["receipt_id"],
+            "user_email": r["user_email"],
+            "responses": encode_json_column(r["responses"]),
+            "score": r["score"],
+            "timestamp": r["timestamp"]
+        } for r in batch]
+        # receipt_id là khóa duy nhất nên gửi lại một lô đã lưu không tạo bản ghi trùng
+        result = supabase.table("submissions").upsert(rows, on_conflict="receipt_id", ignore_duplicates=True).execute()
+
+        # Cộng dồn vào kho thống kê các bài vừa được thêm (bài trùng không có trong kết quả trả về)
+        try:
+            questions = get_all_questions()
+            for saved in result.data or []:
+                record_submission_statistics(decode_submission(saved), questions)
+        except Exception as e:
+            # Bài đã lưu: kho thống kê sẽ nhận bài này ở lần đồng bộ sau
+            print(f"Không thể cập nhật kho thống kê sau khi ghi bài nộp: {e}")
+
+    def _mark_finished(self, receipt_ids, op="done"):
+        with self._wal_lock:
+            for receipt_id in receipt_ids:
+                self._pending.pop(receipt_id, None)
+            if self._pending or self._failed:
+                self._append_wal({"op": op, "receipt_ids": receipt_ids})
+            else:
+                # Không còn bài chờ hay bài lỗi: thu gọn file ghi trước
+                self._truncate_wal()
+
+    def _append_wal(self, entry):
+        with open(self.wal_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _truncate_wal(self):
+        with open(self.wal_path, "w", encoding="utf-8") as f:
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _replay_wal(self):
+        """Đọc file ghi trước, trả về (bài chưa được xác nhận đã lưu theo thứ tự nộp, bài ghi lỗi)"""
+        pending = {}
+        failed = {}
+        try:
+            with open(self.wal_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # Dòng cuối có thể bị ghi dở khi tiến trình dừng đột ngột
+                        continue
+                    if entry.get("op") == "enqueue":
+                        # Bài ghi lỗi được gửi lại cũng có một dòng enqueue mới
+                        failed.pop(entry["record"]["receipt_id"], None)
+                        pending[entry["record"]["receipt_id"]] = entry["record"]
+                    elif entry.get("op") == "dead":
+                        for receipt_id in entry.get("receipt_ids", []):
+                            record = pending.pop(receipt_id, None)
+                            if record is not None:
+                                failed[receipt_id] = {"record": record, "error": entry.get("error", "")}
+                    else:
+                        for receipt_id in entry.get("receipt_ids", []):
+                            pending.pop(receipt_id, None)
+                            failed.pop(receipt_id, None)
+        except FileNotFoundError:
+            return [], {}
+        except Exception as e:
+            print(f"Lỗi khi đọc file ghi trước {self.wal_path}: {e}")
+            return [], {}
+        return list(pending.values()), failed
+
+_submission_queue = None
+_submission_queue_lock = threading.Lock()
+
+def get_submission_queue():
+    """Trả về hàng đợi bài nộp dùng chung, khởi động luồng ghi ở lần gọi đầu tiên"""
+    global _submission_queue
+    with _submission_queue_lock:
+        if _submission_queue is None:
+            _submission_queue = SubmissionQueue().start()
+        return _submission_queue
+
+def enqueue_submission(email, responses):
+    """Chấm điểm và đưa bài làm vào hàng đợi ghi, trả về kết quả kèm mã biên nhận"""
+    try:
+        questions = get_all_questions()
+        score = calculate_score(responses, questions)
+
+        record = {
+            "receipt_id": uuid.uuid4().hex,
+            "user_email": email,
+            "responses": responses,
+            "score": score,
+            "timestamp": datetime.now().isoformat()
+        }
+
+        if not get_submission_queue().submit(record):
+            st.error("Hệ thống đang nhận quá nhiều bài nộp, vui lòng thử lại sau ít phút.")
+            return None
+
+        return {
+            "id": record["receipt_id"],
+            "receipt_id": record["receipt_id"],
+            "email": email,
+            "responses": responses,
+            "score": score,
+            "timestamp": record["timestamp"]
+        }
+    except Exception as e:
+        st.error(f"Lỗi khi gửi bài làm: {e}")
+        return None
+
+def receipt_status(receipt_id):
+    """Trạng thái lưu của bài nộp theo mã biên nhận ("pending", "failed" hoặc "saved")"""
+    return get_submission_queue().receipt_status(receipt_id)
+
+def count_attempts(email, saved_submissions):
+    """Đếm số lần làm bài gồm bài đã lưu và bài còn đang chờ ghi trong hàng đợi"""
+    saved_receipts = {s.get("receipt_id") for s in saved_submissions}
+    pending = [r for r in get_submission_queue().pending_receipts(email) if r not in saved_receipts]
+    return len(saved_submissions) + len(pending)
@@ -0,0 +1,120 @@
+from datetime import datetime
+
+from grading import compile_questions, is_answer_correct
+from column_codec import decode_responses
+
+# Hàm tổng hợp phía Postgres, xem sql/004_submission_statistics_rpc.sql
+SUBMISSION_STATISTICS_RPC = "submission_statistics"
+
+def submission_date(timestamp):
+    """Lấy ngày nộp bài (YYYY-MM-DD) từ timestamp ISO hoặc Unix timestamp"""
+    if isinstance(timestamp, datetime):
+        submitted_at = timestamp
+    elif isinstance(timestamp, str):
+        try:
+            submitted_at = datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+        except:
+            submitted_at = datetime.now()  # Giá trị mặc định nếu không thể parse
+    else:
+        # Nếu vẫn còn lưu dạng Unix timestamp (dữ liệu cũ)
+        try:
+            submitted_at = datetime.fromtimestamp(timestamp)
+        except:
+            submitted_at = datetime.now()
+    return submitted_at.strftime("%Y-%m-%d")
+
+def _score_key(score):
+    """Chuẩn hóa điểm làm khóa phân bố điểm (5.0 và "5" đều thành 5)"""
+    try:
+        score = float(score or 0)
+    except (TypeError, ValueError):
+        return 0
+    return int(score) if score.is_integer() else score
+
+def new_aggregates(questions):
+    """Tạo bộ tổng hợp rỗng (cùng dạng với kết quả của hàm RPC)
+
+    Với mỗi câu hỏi: present = số bài có mục trả lời, answered = số bài có chọn ít nhất
+    một đáp án, correct = số bài trả lời đúng.
+    """
+    return {
+        "total_submissions": 0,
+        "score_sum": 0,
+        "student_emails": set(),
+        "questions": {str(q["id"]): {"present": 0, "answered": 0, "correct": 0} for q in questions},
+        "daily_counts": {},
+        "score_distribution": {},
+    }
+
+def fold_submission(aggregates, submission, compiled_questions):
+    """Cộng dồn một bài nộp vào bộ tổng hợp"""
+    responses = decode_responses(submission.get("responses", {}))
+    score = submission.get("score", 0) or 0
+
+    aggregates["total_submissions"] += 1
+    aggregates["score_sum"] += score
+    aggregates["student_emails"].add(submission.get("user_email"))
+
+    date_str = submission_date(submission.get("timestamp"))
+    aggregates["daily_counts"][date_str] = aggregates["daily_counts"].get(date_str, 0) + 1
+
+    score_key = _score_key(score)
+    aggregates["score_distribution"][score_key] = aggregates["score_distribution"].get(score_key, 0) + 1
+
+    for cq in compiled_questions:
+        if cq.id not in responses:
+            continue
+        counters = aggregates["questions"][cq.id]
+        counters["present"] += 1
+        if responses[cq.id]:
+            counters["answered"] += 1
+            if is_answer_correct(responses[cq.id], cq):
+                counters["correct"] += 1
+
+def aggregate_submissions(submissions, questions):
+    """Tổng hợp thống kê bằng Python thuần (dùng khi không gọi được hàm RPC hoặc khi chạy thử)"""
+    aggregates = new_aggregates(questions)
+    compiled_questions = compile_questions(questions)
+    for s in submissions:
+        fold_submission(aggregates, s, compiled_questions)
+    return aggregates
+
+def student_count(aggregates):
+    """Số học viên khác nhau trong bộ tổng hợp (RPC chỉ trả về số lượng)"""
+    if "student_count" in aggregates:
+        return aggregates["student_count"]
+    return len(aggregates["student_emails"])
+
+def fetch_aggregates(supabase, questions, user_emails=None):
+    """Gọi hàm tổng hợp phía Postgres, trả về None nếu database chưa có hàm hoặc lỗi"""
+    try:
+        result = supabase.rpc(SUBMISSION_STATISTICS_RPC, {"p_user_emails": user_emails}).execute()
+    except Exception:
+        # Database chưa chạy migration 004: nơi gọi chuyển sang tổng hợp bằng Python
+        return None
+
+    data = result.data
+    if isinstance(data, list):
+        data = data[0] if data else None
+    if not isinstance(data, dict):
+        return None
+
+    # Câu hỏi chưa có bài trả lời nào không xuất hiện trong kết quả RPC
+    question_counts = {str(q["id"]): {"present": 0, "answered": 0, "correct": 0} for q in questions}
+    for q_id, counts in (data.get("questions") or {}).items():
+        if q_id in question_counts:
+            question_counts[q_id].update({k: int(counts.get(k) or 0) for k in ("present", "answered", "correct")})
+
+    score_distribution = {}
+    for score, count in (data.get("score_distribution") or {}).items():
+        score_key = _score_key(score)
+        score_distribution[score_key] = score_distribution.get(score_key, 0) + int(count)
+
+    return {
+        "total_submissions": int(data.get("total_submissions") or 0),
+        "score_sum": float(data.get("score_sum") or 0),
+        "student_count": int(data.get("student_count") or 0),
+        "questions": question_counts,
+        "daily_counts": dict(sorted((data.get("daily_counts") or {}).items())),
+        "score_distribution": score_distribution,
+    }
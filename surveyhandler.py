@@ -1,9 +1,11 @@
-import json
 import streamlit as st
 from datetime import datetime
 
 # Import từ các module khác
-from database_helper import get_all_questions, save_submission, get_user_submissions
+from database_helper import get_all_questions, get_user_submissions
+from grading import check_answer_correctness
+from column_codec import decode_question
+from submission_queue import enqueue_submission, count_attempts, receipt_status
 
 def survey_form(email, full_name, class_name):
     st.title("Làm bài khảo sát đánh giá viên nội bộ ISO 50001:2018")
@@ -22,28 +24,13 @@ def survey_form(email, full_name, class_name):
     
     # Đảm bảo định dạng dữ liệu câu hỏi đúng
     for q in questions:
-        # Đảm bảo answers là list
-        if isinstance(q["answers"], str):
-            try:
-                q["answers"] = json.loads(q["answers"])
-            except:
-                q["answers"] = [q["answers"]]
-        
-        # Đảm bảo correct là list
-        if isinstance(q["correct"], str):
-            try:
-                q["correct"] = json.loads(q["correct"])
-            except:
-                try:
-                    q["correct"] = [int(x.strip()) for x in q["correct"].split(",")]
-                except:
-                    q["correct"] = []
+        decode_question(q)
     
     # Lấy lịch sử bài làm của học viên này
     user_submissions = get_user_submissions(email)
     
-    # Đếm số lần đã làm bài
-    submission_count = len(user_submissions)
+    # Đếm số lần đã làm bài (gồm cả bài đang chờ ghi trong hàng đợi)
+    submission_count = count_attempts(email, user_submissions)
     
     # Kiểm tra giới hạn làm bài (tối đa 3 lần)
     MAX_ATTEMPTS = 3
@@ -53,11 +40,12 @@ def survey_form(email, full_name, class_name):
     if submission_count > 0:
         st.write(f"**Số lần đã làm bài:** {submission_count}/{MAX_ATTEMPTS}")
         
-        # Hiển thị điểm cao nhất đã đạt được
-        max_score = max([s["score"] for s in user_submissions])
-        max_possible = sum([q["score"] for q in questions])
-        
-        st.write(f"**Điểm cao nhất đã đạt được:** {max_score}/{max_possible} ({(max_score/max_possible*100):.1f}%)")
+        # Hiển thị điểm cao nhất đã đạt được (bài đang chờ ghi chưa có trong danh sách)
+        if user_submissions:
+            max_score = max([s["score"] for s in user_submissions])
+            max_possible = sum([q["score"] for q in questions])
+            
+            st.write(f"**Điểm cao nhất đã đạt được:** {max_score}/{max_possible} ({(max_score/max_possible*100):.1f}%)")
     else:
         st.write(f"**Đây là lần làm bài đầu tiên của bạn**")
     
@@ -118,14 +106,13 @@ def survey_form(email, full_name, class_name):
             submit_button = st.form_submit_button(label="📨 Gửi đáp án", use_container_width=True)
             
             if submit_button:
-                # Kiểm tra lại số lần làm bài (để đảm bảo không vượt quá giới hạn)
-                latest_submissions = get_user_submissions(email)
-                if len(latest_submissions) >= MAX_ATTEMPTS:
+                # Kiểm tra lại số lần làm bài, tính cả bài vừa được đưa vào hàng đợi
+                if count_attempts(email, user_submissions) >= MAX_ATTEMPTS:
                     st.error("Bạn đã sử dụng hết số lần làm bài cho phép!")
                     st.session_state.submission_result = None
                 else:
-                    # Lưu câu trả lời vào database với ID duy nhất
-                    result = save_submission(email, responses)
+                    # Đưa câu trả lời vào hàng đợi ghi, database được cập nhật ở luồng nền
+                    result = enqueue_submission(email, responses)
                     
                     if result:
                         st.session_state.submission_result = result
@@ -139,15 +126,20 @@ def survey_form(email, full_name, class_name):
         result = st.session_state.submission_result
         max_score = st.session_state.max_score
         
-        st.success(f"✅ Đã ghi nhận bài làm của bạn! (Mã nộp: {result['id']})")
+        receipt_id = result.get('receipt_id', result['id'])
+        status = receipt_status(receipt_id) if result.get('receipt_id') else "saved"
+        if status == "saved":
+            st.success(f"✅ Đã lưu bài làm của bạn! (Mã biên nhận: {receipt_id})")
+        elif status == "pending":
+            st.info(f"⏳ Bài làm đã được nhận và đang được lưu (Mã biên nhận: {receipt_id}). Tải lại trang để kiểm tra.")
+        else:
+            st.error(f"❌ Chưa lưu được bài làm (Mã biên nhận: {receipt_id}). Vui lòng báo mã biên nhận cho quản trị viên.")
         
         # Hiển thị thông tin chi tiết về kết quả
         display_submission_details(result, questions, max_score)
         
-        # Cập nhật lại số lần làm bài sau khi nộp thành công
-        updated_submissions = get_user_submissions(email)
-        updated_count = len(updated_submissions)
-        remaining = MAX_ATTEMPTS - updated_count
+        # Số lần làm bài ở đầu trang đã gồm bài vừa nộp (đã lưu hoặc đang chờ ghi)
+        remaining = remaining_attempts
         
         # Nút làm bài lại (nếu còn lượt)
         if remaining > 0:
@@ -157,34 +149,6 @@ def survey_form(email, full_name, class_name):
         else:
             st.warning("⚠️ Bạn đã sử dụng hết số lần làm bài cho phép.")
 
-def check_answer_correctness(student_answers, question):
-    """Kiểm tra đáp án có đúng không, hỗ trợ chọn nhiều đáp án."""
-    # Nếu câu trả lời trống, không đúng
-    if not student_answers:
-        return False
-        
-    # Đối với câu hỏi combobox (chỉ chọn một)
-    if question["type"] == "Combobox":
-        # Nếu có một đáp án và đáp án đó ở vị trí nằm trong danh sách đáp án đúng
-        if len(student_answers) == 1:
-            answer_text = student_answers[0]
-            answer_index = question["answers"].index(answer_text) + 1 if answer_text in question["answers"] else -1
-            return answer_index in question["correct"]
-        return False
-    
-    # Đối với câu hỏi checkbox (nhiều lựa chọn)
-    elif question["type"] == "Checkbox":
-        # Tìm index (vị trí) của các đáp án học viên đã chọn
-        selected_indices = []
-        for ans in student_answers:
-            if ans in question["answers"]:
-                selected_indices.append(question["answers"].index(ans) + 1)
-        
-        # So sánh với danh sách đáp án đúng
-        return set(selected_indices) == set(question["correct"])
-    
-    return False
-
 def display_submission_details(submission, questions, max_score):
     """Hiển thị chi tiết về bài nộp, bao gồm thông tin điểm và câu trả lời."""
     
@@ -0,0 +1,39 @@
+import os
+import sys
+
+import pytest
+
+# Các module của ứng dụng nằm ở thư mục gốc của repo
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture
+def questions():
+    """Ngân hàng câu hỏi mẫu, gồm cả dữ liệu kiểu cũ (JSON string, chuỗi "1,3")"""
+    return [
+        {"id": 1, "question": "Combobox", "type": "Combobox", "score": 2, "answers": ["A", "B", "C"], "correct": [2]},
+        # Đáp án trùng nhau: vị trí của "X" là lần xuất hiện đầu tiên
+        {"id": 2, "question": "Checkbox cũ", "type": "Checkbox", "score": 3, "answers": '["X", "Y", "Z", "X"]', "correct": "1,3"},
+        {"id": 3, "question": "Checkbox JSON", "type": "Checkbox", "score": 1, "answers": ["P", "Q"], "correct": "[1, 2]"},
+        # Vị trí đáp án đúng không tồn tại
+        {"id": 4, "question": "Combobox lỗi", "type": "Combobox", "score": 1, "answers": ["M", "N"], "correct": [5]},
+        {"id": 5, "question": "Checkbox lỗi", "type": "Checkbox", "score": 1, "answers": ["K", "L"], "correct": [1, 7]},
+        {"id": 6, "question": "Loại khác", "type": "Text", "score": 4, "answers": ["T"], "correct": [1]},
+    ]
+
+@pytest.fixture
+def submissions():
+    """Bài nộp mẫu: đúng, sai, bỏ qua, chọn trùng, đáp án lạ, responses dạng JSON string"""
+    return [
+        {"id": 1, "user_email": "a@example.com", "score": 6, "timestamp": "2024-05-01T08:00:00",
+         "responses": {"1": ["B"], "2": ["X", "Z"], "3": ["P", "Q"], "4": ["M"], "5": ["K"], "6": ["T"]}},
+        {"id": 2, "user_email": "a@example.com", "score": 0, "timestamp": "2024-05-01T09:30:00Z",
+         "responses": '{"1": ["A"], "2": ["X"], "3": [], "4": ["N"]}'},
+        {"id": 3, "user_email": "b@example.com", "score": 5, "timestamp": "2024-05-02T10:00:00+07:00",
+         "responses": {"1": ["B", "C"], "2": ["Z", "X", "X"], "3": ["Q", "P", "R"]}},
+        {"id": 4, "user_email": "c@example.com", "score": 2.5, "timestamp": 1714723200,
+         "responses": {"1": ["D"], "2": ["Y", "W"], "5": ["K", "L"]}},
+        {"id": 5, "user_email": "c@example.com", "score": None, "timestamp": "2024-05-03T07:15:00",
+         "responses": {}},
+        {"id": 6, "user_email": "d@example.com", "score": 2, "timestamp": "2024-05-03T18:45:00",
+         "responses": '{"1": ["B"], "2": ["W"], "3": ["P"]}'},
+    ]
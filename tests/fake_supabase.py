@@ -0,0 +1,81 @@
+"""Supabase client giả lập trong bộ nhớ cho các test truy vấn bảng submissions"""
+
+class FakeResult:
+    def __init__(self, data):
+        self.data = data
+
+class FakeQuery:
+    def __init__(self, client, table_name):
+        self.client = client
+        self.table_name = table_name
+        self.filters = []
+        self.conditions = []  # (phép lọc, cột, giá trị) theo thứ tự gọi
+        self.order_by = []
+        self.start = 0
+        self.stop = None
+        self.columns = "*"
+        self.values = None
+
+    def select(self, columns="*"):
+        self.columns = columns
+        return self
+
+    def update(self, values):
+        self.values = values
+        return self
+
+    def gt(self, column, value):
+        self.conditions.append(("gt", column, value))
+        self.filters.append(lambda row: row[column] > value)
+        return self
+
+    def gte(self, column, value):
+        self.conditions.append(("gte", column, value))
+        self.filters.append(lambda row: row[column] >= value)
+        return self
+
+    def in_(self, column, values):
+        self.conditions.append(("in", column, values))
+        self.filters.append(lambda row: row[column] in values)
+        return self
+
+    def order(self, column):
+        self.order_by.append(column)
+        return self
+
+    def limit(self, count):
+        self.stop = self.start + count
+        return self
+
+    def range(self, start, end):
+        self.start, self.stop = start, end + 1
+        return self
+
+    def execute(self):
+        self.client.executed.append(self)
+        if self.client.fail_at is not None and len(self.client.executed) >= self.client.fail_at:
+            raise ConnectionError("mất kết nối")
+        rows = [row for row in self.client.tables[self.table_name] if all(f(row) for f in self.filters)]
+        if self.values is not None:
+            for row in rows:
+                row.update(self.values)
+            return FakeResult([dict(row) for row in rows])
+        if self.order_by:
+            rows.sort(key=lambda row: tuple(row[column] for column in self.order_by))
+        rows = rows[self.start:self.stop]
+        if self.columns != "*":
+            columns = self.columns.split(",")
+            rows = [{column: row[column] for column in columns} for row in rows]
+        else:
+            rows = [dict(row) for row in rows]
+        return FakeResult(rows)
+
+class FakeSupabase:
+    def __init__(self, **tables):
+        self.tables = tables
+        self.executed = []
+        # Lệnh execute thứ fail_at (bắt đầu từ 1) và các lệnh sau đó báo lỗi
+        self.fail_at = None
+
+    def table(self, table_name):
+        return FakeQuery(self, table_name)
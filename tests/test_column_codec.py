@@ -0,0 +1,91 @@
+import json
+
+import pytest
+
+import column_codec
+from column_codec import (
+    decode_answers, decode_correct, decode_question, decode_responses, decode_submission,
+    encode_json_column, encode_question
+)
+
+QUESTION = {"id": 7, "question": "Câu hỏi", "type": "Checkbox", "score": 2, "answers": ["Đúng", "Sai", "Không rõ"], "correct": [1, 3]}
+RESPONSES = {"7": ["Đúng", "Không rõ"], "8": []}
+
+@pytest.fixture(params=[False, True], ids=["text", "jsonb"])
+def jsonb(request, monkeypatch):
+    monkeypatch.setattr(column_codec, "SUPABASE_JSONB_COLUMNS", request.param)
+    return request.param
+
+def _stored(value):
+    """Giá trị đọc lại từ database: cột text trả về chuỗi, cột JSONB trả về list/dict"""
+    return json.loads(json.dumps(value)) if not isinstance(value, str) else value
+
+def test_question_round_trip(jsonb):
+    encoded = encode_question(QUESTION)
+    if jsonb:
+        assert encoded["answers"] == QUESTION["answers"]
+        assert encoded["correct"] == QUESTION["correct"]
+    else:
+        assert isinstance(encoded["answers"], str)
+        assert isinstance(encoded["correct"], str)
+    assert decode_question({k: _stored(v) for k, v in encoded.items()}) == QUESTION
+
+def test_encode_question_does_not_modify_input(jsonb):
+    original = json.loads(json.dumps(QUESTION))
+    encode_question(QUESTION)
+    assert QUESTION == original
+
+def test_submission_round_trip(jsonb):
+    stored = _stored(encode_json_column(RESPONSES))
+    assert isinstance(stored, dict) == jsonb
+    assert decode_submission({"id": 1, "responses": stored})["responses"] == RESPONSES
+
+def test_encode_keeps_scalars(jsonb):
+    assert encode_json_column("1,2") == "1,2"
+    assert encode_json_column(None) is None
+
+def test_decode_legacy_correct_string():
+    assert decode_correct("1, 3") == [1, 3]
+    assert decode_correct("[2]") == [2]
+    assert decode_correct("không hợp lệ") == []
+    assert decode_correct(None) == []
+
+def test_decode_legacy_answers_string():
+    assert decode_answers('["A", "B"]') == ["A", "B"]
+    # Chuỗi không phải JSON được xem là một đáp án duy nhất
+    assert decode_answers("A") == ["A"]
+    assert decode_answers(None) == []
+    assert decode_answers(("A", "B")) == ["A", "B"]
+
+def test_decode_responses_variants():
+    assert decode_responses(json.dumps(RESPONSES)) == RESPONSES
+    assert decode_responses(RESPONSES) is RESPONSES
+    assert decode_responses("{hỏng") == {}
+    assert decode_responses(None) == {}
+
+def test_decode_scalar_json_answers():
+    # Giá trị JSON đơn được bọc thành một đáp án thay vì tách từng ký tự
+    assert decode_answers('"abc"') == ["abc"]
+    assert decode_answers("2") == ["2"]
+    assert decode_answers("true") == ["true"]
+    assert decode_answers("null") == []
+    assert decode_answers(5) == [5]
+
+def test_decode_scalar_json_correct():
+    assert decode_correct("2") == [2]
+    assert decode_correct(2) == [2]
+    assert decode_correct('"1,3"') == [1, 3]
+    assert decode_correct("null") == []
+    assert decode_correct("") == []
+
+def test_decode_scalar_question():
+    question = decode_question({"id": 1, "answers": '"Có"', "correct": "1"})
+    assert question["answers"] == ["Có"]
+    assert question["correct"] == [1]
+
+def test_decode_non_object_responses():
+    assert decode_responses('[["7", "A"]]') == {}
+    assert decode_responses('"abc"') == {}
+    assert decode_responses("5") == {}
+    assert decode_responses([1]) == {}
+    assert decode_submission({"id": 1, "responses": "null"})["responses"] == {}
@@ -0,0 +1,27 @@
+import os
+
+import pytest
+
+# downloads.py lưu tác vụ xuất trong st.session_state
+pytest.importorskip("streamlit")
+
+import downloads
+
+
+@pytest.fixture
+def session(tmp_path, monkeypatch):
+    monkeypatch.setattr(downloads, "EXPORT_DIR", str(tmp_path))
+    monkeypatch.setattr(downloads.st, "session_state", {})
+    return downloads.st.session_state
+
+
+def test_clear_downloads_removes_session_files(session):
+    job = downloads.submit_export("report", lambda: b"noi dung", "bao_cao.pdf")
+    path = job.result(timeout=5)
+    assert os.path.exists(path)
+
+    # Đăng xuất: người đăng nhập sau trên cùng phiên không thấy file của người trước
+    downloads.clear_downloads()
+
+    assert not os.path.exists(path)
+    assert downloads.get_export("report") is None
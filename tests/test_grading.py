@@ -0,0 +1,57 @@
+from column_codec import decode_answers, decode_correct, decode_responses
+from grading import check_answer_correctness, compile_question, compile_questions, grade_responses, grade_submissions
+
+def legacy_check_answer_correctness(student_answers, question):
+    """Cách chấm ban đầu (list.index trên từng đáp án), dùng làm chuẩn so sánh"""
+    if not student_answers:
+        return False
+    if question["type"] == "Combobox":
+        if len(student_answers) == 1:
+            answer_text = student_answers[0]
+            answer_index = question["answers"].index(answer_text) + 1 if answer_text in question["answers"] else -1
+            return answer_index in question["correct"]
+        return False
+    elif question["type"] == "Checkbox":
+        selected_indices = []
+        for ans in student_answers:
+            if ans in question["answers"]:
+                selected_indices.append(question["answers"].index(ans) + 1)
+        return set(selected_indices) == set(question["correct"])
+    return False
+
+def _decoded(question):
+    return dict(question, answers=decode_answers(question["answers"]), correct=decode_correct(question["correct"]))
+
+def test_compiled_grading_matches_legacy(questions, submissions):
+    for s in submissions:
+        responses = decode_responses(s["responses"])
+        for q in questions:
+            student_answers = responses.get(str(q["id"]), [])
+            expected = legacy_check_answer_correctness(student_answers, _decoded(q))
+            assert check_answer_correctness(student_answers, q) == expected, (s["id"], q["id"])
+
+def test_grade_responses_score_and_results(questions, submissions):
+    compiled = compile_questions(questions)
+    for s in submissions:
+        responses = decode_responses(s["responses"])
+        expected_results = [
+            legacy_check_answer_correctness(responses.get(str(q["id"]), []), _decoded(q)) for q in questions
+        ]
+        expected_score = sum(q["score"] for q, ok in zip(questions, expected_results) if ok)
+        assert grade_responses(s["responses"], compiled) == (expected_score, expected_results)
+
+def test_grade_submissions_matches_grade_responses(questions, submissions):
+    compiled = compile_questions(questions)
+    assert grade_submissions(submissions, questions) == [
+        grade_responses(s["responses"], compiled) for s in submissions
+    ]
+
+def test_duplicate_answers_use_first_position(questions):
+    compiled = compile_question(questions[1])
+    assert compiled.answer_index["X"] == 1
+    assert compiled.correct == frozenset({1, 3})
+
+def test_compile_question_is_cached_by_content(questions):
+    assert compile_question(dict(questions[0])) is compile_question(dict(questions[0]))
+    changed = dict(questions[0], correct=[3])
+    assert compile_question(changed) is not compile_question(questions[0])
@@ -0,0 +1,51 @@
+import pytest
+
+# database_helper cần streamlit và supabase-py
+pytest.importorskip("streamlit")
+pytest.importorskip("supabase")
+
+import database_helper
+from fake_supabase import FakeSupabase
+
+@pytest.fixture
+def fake_client(submissions, monkeypatch):
+    # id không liên tục như khi có bài nộp bị xóa
+    rows = [dict(s, id=s["id"] * 10) for s in submissions]
+    client = FakeSupabase(submissions=rows)
+    monkeypatch.setattr(database_helper, "get_supabase_client", lambda: client)
+    return client
+
+def test_iterates_every_row_in_id_order(fake_client):
+    rows = list(database_helper.iter_submissions(page_size=4))
+
+    assert [s["id"] for s in rows] == [10, 20, 30, 40, 50, 60]
+    # responses dạng JSON string được giải mã
+    assert all(isinstance(s["responses"], dict) for s in rows)
+    # 2 trang: trang đầu đầy, trang sau thiếu nên dừng
+    assert len(fake_client.executed) == 2
+
+def test_pages_continue_after_last_id(fake_client):
+    list(database_helper.iter_submissions(page_size=2))
+
+    # Mỗi trang lọc id > id cuối của trang trước thay vì dùng offset
+    assert [query.conditions for query in fake_client.executed] == [
+        [("gt", "id", 0)], [("gt", "id", 20)], [("gt", "id", 40)], [("gt", "id", 60)]
+    ]
+
+def test_filters_by_email_and_start_id(fake_client):
+    rows = database_helper.iter_submissions(user_emails=["a@example.com", "c@example.com"], after_id=10, page_size=2)
+
+    assert [s["id"] for s in rows] == [20, 40, 50]
+
+def test_selected_columns_without_responses(fake_client):
+    rows = list(database_helper.iter_submissions(columns="id,score", page_size=10))
+
+    assert rows[0] == {"id": 10, "score": 6}
+
+def test_scan_raises_when_a_page_fails(fake_client):
+    fake_client.fail_at = 2
+
+    rows = database_helper.scan_submissions(fake_client, page_size=2)
+    assert [s["id"] for s in (next(rows), next(rows))] == [10, 20]
+    with pytest.raises(ConnectionError):
+        next(rows)
@@ -0,0 +1,75 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+# regrade.py đọc/ghi bài nộp qua database_helper (streamlit, supabase)
+pytest.importorskip("streamlit")
+pytest.importorskip("supabase")
+
+from column_codec import decode_responses
+from grading import compile_questions, grade_responses
+from regrade import grade_question_vectorized, regrade_scores
+
+def test_vectorized_grading_matches_grade_responses(questions, submissions):
+    compiled = compile_questions(questions)
+    all_responses = [decode_responses(s["responses"]) for s in submissions]
+    expected = [grade_responses(responses, compiled)[1] for responses in all_responses]
+
+    for col, cq in enumerate(compiled):
+        vectorized = grade_question_vectorized(all_responses, cq)
+        assert vectorized.tolist() == [results[col] for results in expected], cq.id
+
+def test_regrade_scores_match_grade_responses(questions, submissions):
+    compiled = compile_questions(questions)
+    expected = [grade_responses(s["responses"], compiled)[0] for s in submissions]
+    assert regrade_scores(submissions, questions).tolist() == expected
+
+def test_vectorized_grading_of_empty_batch(questions):
+    for cq in compile_questions(questions):
+        assert grade_question_vectorized([], cq).shape == (0,)
+
+def _regrade_client(submissions):
+    from fake_supabase import FakeSupabase
+
+    # Điểm lưu sai để mọi bài đều cần ghi lại
+    return FakeSupabase(submissions=[dict(s, score=-1) for s in submissions])
+
+def test_regrade_rewrites_changed_scores(questions, submissions):
+    import regrade
+
+    client = _regrade_client(submissions)
+    checked, changed = regrade._regrade(client, questions)
+
+    compiled = compile_questions(questions)
+    expected = {s["id"]: grade_responses(s["responses"], compiled)[0] for s in submissions}
+    assert (checked, changed) == (len(submissions), len(submissions))
+    assert {row["id"]: row["score"] for row in client.tables["submissions"]} == expected
+
+def test_failed_page_fetch_marks_regrade_failed(questions, submissions, monkeypatch):
+    import regrade
+
+    client = _regrade_client(submissions)
+
+    def scan_then_fail(supabase, columns):
+        yield from supabase.tables["submissions"][:2]
+        raise ConnectionError("mất kết nối")
+
+    resets = []
+    monkeypatch.setattr(regrade, "REGRADE_CHUNK_SIZE", 2)
+    monkeypatch.setattr(regrade, "scan_submissions", scan_then_fail)
+    monkeypatch.setattr(regrade, "reset_submission_statistics", lambda: resets.append(1))
+    monkeypatch.setattr(regrade, "get_supabase_client", lambda: client)
+    monkeypatch.setenv("SUPABASE_URL", "http://localhost")
+    monkeypatch.setenv("SUPABASE_KEY", "key")
+    monkeypatch.setitem(regrade._regrade_state, "running", True)
+    monkeypatch.setitem(regrade._regrade_state, "pending", questions)
+    monkeypatch.setitem(regrade._regrade_state, "last_result", None)
+    monkeypatch.setitem(regrade._regrade_state, "last_error", None)
+
+    regrade._regrade_worker()
+
+    status = regrade.regrade_status()
+    assert status["running"] is False
+    assert status["last_result"] is None
+    assert "sau 2 bài nộp (2 bài đã ghi điểm mới)" in status["last_error"]
+    # Điểm của phần đã ghi làm kho thống kê cũ đi nên vẫn phải xóa kho
+    assert resets == [1]
@@ -0,0 +1,65 @@
+import io
+
+import pytest
+
+import render_cache
+from render_cache import cached_render, report_cache_key
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(render_cache, "RENDER_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(render_cache, "_cache_size", None)
+    return tmp_path
+
+
+def _key(**overrides):
+    args = {
+        "fmt": "pdf",
+        "template_version": 1,
+        "submission": {"id": 1, "responses": {"1": ["A"]}, "score": 1, "timestamp": 0},
+        "questions": [{"id": 1}],
+        "student_name": "An",
+        "student_email": "an@example.com",
+        "student_class": "A1",
+        "max_possible": 10,
+    }
+    args.update(overrides)
+    return report_cache_key(**args)
+
+
+def test_key_covers_email_and_max_possible():
+    assert _key() == _key()
+    assert _key(student_email="binh@example.com") != _key()
+    assert _key(max_possible=20) != _key()
+
+
+def test_failed_render_is_not_cached(cache_dir):
+    key = _key()
+
+    def failing():
+        raise ValueError("font missing")
+
+    with pytest.raises(ValueError):
+        cached_render(key, failing)
+    assert render_cache.get_cached_report(key) is None
+
+    calls = []
+
+    def succeeding():
+        calls.append(1)
+        return io.BytesIO(b"%PDF report")
+
+    assert cached_render(key, succeeding).getvalue() == b"%PDF report"
+    assert cached_render(key, succeeding).getvalue() == b"%PDF report"
+    assert len(calls) == 1
+
+
+def test_clear_render_cache(cache_dir):
+    key = _key()
+    cached_render(key, lambda: io.BytesIO(b"%PDF report"))
+
+    render_cache.clear_render_cache()
+
+    assert render_cache.get_cached_report(key) is None
+    assert list(cache_dir.iterdir()) == []
@@ -0,0 +1,65 @@
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+from column_codec import decode_responses
+from grading import check_answer_correctness
+from report_data import (
+    build_report_frame, build_user_index, data_version, question_counts, student_name_and_class, student_summary
+)
+
+@pytest.fixture
+def students():
+    return [
+        {"email": "a@example.com", "full_name": "Nguyễn Văn A", "class": "K1"},
+        {"email": "b@example.com", "full_name": "Trần Thị B", "class": "K2"},
+    ]
+
+def baseline_question_counts(submissions, questions):
+    """Đếm đúng/sai/bỏ qua theo cách tab câu hỏi làm trước đây (duyệt từng bài nộp)"""
+    counts = []
+    for q in questions:
+        correct = wrong = skip = 0
+        for s in submissions:
+            user_ans = decode_responses(s["responses"]).get(str(q["id"]), [])
+            if not user_ans:
+                skip += 1
+            elif check_answer_correctness(user_ans, q):
+                correct += 1
+            else:
+                wrong += 1
+        counts.append((correct, wrong, skip))
+    return counts
+
+def test_question_counts_match_baseline(submissions, questions, students):
+    expected = baseline_question_counts(submissions, questions)
+    frame = build_report_frame(submissions, build_user_index(students), questions)
+
+    correct_counts, wrong_counts, skip_counts = question_counts(frame)
+    assert list(zip(correct_counts.tolist(), wrong_counts.tolist(), skip_counts.tolist())) == expected
+
+def test_frame_table_columns(submissions, questions, students):
+    frame = build_report_frame(submissions, build_user_index(students), questions)
+
+    assert frame.table["id"].tolist() == [s["id"] for s in submissions]
+    assert frame.table["score"].tolist() == [6, 0, 5, 2.5, 0, 2]
+    assert frame.max_possible == sum(q["score"] for q in questions)
+    assert frame.position_by_id["4"] == 3
+    # Responses được giải mã một lần khi dựng frame
+    assert all(isinstance(s["responses"], dict) for s in frame.submissions)
+
+def test_student_lookup_and_summary(submissions, questions, students):
+    users = build_user_index(students)
+    frame = build_report_frame(submissions, users, questions)
+
+    assert student_name_and_class(users, "b@example.com") == ("Trần Thị B", "K2")
+    summary = student_summary(frame)
+    assert summary.loc["a@example.com", "count"] == 2
+    assert summary.loc["a@example.com", "max"] == 6
+
+def test_data_version_changes_with_content(submissions, questions):
+    version = data_version(submissions, questions)
+    assert data_version(submissions, questions) == version
+    changed = [dict(s) for s in submissions]
+    changed[0]["score"] = 1
+    assert data_version(changed, questions) != version
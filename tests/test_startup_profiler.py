@@ -0,0 +1,57 @@
+import sys
+import threading
+
+from startup_profiler import StartupProfiler
+
+
+def _write_module(directory, name, body=""):
+    (directory / f"{name}.py").write_text(body, encoding="utf-8")
+
+
+def test_imports_on_worker_thread_are_recorded(tmp_path, monkeypatch):
+    # Streamlit chạy app.py trên luồng ScriptRunner, import ở đó phải được đo
+    _write_module(tmp_path, "profiled_child_mod")
+    _write_module(tmp_path, "profiled_parent_mod", "import profiled_child_mod\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    for name in ("profiled_parent_mod", "profiled_child_mod"):
+        monkeypatch.delitem(sys.modules, name, raising=False)
+
+    profiler = StartupProfiler()
+    profiler.install()
+    try:
+        worker = threading.Thread(target=lambda: __import__("profiled_parent_mod"))
+        worker.start()
+        worker.join()
+    finally:
+        profiler.uninstall()
+
+    parent = profiler.entries["profiled_parent_mod"]
+    child = profiler.entries["profiled_child_mod"]
+    assert parent["kind"] == "import" and parent["count"] == 1
+    assert child["count"] == 1
+    assert parent["cumulative"] >= child["cumulative"]
+    assert abs(parent["self"] - (parent["cumulative"] - child["cumulative"])) < 1e-9
+
+
+def test_threads_keep_separate_stacks():
+    profiler = StartupProfiler()
+    inside = threading.Event()
+    release = threading.Event()
+
+    def worker():
+        with profiler.phase("worker_phase"):
+            inside.set()
+            release.wait(5)
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    inside.wait(5)
+    # Bước đo trên luồng chính trong lúc luồng kia còn mở không bị cộng vào bước của luồng kia
+    with profiler.phase("main_phase"):
+        pass
+    release.set()
+    thread.join()
+
+    worker_entry = profiler.entries["worker_phase"]
+    assert worker_entry["self"] == worker_entry["cumulative"]
+    assert profiler.entries["main_phase"]["count"] == 1
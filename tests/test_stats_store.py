@@ -0,0 +1,67 @@
+import pytest
+
+# database_helper cần streamlit và supabase-py
+pytest.importorskip("streamlit")
+pytest.importorskip("supabase")
+
+import database_helper
+from fake_supabase import FakeSupabase
+
+def _row(submission_id, inserted_at, responses):
+    return {
+        "id": submission_id,
+        "user_email": f"u{submission_id}@example.com",
+        "responses": responses,
+        "score": 2,
+        "timestamp": "2024-05-01T08:00:00",
+        "inserted_at": f"2024-05-01T08:{inserted_at}+00:00",
+    }
+
+@pytest.fixture
+def store_client(questions, monkeypatch):
+    # Client giả lập không có hàm rpc: get_submission_statistics dùng kho thống kê
+    client = FakeSupabase(submissions=[])
+    monkeypatch.setattr(database_helper, "get_supabase_client", lambda: client)
+    monkeypatch.setattr(database_helper, "get_all_questions", lambda: questions)
+    database_helper.reset_submission_statistics()
+    yield client
+    database_helper.reset_submission_statistics()
+
+def test_late_commit_with_lower_id_is_counted(store_client):
+    rows = store_client.tables["submissions"]
+    rows.append(_row(1, "00:00", {"1": ["B"]}))
+    rows.append(_row(3, "00:01", {"1": ["B"]}))
+    assert database_helper.get_submission_statistics()["total_submissions"] == 2
+
+    # id 2 được cấp trước id 3 nhưng commit sau lần đồng bộ trước
+    rows.append(_row(2, "00:02", {"1": ["A"]}))
+    stats = database_helper.get_submission_statistics()
+
+    assert stats["total_submissions"] == 3
+    assert stats["question_stats"]["1"] == {
+        "question": "Combobox", "total_answers": 3, "correct_count": 2, "correct_percentage": pytest.approx(200 / 3)
+    }
+
+def test_overlap_window_does_not_double_count(store_client):
+    rows = store_client.tables["submissions"]
+    rows.append(_row(1, "00:00", {"1": ["B"]}))
+    database_helper.get_submission_statistics()
+
+    # Lần đồng bộ sau đọc lại khoảng chồng lấn chứa bài 1
+    rows.append(_row(2, "00:05", {"1": ["B"]}))
+    database_helper.get_submission_statistics()
+    assert store_client.executed[-1].conditions[0][0] == "gte"
+    assert database_helper.get_submission_statistics()["total_submissions"] == 2
+
+def test_recorded_submission_is_counted_once(store_client, questions):
+    rows = store_client.tables["submissions"]
+    rows.append(_row(1, "00:00", {"1": ["B"]}))
+    database_helper.get_submission_statistics()
+
+    # Bài vừa lưu được cộng ngay vào kho, rồi xuất hiện lại ở lần đồng bộ sau
+    saved = _row(2, "00:03", {"1": ["B"]})
+    database_helper.record_submission_statistics(saved, questions)
+    rows.append(saved)
+
+    assert database_helper.get_submission_statistics()["total_submissions"] == 2
+    assert database_helper.get_submission_statistics()["total_submissions"] == 2
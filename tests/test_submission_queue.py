@@ -0,0 +1,72 @@
+import pytest
+
+# submission_queue dùng database_helper (streamlit, supabase-py)
+pytest.importorskip("streamlit")
+pytest.importorskip("supabase")
+
+import submission_queue
+from submission_queue import SubmissionQueue
+
+def _record(n):
+    return {"receipt_id": f"r{n}", "user_email": f"u{n}@example.com", "responses": {}, "score": 0, "timestamp": "2024-05-01T08:00:00"}
+
+@pytest.fixture
+def writer(tmp_path, monkeypatch):
+    """Hàng đợi chưa khởi động luồng ghi; lô có bài "r3" luôn lỗi"""
+    monkeypatch.setattr(submission_queue.time, "sleep", lambda seconds: None)
+    submission = SubmissionQueue(wal_path=str(tmp_path / "queue.wal.jsonl"), workers=1)
+    written = []
+
+    def write_batch(batch):
+        if any(r["receipt_id"] == "r3" for r in batch):
+            raise RuntimeError("violates check constraint")
+        written.extend(r["receipt_id"] for r in batch)
+
+    monkeypatch.setattr(submission, "_write_batch", write_batch)
+    submission.written = written
+    return submission
+
+def _submit_all(submission, records):
+    for record in records:
+        with submission._wal_lock:
+            submission._append_wal({"op": "enqueue", "record": record})
+            submission._pending[record["receipt_id"]] = record
+
+def test_failing_row_does_not_block_batch(writer):
+    records = [_record(n) for n in range(8)]
+    _submit_all(writer, records)
+
+    writer._write_with_retry(records)
+
+    assert sorted(writer.written) == sorted(r["receipt_id"] for r in records if r["receipt_id"] != "r3")
+    assert writer.receipt_status("r3") == "failed"
+    assert writer.receipt_status("r0") == "saved"
+    assert writer.pending_count() == 0
+    assert [entry["record"]["receipt_id"] for entry in writer.failed_submissions()] == ["r3"]
+    assert "constraint" in writer.failed_submissions()[0]["error"]
+
+def test_failed_rows_survive_restart_and_can_be_retried(writer, tmp_path):
+    records = [_record(n) for n in range(4)]
+    _submit_all(writer, records)
+    writer._write_with_retry(records)
+
+    restarted = SubmissionQueue(wal_path=writer.wal_path, workers=1)
+    pending, failed = restarted._replay_wal()
+    assert pending == []
+    assert list(failed) == ["r3"]
+
+    restarted._failed.update(failed)
+    restarted._requeue = lambda records: None
+    assert restarted.retry_failed() == 1
+    assert restarted.receipt_status("r3") == "pending"
+    assert restarted._replay_wal() == ([records[3]], {})
+
+def test_discarded_rows_are_forgotten(writer):
+    records = [_record(n) for n in range(4)]
+    _submit_all(writer, records)
+    writer._write_with_retry(records)
+
+    writer.discard_failed(["r3"])
+
+    assert writer.failed_submissions() == []
+    assert writer._replay_wal() == ([], {})
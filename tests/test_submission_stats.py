@@ -0,0 +1,116 @@
+import json
+from datetime import datetime
+
+import pytest
+
+from grading import check_answer_correctness
+from submission_stats import aggregate_submissions, fetch_aggregates, student_count
+
+def baseline_statistics(submissions, questions):
+    """Thống kê tính theo cách ban đầu của get_submission_statistics (duyệt toàn bộ bài nộp)"""
+    total_submissions = len(submissions)
+    question_stats = {}
+    for q in questions:
+        q_id = str(q["id"])
+        correct_count = 0
+        total_answers = 0
+        for s in submissions:
+            responses = json.loads(s["responses"]) if isinstance(s["responses"], str) else s["responses"]
+            if q_id in responses:
+                total_answers += 1
+                if check_answer_correctness(responses[q_id], q):
+                    correct_count += 1
+        question_stats[q_id] = {"total_answers": total_answers, "correct_count": correct_count}
+
+    daily_counts = {}
+    for s in submissions:
+        if isinstance(s["timestamp"], str):
+            submitted_at = datetime.fromisoformat(s["timestamp"].replace("Z", "+00:00"))
+        else:
+            submitted_at = datetime.fromtimestamp(s["timestamp"])
+        date_str = submitted_at.strftime("%Y-%m-%d")
+        daily_counts[date_str] = daily_counts.get(date_str, 0) + 1
+
+    return {
+        "total_submissions": total_submissions,
+        "student_count": len(set(s["user_email"] for s in submissions)),
+        "avg_score": sum(s["score"] for s in submissions) / total_submissions,
+        "question_stats": question_stats,
+        "daily_counts": daily_counts,
+    }
+
+@pytest.fixture
+def scored_submissions(submissions):
+    # Cách tính ban đầu không chấp nhận điểm None
+    return [dict(s, score=s["score"] or 0) for s in submissions]
+
+def test_aggregates_match_baseline(scored_submissions, questions):
+    aggregates = aggregate_submissions(scored_submissions, questions)
+    expected = baseline_statistics(scored_submissions, questions)
+
+    assert aggregates["total_submissions"] == expected["total_submissions"]
+    assert student_count(aggregates) == expected["student_count"]
+    assert aggregates["score_sum"] / aggregates["total_submissions"] == pytest.approx(expected["avg_score"])
+    assert aggregates["daily_counts"] == expected["daily_counts"]
+    for q_id, stats in expected["question_stats"].items():
+        assert aggregates["questions"][q_id]["present"] == stats["total_answers"], q_id
+        assert aggregates["questions"][q_id]["correct"] == stats["correct_count"], q_id
+
+def test_answered_counts_exclude_empty_responses(scored_submissions, questions):
+    aggregates = aggregate_submissions(scored_submissions, questions)
+    # Bài 2 có mục câu 3 nhưng không chọn đáp án nào; đáp án lạ ("R" ở bài 3) bị bỏ qua khi chấm
+    assert aggregates["questions"]["3"] == {"present": 4, "answered": 3, "correct": 2}
+
+def test_score_distribution(scored_submissions, questions):
+    aggregates = aggregate_submissions(scored_submissions, questions)
+    assert aggregates["score_distribution"] == {6: 1, 0: 2, 5: 1, 2.5: 1, 2: 1}
+
+def test_empty_aggregates(questions):
+    aggregates = aggregate_submissions([], questions)
+    assert aggregates["total_submissions"] == 0
+    assert student_count(aggregates) == 0
+    assert all(counts == {"present": 0, "answered": 0, "correct": 0} for counts in aggregates["questions"].values())
+
+class _FakeRpc:
+    def __init__(self, data):
+        self.data = data
+
+    def execute(self):
+        return self
+
+class _FakeSupabase:
+    def __init__(self, data):
+        self.data = data
+        self.calls = []
+
+    def rpc(self, fn, params):
+        self.calls.append((fn, params))
+        return _FakeRpc(self.data)
+
+def test_fetch_aggregates_normalizes_rpc_result(scored_submissions, questions):
+    expected = aggregate_submissions(scored_submissions, questions)
+    # Kết quả RPC: khóa JSON là chuỗi, không có câu hỏi chưa được trả lời
+    rpc_result = {
+        "total_submissions": expected["total_submissions"],
+        "score_sum": expected["score_sum"],
+        "student_count": student_count(expected),
+        "questions": {q_id: counts for q_id, counts in expected["questions"].items() if counts["present"]},
+        "daily_counts": expected["daily_counts"],
+        "score_distribution": {str(score): count for score, count in expected["score_distribution"].items()},
+    }
+    supabase = _FakeSupabase([rpc_result])
+
+    aggregates = fetch_aggregates(supabase, questions, ["a@example.com"])
+
+    assert supabase.calls == [("submission_statistics", {"p_user_emails": ["a@example.com"]})]
+    assert aggregates["questions"] == expected["questions"]
+    assert aggregates["score_distribution"] == expected["score_distribution"]
+    assert aggregates["daily_counts"] == expected["daily_counts"]
+    assert student_count(aggregates) == student_count(expected)
+
+def test_fetch_aggregates_without_rpc(questions):
+    class _MissingRpc:
+        def rpc(self, fn, params):
+            raise RuntimeError("function does not exist")
+
+    assert fetch_aggregates(_MissingRpc(), questions) is None